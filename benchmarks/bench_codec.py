@@ -0,0 +1,51 @@
+"""
+Compare the size and speed of the ``django_multisafepay.codec`` format against pickle and the raw XML.
+
+Run with::
+
+    python benchmarks/bench_codec.py
+"""
+import pickle
+from xml.etree import ElementTree
+
+from utils import bench, setup_django
+
+setup_django()
+
+from django_multisafepay import codec  # noqa: E402
+from django_multisafepay.messages import StatusReply  # noqa: E402
+from samples import CONNECT_STATUS_REPLY, FAST_CHECKOUT_STATUS_REPLY  # noqa: E402
+
+NUMBER = 10000
+
+
+def main():
+    samples = (
+        ("fast-checkout", FAST_CHECKOUT_STATUS_REPLY),
+        ("connect", CONNECT_STATUS_REPLY),
+    )
+    protocol = pickle.HIGHEST_PROTOCOL
+
+    for sample_name, content in samples:
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        reply = StatusReply.from_xml(ElementTree.fromstring(content))
+        reply_without_xml = StatusReply.from_xml(ElementTree.fromstring(content), keep_xml=False)
+
+        formats = (
+            ("codec", lambda: codec.dumps(reply), codec.loads),
+            ("pickle, with XML", lambda: pickle.dumps(reply, protocol), pickle.loads),
+            ("pickle, without XML", lambda: pickle.dumps(reply_without_xml, protocol), pickle.loads),
+            ("XML", lambda: ElementTree.tostring(reply._xml, encoding='utf-8'), lambda data: StatusReply.from_xml(ElementTree.fromstring(data))),
+        )
+
+        print("StatusReply {0}:".format(sample_name))
+        for name, dumps, loads in formats:
+            data = dumps()
+            print("  {0:<20} {1:6d} bytes".format(name, len(data)))
+            bench("    dumps", dumps, NUMBER)
+            bench("    loads", lambda: loads(data), NUMBER)
+
+
+if __name__ == '__main__':
+    main()
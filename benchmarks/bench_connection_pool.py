@@ -0,0 +1,40 @@
+"""
+Compare API calls with a fresh connection per call, against the shared keep-alive pool.
+
+Run with::
+
+    python benchmarks/bench_connection_pool.py
+"""
+from utils import bench, setup_django
+
+setup_django()
+
+from django_multisafepay.client import MultiSafepayClient  # noqa: E402
+from django_multisafepay.resilience import RetryPolicy  # noqa: E402
+from django_multisafepay.stubserver import start_server  # noqa: E402
+from django_multisafepay.transport import ConnectionPool  # noqa: E402
+
+
+def main():
+    server = start_server()
+    url = server.url
+
+    class StubClient(MultiSafepayClient):
+        api_url = url
+
+    # Without retries, a failed call raises instead of adding the backoff delay to the timings.
+    no_keepalive = StubClient(pool=ConnectionPool(keep_alive=False), retry_policy=RetryPolicy(max_retries=0))
+    pooled = StubClient(pool=ConnectionPool(), retry_policy=RetryPolicy(max_retries=0))
+
+    before = bench("status() new connection per call", lambda: no_keepalive.status('10217'), number=100, repeat=3)
+    after = bench("status() pooled keep-alive", lambda: pooled.status('10217'), number=100, repeat=3)
+    server.stop()
+
+    # Each call should have been a single, successful request.
+    if server.requests != 2 * 100 * 3:
+        raise AssertionError("Expected {0} requests, the stub server received {1}".format(2 * 100 * 3, server.requests))
+    print("speedup: {0:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Show the effect of hedged requests on the tail latency, against a stub server where some requests are slow.
+
+Run with::
+
+    python benchmarks/bench_hedging.py
+"""
+import asyncio
+
+from utils import measure, setup_django
+
+setup_django()
+
+from django_multisafepay.asyncclient import AsyncMultiSafepayClient  # noqa: E402
+from django_multisafepay.client import MultiSafepayClient  # noqa: E402
+from django_multisafepay.hedging import HedgingPolicy  # noqa: E402
+from django_multisafepay.stubserver import start_server  # noqa: E402
+from django_multisafepay.transport import ConnectionPool  # noqa: E402
+
+
+def report(result, policy=None):
+    line = "{name:<36} p50 {p50_us:9.0f} us, p90 {p90_us:9.0f} us, p99 {p99_us:9.0f} us".format(**result)
+    if policy is not None:
+        line += ", hedge delay {0:.0f} us".format(policy.start_call('status') * 1e6)
+    print(line)
+
+
+def main():
+    server = start_server(delay=0.002, slow_rate=0.05, slow_delay=0.2)
+    url = server.url
+
+    class StubClient(MultiSafepayClient):
+        api_url = url
+
+    class AsyncStubClient(AsyncMultiSafepayClient):
+        api_url = url
+
+    plain_client = StubClient(pool=ConnectionPool())
+    report(measure("status() without hedging", lambda: plain_client.status('10217'), number=500))
+
+    policy = HedgingPolicy(percentile=90, budget=0.1, min_delay=0.001, initial_delay=0.05)
+    client = StubClient(pool=ConnectionPool(), hedging_policy=policy)
+    report(measure("status() with hedging", lambda: client.status('10217'), number=500), policy)
+
+    loop = asyncio.new_event_loop()
+    async_policy = HedgingPolicy(percentile=90, budget=0.1, min_delay=0.001, initial_delay=0.05)
+    async_client = AsyncStubClient(hedging_policy=async_policy)
+    report(measure("async status() with hedging", lambda: loop.run_until_complete(async_client.status('10217')), number=500), async_policy)
+    loop.run_until_complete(async_client.pool.close())
+    loop.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure the time it takes to import the modules of this package, as a cold start would.
+
+Each import runs in a fresh Python process, with Django configured but not set up.
+The reported time excludes the Python startup and the import of Django itself.
+
+Run with::
+
+    python benchmarks/bench_import.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = (
+    'import django_multisafepay',
+    'import django_multisafepay.data',
+    'from django_multisafepay.data import Customer, Merchant, Transaction',
+    'from django_multisafepay.messages import StatusReply',
+    'from django_multisafepay.client import MultiSafepayClient',
+)
+
+# Runs in the child process.
+SCRIPT = """
+import json, sys
+from timeit import default_timer
+from django.conf import settings
+settings.configure(MULTISAFEPAY_ACCOUNT_ID='1', MULTISAFEPAY_SITE_ID='2', MULTISAFEPAY_SITE_CODE='3')
+before = set(sys.modules)
+start = default_timer()
+exec({statement!r})
+elapsed = default_timer() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(set(sys.modules) - before)}}))
+"""
+
+
+def measure_import(statement, repeat=10):
+    """
+    Run the import statement in new processes.
+    :return: The best time in seconds, and the modules that were imported.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    results = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT.format(statement=statement)], env=env, cwd=ROOT)
+        results.append(json.loads(output.decode('utf-8')))
+    return min(result['elapsed'] for result in results), results[0]['modules']
+
+
+def main():
+    verbose = '-v' in sys.argv
+    for statement in STATEMENTS:
+        elapsed, modules = measure_import(statement)
+        print("{0:<70} {1:8.1f} ms {2:5d} modules".format(statement, elapsed * 1000, len(modules)))
+        if verbose:
+            print("  " + ", ".join(name for name in modules if not name.startswith('django_multisafepay')))
+
+
+if __name__ == '__main__':
+    main()
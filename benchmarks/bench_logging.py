@@ -0,0 +1,61 @@
+"""
+Compare the eager formatting of the debug log messages against the lazy ``LogPayload``,
+while debug logging is disabled (as it typically is in production).
+
+Run with::
+
+    python benchmarks/bench_logging.py
+"""
+import logging
+
+from utils import bench, setup_django
+
+setup_django()
+
+from django_multisafepay.client import URL_TEST, LogPayload  # noqa: E402
+from samples import make_checkout, make_gateways_reply  # noqa: E402
+
+logger = logging.getLogger('django_multisafepay.client')
+
+
+def eager_sending(postdata):
+    # The previous implementation, which always formatted the message.
+    logger.debug(u"sending to {0}:\n{1}".format(URL_TEST, postdata))
+
+
+def lazy_sending(postdata):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(u"sending to %s:\n%s", URL_TEST, LogPayload(postdata))
+
+
+def eager_reply(content):
+    # The previous implementation, which always decoded the response.
+    logger.debug(u"http succeeded: {0}".format(content.decode('utf-8', 'replace')))
+
+
+def lazy_reply(content):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(u"http succeeded: %s", LogPayload(content))
+
+
+def main():
+    logger.setLevel(logging.INFO)
+
+    samples = (
+        ("checkout 1 item", eager_sending, lazy_sending, make_checkout(1).to_xml()),
+        ("checkout 1000 items", eager_sending, lazy_sending, make_checkout(1000).to_xml()),
+        ("reply 20 gateways", eager_reply, lazy_reply, make_gateways_reply(20)),
+        ("reply 1000 gateways", eager_reply, lazy_reply, make_gateways_reply(1000)),
+    )
+    for name, eager, lazy, data in samples:
+        before = bench("eager log " + name, lambda: eager(data), number=2000)
+        after = bench("lazy log " + name, lambda: lazy(data), number=2000)
+        print("saved: {0:.2f} us/call".format((before - after) * 1e6))
+
+    # The cost when debug logging is enabled, including the redaction and truncation.
+    postdata = make_checkout(1000).to_xml()
+    bench("format LogPayload checkout 1000 items", lambda: str(LogPayload(postdata)), number=200)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure the memory that is retained per ``StatusReply``, e.g. when a reconciliation job holds many replies.
+
+This compares the dict-backed objects that were used before ``__slots__`` were added,
+and the ``keep_xml`` options of ``XmlResponse.from_xml()``.
+
+Run with::
+
+    python benchmarks/bench_memory.py
+"""
+import gc
+import tracemalloc
+from decimal import Decimal
+from xml.etree import ElementTree
+
+from utils import setup_django
+
+setup_django()
+
+from django_multisafepay.data.base import Price, XmlObject  # noqa: E402
+from django_multisafepay.messages import StatusReply  # noqa: E402
+from django_multisafepay.messages.base import KEEP_XML_COMPRESSED, XmlResponse  # noqa: E402
+from samples import CONNECT_STATUS_REPLY, FAST_CHECKOUT_STATUS_REPLY  # noqa: E402
+
+NUMBER = 10000
+
+
+class DictBacked(object):
+    """
+    The object layout before ``__slots__`` were used, every instance has a ``__dict__``.
+    """
+
+
+class DictBackedPrice(Decimal):
+    pass
+
+
+def to_dict_backed(value):
+    """
+    Copy the reply into dict-backed objects, with the same attributes.
+    """
+    if isinstance(value, (XmlObject, XmlResponse)):
+        copy = _get_dict_backed_class(value.__class__)()
+        for name in _get_slots(value.__class__):
+            if name == '_xml_compressed':
+                continue
+            if hasattr(value, name):
+                setattr(copy, '_xml' if name == '_xml_tree' else name, to_dict_backed(getattr(value, name)))
+        return copy
+    elif isinstance(value, Price):
+        copy = DictBackedPrice(value)
+        copy.currency = value.currency
+        return copy
+    elif isinstance(value, list):
+        return [to_dict_backed(item) for item in value]
+    return value
+
+
+_dict_backed_classes = {}
+
+
+def _get_dict_backed_class(cls):
+    # A class per type, so the instances share their dict keys, just like the original classes did.
+    try:
+        return _dict_backed_classes[cls]
+    except KeyError:
+        new_class = _dict_backed_classes[cls] = type(cls.__name__, (DictBacked,), {})
+        return new_class
+
+
+def _get_slots(cls):
+    return [name for klass in cls.__mro__ for name in klass.__dict__.get('__slots__', ()) if name != '__dict__']
+
+
+def retained_bytes(parse):
+    """
+    Return the memory that is retained per reply, while ``NUMBER`` replies are kept.
+    """
+    gc.collect()
+    tracemalloc.start()
+    replies = [parse() for i in range(NUMBER)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del replies
+    return retained // NUMBER
+
+
+def main():
+    samples = (
+        ("fast-checkout", FAST_CHECKOUT_STATUS_REPLY),
+        ("connect", CONNECT_STATUS_REPLY),
+    )
+    variants = (
+        ("dict-backed, XML tree (before)", lambda xml: to_dict_backed(StatusReply.from_xml(xml))),
+        ("dict-backed, without XML", lambda xml: to_dict_backed(StatusReply.from_xml(xml, keep_xml=False))),
+        ("slots, XML tree", lambda xml: StatusReply.from_xml(xml)),
+        ("slots, compressed XML", lambda xml: StatusReply.from_xml(xml, keep_xml=KEEP_XML_COMPRESSED)),
+        ("slots, without XML", lambda xml: StatusReply.from_xml(xml, keep_xml=False)),
+    )
+
+    for sample_name, content in samples:
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+
+        print("StatusReply {0}:".format(sample_name))
+        for name, from_xml in variants:
+            size = retained_bytes(lambda: from_xml(ElementTree.fromstring(content)))
+            print("  {0:<32} {1:8d} bytes/reply".format(name, size))
+
+
+if __name__ == '__main__':
+    main()
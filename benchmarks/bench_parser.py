@@ -0,0 +1,58 @@
+"""
+Compare the incremental StreamParser against parsing the complete XML tree with ``from_xml()``.
+
+Run with::
+
+    python benchmarks/bench_parser.py
+"""
+import tracemalloc
+from xml.etree import ElementTree
+
+from utils import bench, setup_django
+
+setup_django()
+
+from django_multisafepay.client import STREAM_CHUNK_SIZE  # noqa: E402
+from django_multisafepay.messages import GatewaysReply, StatusReply  # noqa: E402
+from django_multisafepay.messages.parser import StreamParser  # noqa: E402
+from samples import CONNECT_STATUS_REPLY, FAST_CHECKOUT_STATUS_REPLY, make_gateways_reply  # noqa: E402
+
+
+def parse_tree(content, response_class):
+    return response_class.from_xml(ElementTree.fromstring(content))
+
+
+def parse_stream(content, response_class):
+    parser = StreamParser(response_class)
+    for i in range(0, len(content), STREAM_CHUNK_SIZE):
+        parser.feed(content[i:i + STREAM_CHUNK_SIZE])
+    parser.close()
+    return parser.get_reply()
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    samples = (
+        ("fast-checkout status", FAST_CHECKOUT_STATUS_REPLY, StatusReply, 2000),
+        ("connect status", CONNECT_STATUS_REPLY, StatusReply, 2000),
+        ("gateways x20", make_gateways_reply(20), GatewaysReply, 2000),
+        ("gateways x5000", make_gateways_reply(5000), GatewaysReply, 10),
+    )
+    for name, content, response_class, number in samples:
+        bench("from_xml() " + name, lambda: parse_tree(content, response_class), number=number)
+        bench("StreamParser " + name, lambda: parse_stream(content, response_class), number=number)
+        print("peak memory: {0} bytes from_xml(), {1} bytes StreamParser".format(
+            peak_memory(parse_tree, content, response_class),
+            peak_memory(parse_stream, content, response_class),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Show the effect of the retry policy and circuit breaker, against a stub server that injects faults.
+
+Run with::
+
+    python benchmarks/bench_resilience.py
+"""
+import logging
+import time
+
+from utils import setup_django
+
+setup_django()
+
+from django_multisafepay.client import MultiSafepayClient  # noqa: E402
+from django_multisafepay.resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+from django_multisafepay.stubserver import start_server  # noqa: E402
+from django_multisafepay.transport import ConnectionPool  # noqa: E402
+
+
+def run(client, number):
+    """
+    Call the status several times.
+    :return: The number of successful calls, errors per type and the elapsed time.
+    """
+    ok = 0
+    errors = {}
+    start = time.time()
+    for i in range(number):
+        try:
+            client.status('10217')
+        except Exception as e:
+            errors[e.__class__.__name__] = errors.get(e.__class__.__name__, 0) + 1
+        else:
+            ok += 1
+    return ok, errors, time.time() - start
+
+
+def report(name, result):
+    ok, errors, elapsed = result
+    print("{0:<40} {1:4d} ok, errors: {2} in {3:.2f}s".format(name, ok, errors or '-', elapsed))
+
+
+def main():
+    logging.getLogger('django_multisafepay').setLevel(logging.CRITICAL)  # Silence the expected errors.
+
+    scenarios = (
+        ("Flaky", dict(error_rate=0.2, reset_rate=0.05), 200),
+        ("Down", dict(error_rate=1.0, delay=0.05), 50),
+    )
+    for name, faults, number in scenarios:
+        server = start_server(**faults)
+        url = server.url
+
+        class StubClient(MultiSafepayClient):
+            api_url = url
+
+        print("{0}:".format(name))
+        report("no retries", run(StubClient(pool=ConnectionPool(), retry_policy=RetryPolicy(max_retries=0)), number))
+        report("2 retries", run(StubClient(pool=ConnectionPool(), retry_policy=RetryPolicy(max_retries=2, backoff=0.01)), number))
+        report("2 retries, circuit breaker", run(StubClient(
+            pool=ConnectionPool(),
+            retry_policy=RetryPolicy(max_retries=2, backoff=0.01),
+            circuit_breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1),
+        ), number))
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+Compare the single-pass XML writer against the previous recursive string formatting.
+
+Run with::
+
+    python benchmarks/bench_serializer.py
+"""
+from utils import bench, setup_django
+
+setup_django()
+
+from django_multisafepay.tests.legacy_serializer import legacy_to_xml  # noqa: E402
+from samples import make_checkout  # noqa: E402
+
+
+def main():
+    for num_items in (1, 100, 1000):
+        message = make_checkout(num_items)
+        assert message.to_xml().encode('utf-8') == legacy_to_xml(message).encode('utf-8'), "output differs!"
+
+        number = max(1, 2000 // num_items)
+        before = bench("legacy to_xml() {0} items".format(num_items), lambda: legacy_to_xml(message), number=number)
+        after = bench("to_xml() {0} items".format(num_items), message.to_xml, number=number)
+        print("speedup: {0:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
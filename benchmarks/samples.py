@@ -0,0 +1,180 @@
+"""
+Sample messages for the benchmarks.
+"""
+from django_multisafepay import messages
+from django_multisafepay.data import (
+    Cart, Customer, ItemWeight, Merchant, Pickup, Plugin, Price, ShoppingCartItem, Transaction
+)
+
+
+def make_checkout(num_items):
+    """
+    Create a checkout message with a shopping cart of ``num_items`` items.
+    """
+    return messages.CheckoutTransaction(
+        merchant=Merchant(notification_url='https://example.org/api/multisafepay/notify/'),
+        plugin=Plugin(shop_version='1.0'),
+        transaction=Transaction(
+            id='10217', currency='EUR', amount=6000, description='Order #10217 & more',
+            manual=False, gateway='IDEAL', gateway_issuer='0151', var1='215',
+        ),
+        customer=Customer(
+            locale='nl_NL', firstname='Diederik', lastname='van der Boor', address1='Foo', address2=None,
+            housenumber='1', zipcode='1234AB', city='Amsterdam', state=None, country='NL',
+            phone='+31 20 1234567', email='foo@example.org',
+        ),
+        cart=Cart(
+            items=[
+                ShoppingCartItem(
+                    item_name=u'Product {0}'.format(i),
+                    item_description=u'Description <b>{0}</b>'.format(i),
+                    unit_price=Price('12.50', 'EUR'),
+                    quantity=2,
+                    merchant_item_id=u'SKU-{0}'.format(i),
+                    item_weight=ItemWeight(1, 'KG'),
+                ) for i in range(num_items)
+            ],
+            shipping_methods=[
+                Pickup('Online', Price('0.00', 'EUR')),
+                Pickup('Store', Price('2.50', 'EUR')),
+            ],
+        ),
+    )
+
+
+# The replies, as documented in the StatusReply class.
+FAST_CHECKOUT_STATUS_REPLY = u"""<?xml version="1.0" encoding="UTF-8"?>
+<status result="ok">
+  <ewallet>
+    <id>2118132</id>
+    <status>completed</status>
+    <fastcheckout>YES</fastcheckout>
+    <created>20140305191332</created>
+    <modified>20140305191335</modified>
+    <reasoncode/>
+    <reason/>
+  </ewallet>
+  <customer>
+    <amount>2000</amount>
+    <currency>EUR</currency>
+    <account/>
+    <locale>en_US</locale>
+    <firstname>Diederik</firstname>
+    <lastname>van der Boor</lastname>
+    <address1>Foo</address1>
+    <address2/>
+    <housenumber>1</housenumber>
+    <zipcode>1234AB</zipcode>
+    <city>Amsterdam</city>
+    <state/>
+    <country>NL</country>
+    <countryname/>
+    <phone1/>
+    <phone2/>
+    <email>foo@example.org</email>
+  </customer>
+  <customer-delivery/>
+  <transaction>
+    <id>7</id>
+    <currency>EUR</currency>
+    <amount>2000</amount>
+    <description>Order 7</description>
+    <var1>5</var1>
+    <var2/>
+    <var3/>
+    <items/>
+  </transaction>
+  <paymentdetails>
+    <type>IDEAL</type>
+    <accountiban>NL30INGB0123456789</accountiban>
+    <accountbic>INGBNL2A</accountbic>
+    <accountid>654412345</accountid>
+    <accountholdername>Mr Küppers</accountholdername>
+    <externaltransactionid>0050000081927015</externaltransactionid>
+  </paymentdetails>
+  <checkoutdata version="0.1">
+    <checkout-flow-support><merchant-checkout-flow-support>
+      <shipping-methods>
+        <pickup name="Online">
+          <price currency="EUR">0.00</price>
+        </pickup>
+      </shipping-methods>
+    </merchant-checkout-flow-support></checkout-flow-support>
+    <order-adjustment>
+      <shipping>
+        <pickup>
+          <shipping-name>Online</shipping-name>
+          <shipping-cost currency="EUR">0.00</shipping-cost>
+        </pickup>
+      </shipping>
+      <adjustment-total currency="EUR">0.00</adjustment-total>
+      <total-tax currency="EUR">0.00</total-tax>
+    </order-adjustment>
+    <order-total currency="EUR">20.00</order-total>
+  </checkoutdata>
+</status>
+""".encode('utf-8')
+
+CONNECT_STATUS_REPLY = b"""<?xml version="1.0" encoding="UTF-8"?>
+<status result="ok">
+  <ewallet>
+    <id>50102723</id>
+    <status>completed</status>
+    <fastcheckout>NO</fastcheckout>
+    <created>20150526130908</created>
+    <modified>20150526131108</modified>
+    <reasoncode />
+    <reason />
+  </ewallet>
+  <customer>
+    <amount>6000</amount>
+    <currency>EUR</currency>
+    <account />
+    <locale>nl_NL</locale>
+    <firstname>Diederik</firstname>
+    <lastname>van der Boor</lastname>
+    <address1>Foo</address1>
+    <address2 />
+    <housenumber>1</housenumber>
+    <zipcode>1234AB</zipcode>
+    <city>Paris</city>
+    <state />
+    <country>FR</country>
+    <countryname />
+    <phone1>+33 123456789</phone1>
+    <phone2 />
+    <email>foo@example.org</email>
+  </customer>
+  <customer-delivery />
+  <transaction>
+    <id>10217</id>
+    <recurringid />
+    <currency>EUR</currency>
+    <amount>6000</amount>
+    <cost>174</cost>
+    <description>Order 10217</description>
+    <var1>215</var1>
+    <var2 />
+    <var3 />
+    <items />
+    <amountrefunded>0</amountrefunded>
+  </transaction>
+  <paymentdetails>
+    <type>MASTERCARD</type>
+    <accountid />
+    <accountholdername>A.B. Tester</accountholdername>
+    <externaltransactionid>2-70-370907</externaltransactionid>
+  </paymentdetails>
+</status>
+"""
+
+
+def make_gateways_reply(num_gateways):
+    """
+    Create a gateways reply with ``num_gateways`` gateways.
+    """
+    gateways = u"".join(
+        u"<gateway><id>GATEWAY{0}</id><description>Payment method {0}</description></gateway>\n".format(i)
+        for i in range(num_gateways)
+    )
+    return u'<?xml version="1.0" encoding="UTF-8"?>\n<gateways result="ok"><gateways>\n{0}</gateways></gateways>\n'.format(gateways).encode('utf-8')
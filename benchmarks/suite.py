@@ -0,0 +1,180 @@
+"""
+Run all benchmarks, and report the throughput, latency percentiles and allocations.
+
+Run with::
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --json results-1.2.json
+    python benchmarks/suite.py --compare results-1.1.json
+
+The JSON output can be compared across releases with ``--compare``.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from contextlib import ExitStack
+from functools import partial
+from xml.etree import ElementTree
+
+from utils import measure, setup_django
+
+setup_django()
+
+import django  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django_multisafepay import __version__, messages  # noqa: E402
+from django_multisafepay.client import MultiSafepayClient  # noqa: E402
+from django_multisafepay.signals import order_status_updated  # noqa: E402
+from django_multisafepay.stubserver import start_server  # noqa: E402
+from django_multisafepay.views import NotificationView  # noqa: E402
+from samples import CONNECT_STATUS_REPLY, FAST_CHECKOUT_STATUS_REPLY, make_checkout, make_gateways_reply  # noqa: E402
+
+
+def get_cases(quick=False):
+    """
+    Return the benchmarks as ``(name, setup, number of calls)`` tuples.
+
+    The ``setup(stack)`` function prepares the benchmark, and returns the function to call.
+    It's only called for the benchmarks that run, and can register its cleanup at the :class:`~contextlib.ExitStack`.
+    """
+    scale = 10 if quick else 1
+    cases = []
+
+    # Building the request messages
+    for num_items in (1, 100, 1000):
+        cases.append((
+            "CheckoutTransaction.to_xml() {0} items".format(num_items),
+            lambda stack, num_items=num_items: make_checkout(num_items).to_xml,
+            max(20, 20000 // num_items) // scale,
+        ))
+
+    cases.append(("RedirectTransaction.signature", _make_signature, 100000 // scale))
+    cases.append(("RedirectTransaction.to_xml()", lambda stack: _make_redirect().to_xml, 20000 // scale))
+    cases.append(("Status.to_xml()", _make_status, 20000 // scale))
+
+    # Parsing the replies
+    replies = (
+        ("StatusReply.from_xml() fast-checkout", lambda: FAST_CHECKOUT_STATUS_REPLY, messages.StatusReply, 10000),
+        ("StatusReply.from_xml() connect", lambda: CONNECT_STATUS_REPLY, messages.StatusReply, 10000),
+        ("GatewaysReply.from_xml() 20 gateways", lambda: make_gateways_reply(20), messages.GatewaysReply, 10000),
+        ("GatewaysReply.from_xml() 1000 gateways", lambda: make_gateways_reply(1000), messages.GatewaysReply, 200),
+    )
+    for name, get_content, response_class, number in replies:
+        setup = partial(_make_parser, get_content=get_content, response_class=response_class)
+        cases.append((name, setup, number // scale))
+
+    # The complete notification round-trip, against the local stub server.
+    cases.append(("NotificationView.get() round-trip", _make_notification_request, 1000 // scale))
+    return cases
+
+
+def _make_redirect():
+    checkout = make_checkout(1)
+    return messages.RedirectTransaction(
+        merchant=checkout.merchant,
+        transaction=checkout.transaction,
+        customer=checkout.customer,
+    )
+
+
+def _make_signature(stack):
+    redirect = _make_redirect()
+    return lambda: redirect.signature
+
+
+def _make_status(stack):
+    merchant = make_checkout(1).merchant
+    return lambda: messages.Status(merchant, '10217').to_xml()
+
+
+def _make_parser(stack, get_content, response_class):
+    content = get_content()
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    def parse():
+        return response_class.from_xml(ElementTree.fromstring(content))
+    return parse
+
+
+def _make_notification_request(stack):
+    server = start_server()
+    stack.callback(server.stop)
+    url = server.url
+
+    class StubClient(MultiSafepayClient):
+        api_url = url
+
+    class StubNotificationView(NotificationView):
+        client_class = StubClient
+
+    def receiver(sender, statusreply, **kwargs):
+        pass
+
+    order_status_updated.connect(receiver, weak=False)
+    stack.callback(order_status_updated.disconnect, receiver)
+    view = StubNotificationView.as_view()
+    request = RequestFactory().get('/notify/', {'transactionid': '10217'})
+
+    def notify():
+        response = view(request)
+        assert response.status_code == 200, response.content
+    return notify
+
+
+def get_environment():
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def print_results(results, baseline=None):
+    print("{0:<42} {1:>12} {2:>10} {3:>10} {4:>10} {5:>12}".format("benchmark", "ops/sec", "p50 us", "p90 us", "p99 us", "peak bytes"))
+    for result in results:
+        line = "{name:<42} {ops_per_sec:12.1f} {p50_us:10.1f} {p90_us:10.1f} {p99_us:10.1f} {alloc_peak_bytes:12d}".format(**result)
+        if baseline is not None and result['name'] in baseline:
+            line += " {0:6.2f}x".format(result['ops_per_sec'] / baseline[result['name']]['ops_per_sec'])
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--json', metavar='FILE', help="Write the results as JSON, use '-' for stdout.")
+    parser.add_argument('--compare', metavar='FILE', help="Show the speedup against a previous JSON result.")
+    parser.add_argument('--filter', metavar='TEXT', help="Only run the benchmarks that contain this text.")
+    parser.add_argument('--quick', action='store_true', help="Run fewer iterations.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict((result['name'], result) for result in json.load(f)['results'])
+
+    results = []
+    for name, setup, number in get_cases(quick=args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        with ExitStack() as stack:
+            results.append(measure(name, setup(stack), number=max(1, number)))
+
+    if args.json != '-':
+        print_results(results, baseline)
+
+    if args.json:
+        output = json.dumps({'environment': get_environment(), 'results': results}, indent=2, sort_keys=True)
+        if args.json == '-':
+            sys.stdout.write(output + '\n')
+        else:
+            with open(args.json, 'w') as f:
+                f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
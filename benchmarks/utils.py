@@ -0,0 +1,88 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+from timeit import default_timer
+
+
+def setup_django():
+    """
+    Configure a minimal Django environment, so the package can be imported.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import django
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(
+            MULTISAFEPAY_ACCOUNT_ID='10000000',
+            MULTISAFEPAY_SITE_ID='1000',
+            MULTISAFEPAY_SITE_CODE='123456',
+            ROOT_URLCONF='django_multisafepay.urls',
+            ALLOWED_HOSTS=['*'],
+            DATABASES={
+                'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            },
+        )
+        if hasattr(django, 'setup'):
+            django.setup()
+
+
+def bench(name, func, number, repeat=5):
+    """
+    Run a function several times, and print the best timing.
+    :return: The best time per call, in seconds.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print("{0:<40} {1:10.1f} us/call".format(name, best * 1e6))
+    return best
+
+
+def percentile(sorted_values, percent):
+    """
+    Return the percentile of a sorted list, using the nearest-rank method.
+    """
+    index = max(0, int(round(percent / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def measure(name, func, number, warmup=None):
+    """
+    Call a function ``number`` times, and collect the timings and memory usage.
+
+    :return: The throughput in ops/sec, latency percentiles in microseconds,
+             and the memory allocated by a single call, as measured by :mod:`tracemalloc`.
+    :rtype: dict
+    """
+    for i in range(warmup if warmup is not None else max(1, number // 10)):
+        func()
+
+    timings = []
+    for i in range(number):
+        start = default_timer()
+        func()
+        timings.append(default_timer() - start)
+    timings.sort()
+
+    # Measured in a separate pass, as tracing slows down the calls.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    func()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'number': number,
+        'ops_per_sec': number / sum(timings),
+        'mean_us': sum(timings) / number * 1e6,
+        'p50_us': percentile(timings, 50) * 1e6,
+        'p90_us': percentile(timings, 90) * 1e6,
+        'p99_us': percentile(timings, 99) * 1e6,
+        'max_us': timings[-1] * 1e6,
+        'alloc_peak_bytes': peak - before,
+        'alloc_retained_bytes': after - before,
+    }
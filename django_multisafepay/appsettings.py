@@ -1,15 +1,156 @@
 """
-Settings for this application
+Settings for this application.
+
+The settings are read when they are accessed, e.g. ``appsettings.MULTISAFEPAY_TESTING``.
+So importing this module doesn't read the Django settings yet, and changed settings (e.g. in tests) are picked up.
+The objects that are shared in the process (e.g. the connection pool) are created again
+when their settings are changed, see :func:`reset_on_change`.
 """
+import sys
+
 from django.conf import settings
 
-MULTISAFEPAY_ACCOUNT_ID = getattr(settings, 'MULTISAFEPAY_ACCOUNT_ID')
-MULTISAFEPAY_SITE_ID = getattr(settings, 'MULTISAFEPAY_SITE_ID')
-MULTISAFEPAY_SITE_CODE = getattr(settings, 'MULTISAFEPAY_SITE_CODE')
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+_REQUIRED = object()
+
+# The default value of each setting.
+_defaults = {
+    'MULTISAFEPAY_ACCOUNT_ID': _REQUIRED,
+    'MULTISAFEPAY_SITE_ID': _REQUIRED,
+    'MULTISAFEPAY_SITE_CODE': _REQUIRED,
+
+    # Whether to use the testing mode, or live mode.
+    'MULTISAFEPAY_TESTING': True,
+
+    # Use another URL for the API, e.g. the stub server of django_multisafepay.stubserver.
+    'MULTISAFEPAY_API_URL': None,
+
+    # Allow to define the URLs globally (e.g. using reverse_lazy())
+    'MULTISAFEPAY_REDIRECT_URL': None,
+    'MULTISAFEPAY_CANCEL_URL': None,
+
+    # Connection pooling for the API calls.
+    'MULTISAFEPAY_POOL_SIZE': 10,
+    'MULTISAFEPAY_KEEP_ALIVE': True,
+    'MULTISAFEPAY_POOL_IDLE_TIMEOUT': 60,
+
+    # The number of concurrent connections for the asyncio client.
+    'MULTISAFEPAY_ASYNC_POOL_SIZE': 100,
+
+    # Parse the replies incrementally, while they are being received.
+    'MULTISAFEPAY_STREAM_PARSING': False,
+
+    # The minimum size (in bytes) of the replies that are parsed incrementally. Smaller replies are parsed faster at once.
+    'MULTISAFEPAY_STREAM_PARSING_MIN_SIZE': 65536,
+
+    # Only parse the sections of a reply when they are accessed.
+    'MULTISAFEPAY_LAZY_REPLIES': False,
+
+    # Retain the XML tree in the replies (for logging), use 'compressed' to retain it as compressed text, or False to drop it.
+    'MULTISAFEPAY_KEEP_REPLY_XML': True,
+
+    # Caching of the gateways() call. The TTL is in seconds, use 0 to disable caching.
+    # The backend can be the alias of a Django cache, to share the cache between processes.
+    'MULTISAFEPAY_GATEWAYS_CACHE_TTL': 0,
+    'MULTISAFEPAY_GATEWAYS_CACHE_STALE_TTL': 0,
+    'MULTISAFEPAY_GATEWAYS_CACHE_SIZE': 100,
+    'MULTISAFEPAY_GATEWAYS_CACHE_BACKEND': None,
+
+    # Caching of the status() call, in the Django cache with this alias. Use None to disable caching.
+    # The TTL in seconds depends on the status, None caches forever. Statuses that are not listed are not cached.
+    # The entries are removed when a notification for the transaction arrives.
+    'MULTISAFEPAY_STATUS_CACHE_BACKEND': None,
+    'MULTISAFEPAY_STATUS_CACHE_TTLS': {
+        'initialized': 10,
+        'uncleared': 60,
+        'completed': 86400,
+        'void': 86400,
+        'declined': 86400,
+        'refunded': 86400,
+        'expired': 86400,
+    },
+
+    # Process notifications in a background worker, by storing them in a queue.
+    # For example, use 'django_multisafepay.notifications.DatabaseQueue'.
+    'MULTISAFEPAY_NOTIFICATION_QUEUE': None,
+    'MULTISAFEPAY_QUEUE_LOCK_TIMEOUT': 60,
+    'MULTISAFEPAY_QUEUE_MAX_ATTEMPTS': 10,
+
+    # Avoid duplicate work for repeated notifications of the same transaction.
+    # The window is in seconds, use 0 to disable. The backend can be the alias of a Django cache, to share it between processes.
+    'MULTISAFEPAY_NOTIFICATION_DEDUP_WINDOW': 0,
+    'MULTISAFEPAY_NOTIFICATION_DEDUP_SIZE': 1000,
+    'MULTISAFEPAY_NOTIFICATION_DEDUP_BACKEND': None,
+
+    # The debug logging of the API messages. The contents of the redacted fields are masked,
+    # and messages are truncated at the max length (use 0 or None to log the complete message).
+    'MULTISAFEPAY_LOG_REDACT_FIELDS': ('site_secure_code',),
+    'MULTISAFEPAY_LOG_MAX_LENGTH': 10000,
+
+    # Timeouts of the API calls, in seconds.
+    'MULTISAFEPAY_CONNECT_TIMEOUT': 10,
+    'MULTISAFEPAY_READ_TIMEOUT': 60,
+
+    # Retrying the status and gateways calls after connection errors, timeouts and 5xx responses.
+    'MULTISAFEPAY_RETRY_MAX_RETRIES': 2,
+    'MULTISAFEPAY_RETRY_BACKOFF': 0.5,
+    'MULTISAFEPAY_RETRY_MAX_BACKOFF': 5,
+
+    # Fail fast when the API failed too often, use 0 to disable the circuit breaker.
+    'MULTISAFEPAY_CIRCUIT_FAILURE_THRESHOLD': 0,
+    'MULTISAFEPAY_CIRCUIT_RESET_TIMEOUT': 30,
+
+    # Send a second request when a status or gateways call is slower than the given percentile of the recent calls.
+    # The budget is the maximum fraction of extra requests. The delays are in seconds.
+    'MULTISAFEPAY_HEDGE_REQUESTS': False,
+    'MULTISAFEPAY_HEDGE_PERCENTILE': 95,
+    'MULTISAFEPAY_HEDGE_BUDGET': 0.05,
+    'MULTISAFEPAY_HEDGE_MIN_DELAY': 0.05,
+    'MULTISAFEPAY_HEDGE_INITIAL_DELAY': 1.0,
+
+    # Store the last status of each transaction, and only send the order_status_updated signal when it changed.
+    # This requires adding 'django_multisafepay' to INSTALLED_APPS.
+    'MULTISAFEPAY_STATUS_SNAPSHOTS': False,
+
+    # The transactions that the multisafepay_reconcile command checks, as dotted path to a function that returns a queryset.
+    # By default, the pending transactions of the StatusSnapshot model are checked.
+    'MULTISAFEPAY_RECONCILE_QUERYSET': None,
+}
+
+
+def reset_on_change(prefixes, func):
+    """
+    Call ``func(setting)`` when a setting that starts with one of the prefixes is changed, e.g. by ``override_settings``.
+    This allows to drop the objects that were created from the old values.
+    """
+    def receiver(setting, **kwargs):
+        if setting.startswith(prefixes):
+            func(setting)
+
+    setting_changed.connect(receiver, weak=False)
+
+
+def __getattr__(name):
+    # Called for every setting, as they are not stored in this module (PEP 562).
+    try:
+        default = _defaults[name]
+    except KeyError:
+        raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+    if default is _REQUIRED:
+        return getattr(settings, name)
+    return getattr(settings, name, default)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_defaults))
 
-# Whether to use the testing mode, or live mode.
-MULTISAFEPAY_TESTING = getattr(settings, 'MULTISAFEPAY_TESTING', True)
 
-# Allow to define the URLs globally (e.g. using reverse_lazy())
-MULTISAFEPAY_REDIRECT_URL = getattr(settings, 'MULTISAFEPAY_REDIRECT_URL', None)
-MULTISAFEPAY_CANCEL_URL = getattr(settings, 'MULTISAFEPAY_CANCEL_URL', None)
+if sys.version_info < (3, 7):
+    # Module __getattr__ is not supported, read all settings directly.
+    for _name in _defaults:
+        globals()[_name] = __getattr__(_name)
@@ -0,0 +1,421 @@
+"""
+API calls to the payment gateway webservice, using asyncio.
+
+This requires Python 3.5+ and the ``aiohttp`` package,
+which can be installed using ``pip install django-multisafepay[async]``.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from itertools import islice
+from timeit import default_timer
+
+import aiohttp
+from django_multisafepay import appsettings, messages
+from django_multisafepay.cache import LocalCacheBackend
+from django_multisafepay.client import BulkStats, LogPayload, MultiSafepayClient
+from django_multisafepay.exceptions import MultiSafepayServerException
+from django_multisafepay.instrumentation import CONNECT, DOWNLOAD, NULL_TIMER, SERIALIZE, WAIT, start_timer
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConnectionPool(object):
+    """
+    A pool of keep-alive HTTP connections for asyncio.
+
+    Each event loop receives its own :class:`aiohttp.ClientSession`,
+    as these can't be shared between event loops.
+    """
+
+    def __init__(self, pool_size=100, keep_alive=True, idle_timeout=60):
+        """
+        :param pool_size: The maximum number of concurrent connections.
+        :param keep_alive: Whether connections should be reused between calls.
+        :param idle_timeout: Number of seconds after which idle connections are closed.
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self._sessions = weakref.WeakKeyDictionary()
+
+    async def post(self, url, headers, data, timer=NULL_TIMER, **kwargs):
+        """
+        Perform a POST request using a pooled connection.
+
+        :param timer: The timer of the API call, to record the phases of the request.
+        :type timer: CallTimer
+        :return: The status code, content type and body of the response.
+        :rtype: tuple
+        """
+        session = self.get_session()
+        if timer.enabled:
+            kwargs['trace_request_ctx'] = timer
+
+        async with session.post(url, headers=headers, data=data, **kwargs) as response:
+            timer.mark(WAIT)
+            content = await response.read()
+            timer.mark(DOWNLOAD)
+            if response.status >= 400:
+                logger.error(u"http failed: %s %s", response.status, LogPayload(content))
+                response.raise_for_status()
+            return response.status, response.headers.get('Content-Type', ''), content
+
+    def get_session(self):
+        """
+        Return the session for the currently running event loop.
+        :rtype: aiohttp.ClientSession
+        """
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self.create_session()
+            self._sessions[loop] = session
+        return session
+
+    def create_session(self):
+        """
+        Create the session object. This method can be overwritten to provide custom connector settings.
+        :rtype: aiohttp.ClientSession
+        """
+        if self.keep_alive:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.idle_timeout)
+        else:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=True)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self.get_trace_config()])
+
+    def get_trace_config(self):
+        """
+        Report the time it takes to open new connections to the timer of the API call.
+        :rtype: aiohttp.TraceConfig
+        """
+        async def on_connection_create_start(session, context, params):
+            context.connect_start = default_timer()
+
+        async def on_connection_create_end(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.add(CONNECT, default_timer() - context.connect_start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    async def close(self):
+        """
+        Close all open connections of the currently running event loop.
+        """
+        session = self._sessions.pop(asyncio.get_event_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+# The cached calls that are currently running, to avoid fetching the same entry twice.
+_inflight = {}
+
+# The background refreshes of stale cache entries, which are referenced until they are done.
+_refresh_tasks = set()
+
+
+def get_default_async_pool():
+    """
+    Return the asyncio connection pool that is shared by all clients in this process.
+    :rtype: AsyncConnectionPool
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = AsyncConnectionPool(
+                    pool_size=appsettings.MULTISAFEPAY_ASYNC_POOL_SIZE,
+                    keep_alive=appsettings.MULTISAFEPAY_KEEP_ALIVE,
+                    idle_timeout=appsettings.MULTISAFEPAY_POOL_IDLE_TIMEOUT,
+                )
+    return _default_pool
+
+
+def _setting_changed(setting):
+    # The old pool can only be closed from its event loop, the clients that use it keep doing so.
+    global _default_pool
+    _default_pool = None
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_ASYNC_POOL_SIZE', 'MULTISAFEPAY_POOL_IDLE_TIMEOUT', 'MULTISAFEPAY_KEEP_ALIVE'), _setting_changed)
+
+
+class AsyncMultiSafepayClient(MultiSafepayClient):
+    """
+    The MultiSafepay API client, for asyncio.
+
+    This provides the same methods as :class:`~django_multisafepay.client.MultiSafepayClient`,
+    but all API calls return an awaitable instead::
+
+        client = AsyncMultiSafepayClient()
+        statusreply = await client.status(transaction_id)
+    """
+
+    def get_default_pool(self):
+        return get_default_async_pool()
+
+    async def _call(self, message, response_class=None):
+        """
+        Make the call to the server.
+        Idempotent calls are retried after transient failures, as decided by the :attr:`retry_policy`.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        retries = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+
+            try:
+                if self.hedging_policy is not None and self.hedging_policy.applies_to(message):
+                    reply = await self._send_hedged(message, response_class)
+                else:
+                    reply = await self._send(message, response_class)
+            except Exception as e:
+                if not self._is_transient_error(e):
+                    self._record_result(success=self._get_error_result(e))
+                    raise
+
+                self._record_result(success=False)
+                if not self.retry_policy.can_retry(message, retries):
+                    raise
+
+                delay = self.retry_policy.get_delay(retries)
+                retries += 1
+                logger.warning(u"Request <%s> to MultiSafepay failed: %s, retry %d in %.2fs", message.xml_name, e, retries, delay)
+                await asyncio.sleep(delay)
+            else:
+                self._record_result(success=True)
+                return reply
+
+    async def _send_hedged(self, message, response_class=None):
+        """
+        Send the message, and send it again when there is no answer within the usual response time.
+        The first answer is returned, and the other request is cancelled.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        policy = self.hedging_policy
+
+        async def send():
+            start = default_timer()
+            reply = await self._send(message, response_class)
+            policy.record(message.xml_name, default_timer() - start)
+            return reply
+
+        delay = policy.start_call(message.xml_name)
+        tasks = {asyncio.ensure_future(send())}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and policy.acquire_hedge():
+                logger.debug(u"Request <%s> took more than %.3fs, sending hedged request", message.xml_name, delay)
+                tasks.add(asyncio.ensure_future(send()))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        # Wait for the other request, if any.
+                        error = error or e
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _is_transient_error(self, exception):
+        if isinstance(exception, aiohttp.ClientResponseError):
+            return exception.status >= 500
+        return isinstance(exception, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+    async def _send(self, message, response_class=None):
+        """
+        Send the message to the server, once.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        timer = start_timer(self.__class__, message.xml_name)
+        try:
+            postdata = self._get_postdata(message)
+            timer.mark(SERIALIZE)
+
+            connect_timeout, read_timeout = self.get_timeout()
+            status_code, content_type, content = await self.pool.post(
+                self.api_url,
+                headers=self.get_headers(),
+                data=postdata,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+                timer=timer,
+            )
+
+            if self._use_stream_parsing(response_class, len(content)):
+                # The body is already received, but this gives the same reply objects as the synchronous client.
+                reply = self._parse_response_stream(message, content_type, [content], response_class, timer=timer)
+            else:
+                reply = self._parse_response(message, content_type, content, response_class, timer=timer)
+        except Exception as e:
+            timer.finish(error=e)
+            raise
+
+        timer.finish()
+        return reply
+
+    async def _transaction_call(self, message, response_class=None):
+        """
+        A variant of the standard ``_call()`` that logs the transaction ID on errors.
+
+        :type message: RedirectTransaction
+        :type response_class: RedirectTransactionReply
+        :rtype: RedirectTransactionReply
+        """
+        try:
+            return await self._call(message, response_class=response_class)
+        except MultiSafepayServerException as e:
+            # Be more verbose in the logs.
+            logger.error(u"Failed to start transaction %s: code=%s, description=%s", message.transaction.id, e.code, e.description)
+            if e.code == e.CODE_INVALID_TRANSACTION_ID:
+                # Mention transaction ID in exception message
+                raise MultiSafepayServerException(e.code, u"{0} ({1})".format(e.description, message.transaction.id))
+            raise
+
+    async def status(self, transaction_id, refresh=False):
+        """
+        Request the status of a transaction.
+
+        The reply is cached when ``MULTISAFEPAY_STATUS_CACHE_BACKEND`` is set.
+
+        :param refresh: Always fetch the status from the server, and replace the cached status.
+        :rtype: StatusReply
+        """
+        cache = self.get_status_cache()
+        if cache is None:
+            return await self._fetch_status(transaction_id)
+
+        key = self._get_status_cache_key(transaction_id)
+        if not refresh:
+            statusreply = await _run_cache_io(cache, cache.get, key)
+            if statusreply is not None:
+                return statusreply
+
+        statusreply = await self._fetch_status(transaction_id)
+        await _run_cache_io(cache, cache.store, key, statusreply)
+        return statusreply
+
+    async def _fetch_status(self, transaction_id):
+        # Not calling super(), as its exception handler doesn't see the errors of the awaitable it returns.
+        request = messages.Status(self.merchant, transaction_id)
+        try:
+            return await self._call(request, response_class=messages.StatusReply)
+        except MultiSafepayServerException as e:
+            # Be more verbose in the logs.
+            logger.error(u"Failed to fetch status for transaction %s: code=%s, description=%s", transaction_id, e.code, e.description)
+            raise
+
+    async def status_many(self, transaction_ids, max_workers=None, stats=None, refresh=False):
+        """
+        Request the status of many transactions concurrently.
+
+        This is an asynchronous generator, which yields ``(transaction_id, result)`` tuples in completion order.
+        When a call failed, the result is the exception instead of a :class:`StatusReply`.
+
+        :param transaction_ids: The transactions to fetch, this can be any (lazy) iterable.
+        :param max_workers: The maximum number of concurrent calls. Defaults to the connection pool size.
+        :param stats: Optional statistics object, which is filled with throughput statistics.
+        :type stats: BulkStats
+        :param refresh: Always fetch the statuses from the server, see :meth:`status`.
+        """
+        max_workers = max_workers or self.pool.pool_size
+        stats = stats if stats is not None else BulkStats()
+        transaction_ids = iter(transaction_ids)
+        pending = {}
+
+        stats.start()
+        try:
+            for transaction_id in islice(transaction_ids, max_workers):
+                pending[asyncio.ensure_future(self.status(transaction_id, refresh))] = transaction_id
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    transaction_id = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = e
+                    stats.add(result)
+
+                    for next_id in islice(transaction_ids, 1):
+                        pending[asyncio.ensure_future(self.status(next_id, refresh))] = next_id
+
+                    yield transaction_id, result
+        finally:
+            for future in pending:
+                future.cancel()
+            stats.stop()
+            logger.info(u"Fetched status of transactions: %s", stats)
+
+    async def gateways(self, locale, country):
+        """
+        Request all available gateways (Connect method)
+
+        The reply is cached when ``MULTISAFEPAY_GATEWAYS_CACHE_TTL`` is set.
+
+        :param locale: Language code, e.g. en_US
+        :param country: The 2-digit country code, in ISO 3166
+        :rtype: GatewaysReply
+        """
+        cache = self.get_gateways_cache()
+        if cache is None:
+            return await self._fetch_gateways(locale, country)
+
+        key = self._get_gateways_cache_key(locale, country)
+        found = await _run_cache_io(cache, cache.lookup, key)
+        if found is not None:
+            value, is_fresh = found
+            if not is_fresh and (asyncio.get_event_loop(), key) not in _inflight:
+                task = asyncio.ensure_future(self._fetch_cached(cache, key, locale, country))
+                _refresh_tasks.add(task)
+                task.add_done_callback(_refresh_done)
+            return value
+
+        return await self._fetch_cached(cache, key, locale, country)
+
+    async def _fetch_cached(self, cache, key, locale, country):
+        # Make sure only one task fetches the same entry.
+        # Futures can't be shared between event loops, hence the loop is part of the key.
+        inflight_key = (asyncio.get_event_loop(), key)
+        future = _inflight.get(inflight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = _inflight[inflight_key] = asyncio.ensure_future(self._fetch_gateways(locale, country))
+        try:
+            value = await future
+        finally:
+            del _inflight[inflight_key]
+        await _run_cache_io(cache, cache.store, key, value)
+        return value
+
+    # The start_checkout(), redirect_transaction() and direct_transaction()
+    # methods are inherited; they return the awaitable of the ``_call()`` methods above.
+
+
+async def _run_cache_io(cache, func, *args):
+    # The Django cache backends make a network round-trip, e.g. to Redis or memcached,
+    # which would block the event loop. Only the in-process cache is accessed directly.
+    if isinstance(cache.backend, LocalCacheBackend):
+        return func(*args)
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+def _refresh_done(task):
+    _refresh_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(u"Failed to refresh cache entry", exc_info=task.exception())
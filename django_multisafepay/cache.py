@@ -0,0 +1,325 @@
+"""
+Caching of API replies that rarely change, such as the list of gateways and the status of transactions.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django_multisafepay import appsettings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCacheBackend(object):
+    """
+    An in-process cache, which evicts the least recently used entries when it's full.
+    """
+
+    def __init__(self, max_size=100):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._set(key, value, timeout)
+
+    def add(self, key, value, timeout):
+        """
+        Store the value only when the key doesn't exist yet.
+        :return: Whether the value was stored.
+        """
+        with self._lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, value, timeout)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _get(self, key):
+        try:
+            value, expires = self._data.pop(key)
+        except KeyError:
+            return None
+        if expires is not None and expires <= time.time():
+            return None
+        self._data[key] = (value, expires)  # Mark as most recently used.
+        return value
+
+    def _set(self, key, value, timeout):
+        self._data.pop(key, None)
+        self._data[key] = (value, time.time() + timeout if timeout is not None else None)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
+class DjangoCacheBackend(object):
+    """
+    Store the entries in a Django cache, so they are shared between processes.
+    """
+
+    def __init__(self, alias='default', key_prefix='multisafepay:'):
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        try:
+            from django.core.cache import caches
+        except ImportError:  # Django < 1.7
+            from django.core.cache import get_cache
+            return get_cache(self.alias)
+        else:
+            return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(self.key_prefix + key, value, timeout)
+
+    def add(self, key, value, timeout):
+        return self.cache.add(self.key_prefix + key, value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.key_prefix + key)
+
+
+class ReplyCache(object):
+    """
+    A read-through cache for API calls.
+
+    * Entries are fresh for ``ttl`` seconds.
+    * During the next ``stale_ttl`` seconds, the stale entry is returned while it's refreshed in the background.
+    * When multiple threads request the same missing entry, only one of them makes the API call.
+    """
+
+    def __init__(self, backend, ttl, stale_ttl=0):
+        """
+        :param backend: The storage, e.g. :class:`LocalCacheBackend` or :class:`DjangoCacheBackend`.
+        :param ttl: The number of seconds an entry is fresh.
+        :param stale_ttl: The number of seconds an expired entry may still be returned while it's refreshed.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def lookup(self, key):
+        """
+        Find an entry in the cache.
+
+        :return: A tuple of the value and whether it's still fresh, or ``None`` when the entry is missing or expired.
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at = entry
+        age = time.time() - stored_at
+        if age < self.ttl:
+            return value, True
+        elif age < self.ttl + self.stale_ttl:
+            return value, False
+        else:
+            return None
+
+    def store(self, key, value):
+        """
+        Store an entry in the cache.
+        """
+        self.backend.set(key, (value, time.time()), self.ttl + self.stale_ttl)
+
+    def delete(self, key):
+        """
+        Remove an entry from the cache.
+        """
+        self.backend.delete(key)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value, or call ``fetch()`` to retrieve it.
+        """
+        found = self.lookup(key)
+        if found is not None:
+            value, is_fresh = found
+            if not is_fresh:
+                self._refresh_in_background(key, fetch)
+            return value
+
+        return self._fetch(key, fetch)
+
+    def _fetch(self, key, fetch, wait=True):
+        # Make sure only one thread fetches the same entry.
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = Future()
+
+        if not is_leader:
+            return future.result() if wait else None
+
+        try:
+            value = fetch()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _refresh_in_background(self, key, fetch):
+        if key in self._inflight:
+            return
+
+        def _refresh():
+            try:
+                self._fetch(key, fetch, wait=False)
+            except Exception:
+                logger.exception("Failed to refresh cache entry %s", key)
+
+        thread = threading.Thread(target=_refresh)
+        thread.daemon = True
+        thread.start()
+
+
+class StatusCache(object):
+    """
+    A read-through cache for the status of transactions.
+
+    The time an entry is kept depends on the status, as pending transactions change soon,
+    while completed transactions rarely do. The entries are stored in the compact format of
+    :mod:`django_multisafepay.codec`, so the cached replies don't have the ``_xml`` attribute.
+    """
+
+    def __init__(self, backend, ttls):
+        """
+        :param backend: The storage, typically a :class:`DjangoCacheBackend`.
+        :param ttls: The number of seconds to keep an entry, by status code. ``None`` keeps the entry forever.
+                     Statuses that are not listed are not cached.
+        :type ttls: dict
+        """
+        self.backend = backend
+        self.ttls = ttls
+
+    def get(self, key):
+        """
+        Find a status in the cache.
+
+        :return: The reply, or ``None`` when it's not cached.
+        :rtype: StatusReply
+        """
+        from django_multisafepay import codec
+        try:
+            entry = self.backend.get(key)
+            if entry is None:
+                return None
+            return codec.loads(entry)
+        except Exception:
+            # E.g. written by another version, or the cache server is down. Fetch it again.
+            logger.warning("Failed to read status %s from the cache", key, exc_info=True)
+            return None
+
+    def store(self, key, statusreply):
+        """
+        Store a status in the cache, for as long as its status code allows.
+        """
+        try:
+            timeout = self.ttls[statusreply.status_code]
+        except KeyError:
+            return
+        if timeout is not None and timeout <= 0:
+            return
+
+        from django_multisafepay import codec
+        try:
+            self.backend.set(key, codec.dumps(statusreply), timeout)
+        except Exception:
+            # The status is fetched already, so continue without the cache.
+            logger.exception("Failed to store status %s in the cache", key)
+
+    def delete(self, key):
+        """
+        Remove a status from the cache.
+        """
+        try:
+            self.backend.delete(key)
+        except Exception:
+            logger.exception("Failed to remove status %s from the cache", key)
+
+
+_gateways_cache = None
+_status_cache = None
+_lock = threading.Lock()
+
+
+def get_gateways_cache():
+    """
+    Return the cache for the gateways call, that is shared by all clients in this process.
+    :return: The cache, or ``None`` when caching is disabled.
+    :rtype: ReplyCache
+    """
+    global _gateways_cache
+    if not appsettings.MULTISAFEPAY_GATEWAYS_CACHE_TTL:
+        return None
+
+    if _gateways_cache is None:
+        with _lock:
+            if _gateways_cache is None:
+                if appsettings.MULTISAFEPAY_GATEWAYS_CACHE_BACKEND:
+                    backend = DjangoCacheBackend(appsettings.MULTISAFEPAY_GATEWAYS_CACHE_BACKEND)
+                else:
+                    backend = LocalCacheBackend(max_size=appsettings.MULTISAFEPAY_GATEWAYS_CACHE_SIZE)
+
+                _gateways_cache = ReplyCache(
+                    backend,
+                    ttl=appsettings.MULTISAFEPAY_GATEWAYS_CACHE_TTL,
+                    stale_ttl=appsettings.MULTISAFEPAY_GATEWAYS_CACHE_STALE_TTL,
+                )
+    return _gateways_cache
+
+
+def get_status_cache():
+    """
+    Return the cache for the status call, as configured by the ``MULTISAFEPAY_STATUS_CACHE_...`` settings.
+    :return: The cache, or ``None`` when caching is disabled.
+    :rtype: StatusCache
+    """
+    global _status_cache
+    if not appsettings.MULTISAFEPAY_STATUS_CACHE_BACKEND:
+        return None
+
+    if _status_cache is None:
+        with _lock:
+            if _status_cache is None:
+                _status_cache = StatusCache(
+                    DjangoCacheBackend(appsettings.MULTISAFEPAY_STATUS_CACHE_BACKEND),
+                    ttls=appsettings.MULTISAFEPAY_STATUS_CACHE_TTLS,
+                )
+    return _status_cache
+
+
+def _setting_changed(setting):
+    global _gateways_cache, _status_cache
+    if setting.startswith('MULTISAFEPAY_GATEWAYS_CACHE_'):
+        _gateways_cache = None
+    else:
+        _status_cache = None
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_GATEWAYS_CACHE_', 'MULTISAFEPAY_STATUS_CACHE_'), _setting_changed)
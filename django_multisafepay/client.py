@@ -2,14 +2,25 @@
 API calls to the payment gateway webservice
 """
 import logging
+import re
+import time
+from contextlib import closing
+from itertools import islice
+from timeit import default_timer
 from xml.etree import ElementTree
 
-import requests
+from django.utils.translation import to_locale
 from django_multisafepay import __version__ as package_version
 from django_multisafepay import appsettings, messages
 from django_multisafepay.data import Merchant, Plugin
 from django_multisafepay.data.gateway import GatewayCustomer
-from django_multisafepay.exceptions import MultiSafepayException, MultiSafepayServerException
+from django_multisafepay.exceptions import MultiSafepayException, MultiSafepayInvalidResponse, MultiSafepayServerException
+from django_multisafepay.instrumentation import CONSTRUCT, DOWNLOAD, NULL_TIMER, PARSE, SERIALIZE, WAIT, start_timer
+from django_multisafepay.messages.parser import StreamParser
+from django_multisafepay.resilience import get_circuit_breaker, get_default_retry_policy
+
+# The transport (with the requests package), caches and hedging are imported on first use,
+# so importing this module stays cheap, e.g. for management commands that don't make API calls.
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +28,98 @@ logger = logging.getLogger(__name__)
 URL_TEST = "https://testapi.multisafepay.com/ewx/"
 URL_LIVE = "https://api.multisafepay.com/ewx/"
 
+STREAM_CHUNK_SIZE = 8192
+
+
+class LogPayload(object):
+    """
+    A message body in the log, which is only decoded and formatted when the log record is emitted.
+
+    Sensitive fields are redacted, and large payloads are truncated,
+    as configured by the ``MULTISAFEPAY_LOG_REDACT_FIELDS`` and ``MULTISAFEPAY_LOG_MAX_LENGTH`` settings.
+    """
+    _patterns = {}
+
+    def __init__(self, data, redact_fields=None, max_length=None):
+        """
+        :param data: The XML message, as text or bytes.
+        :param redact_fields: The XML tags of which the contents are masked.
+        :param max_length: The maximum number of characters to log.
+        """
+        self.data = data
+        self.redact_fields = redact_fields if redact_fields is not None else appsettings.MULTISAFEPAY_LOG_REDACT_FIELDS
+        self.max_length = max_length if max_length is not None else appsettings.MULTISAFEPAY_LOG_MAX_LENGTH
+
+    def __str__(self):
+        text = self.data
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', 'replace')
+
+        if self.redact_fields:
+            text = self._get_pattern(tuple(self.redact_fields)).sub(u'<\\1>***</\\1>', text)
+
+        if self.max_length and len(text) > self.max_length:
+            text = u"{0}... ({1} characters truncated)".format(text[:self.max_length], len(text) - self.max_length)
+        return text
+
+    __unicode__ = __str__  # Python 2
+
+    @classmethod
+    def _get_pattern(cls, redact_fields):
+        pattern = cls._patterns.get(redact_fields)
+        if pattern is None:
+            tags = u'|'.join(re.escape(field) for field in redact_fields)
+            pattern = cls._patterns[redact_fields] = re.compile(u'<({0})>.*?</\\1>'.format(tags), re.DOTALL)
+        return pattern
+
+
+class BulkStats(object):
+    """
+    Throughput statistics of a bulk call, such as :meth:`MultiSafepayClient.status_many`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.time()
+
+    def stop(self):
+        self.finished = time.time()
+
+    def add(self, result):
+        self.count += 1
+        if isinstance(result, Exception):
+            self.errors += 1
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rate(self):
+        """
+        The number of calls per second.
+        """
+        elapsed = self.elapsed
+        return self.count / elapsed if elapsed else 0.0
+
+    def __str__(self):
+        return "{0} calls, {1} errors in {2:.1f}s ({3:.1f} calls/s)".format(self.count, self.errors, self.elapsed, self.rate)
+
 
 class MultiSafepayClient(object):
     """
     The MultiSafepay API client.
     """
 
-    def __init__(self, merchant=None, plugin=None, is_test=None):
+    def __init__(self, merchant=None, plugin=None, is_test=None, pool=None, stream_parsing=None, lazy_replies=None,
+                 retry_policy=None, circuit_breaker=None, hedging_policy=None, keep_xml=None):
         """
         Provide account details to call the service.
 
@@ -33,62 +129,330 @@ class MultiSafepayClient(object):
         :type plugin: Plugin
         :param is_test: Whether to use testing mode. Using ``None`` defaults to the defined setting value.
         :type is_test: bool
+        :param pool: The connection pool to use. By default, the pool is shared between all clients in the process.
+        :type pool: ConnectionPool
+        :param stream_parsing: Whether to parse replies incrementally while they are received.
+                               Using ``None`` defaults to the defined setting value.
+        :type stream_parsing: bool
+        :param lazy_replies: Whether the sections of a reply are only parsed when they are first accessed.
+                             Using ``None`` defaults to the defined setting value.
+        :type lazy_replies: bool
+        :param retry_policy: Which calls are retried after transient failures. By default, the settings are used.
+        :type retry_policy: RetryPolicy
+        :param circuit_breaker: The circuit breaker, which is shared by all clients for the same API URL by default.
+        :type circuit_breaker: CircuitBreaker
+        :param hedging_policy: When to send a second request for slow read-only calls. By default, the settings are used.
+        :type hedging_policy: HedgingPolicy
+        :param keep_xml: Whether the replies retain their XML tree as ``_xml`` attribute, ``'compressed'`` retains it as compressed text.
+                         Using ``None`` defaults to the defined setting value.
+        :type keep_xml: bool | str
         """
         self.merchant = merchant or Merchant()
         self.plugin = plugin or Plugin()
         self.is_test = is_test if is_test is not None else appsettings.MULTISAFEPAY_TESTING
+        self.pool = pool or self.get_default_pool()
+        self.stream_parsing = stream_parsing if stream_parsing is not None else appsettings.MULTISAFEPAY_STREAM_PARSING
+        self.lazy_replies = lazy_replies if lazy_replies is not None else appsettings.MULTISAFEPAY_LAZY_REPLIES
+        self.retry_policy = retry_policy or get_default_retry_policy()
+        self.circuit_breaker = circuit_breaker or self.get_circuit_breaker()
+        if hedging_policy is None:
+            from django_multisafepay.hedging import get_default_hedging_policy
+            hedging_policy = get_default_hedging_policy()
+        self.hedging_policy = hedging_policy
+        self.keep_xml = keep_xml if keep_xml is not None else appsettings.MULTISAFEPAY_KEEP_REPLY_XML
 
     @property
     def api_url(self):
+        if appsettings.MULTISAFEPAY_API_URL:
+            return appsettings.MULTISAFEPAY_API_URL
         return URL_TEST if self.is_test else URL_LIVE
 
+    def get_default_pool(self):
+        """
+        Return the connection pool to use when none is given to the constructor.
+        """
+        from django_multisafepay.transport import get_default_pool
+        return get_default_pool()
+
+    def get_circuit_breaker(self):
+        """
+        Return the circuit breaker to use when none is given to the constructor, or ``None`` to disable it.
+        :rtype: CircuitBreaker
+        """
+        return get_circuit_breaker(self.api_url)
+
+    def get_timeout(self):
+        """
+        Return the connect and read timeout of the API calls, in seconds.
+        :rtype: tuple
+        """
+        return appsettings.MULTISAFEPAY_CONNECT_TIMEOUT, appsettings.MULTISAFEPAY_READ_TIMEOUT
+
+    def get_gateways_cache(self):
+        """
+        Return the cache for the :meth:`gateways` call, or ``None`` to disable caching.
+        :rtype: ReplyCache
+        """
+        from django_multisafepay.cache import get_gateways_cache
+        return get_gateways_cache()
+
+    def get_status_cache(self):
+        """
+        Return the cache for the :meth:`status` call, or ``None`` to disable caching.
+        :rtype: StatusCache
+        """
+        from django_multisafepay.cache import get_status_cache
+        return get_status_cache()
+
+    def get_headers(self):
+        """
+        Return the HTTP headers to send with every call.
+        """
+        return {
+            'Content-Type': 'text/xml',
+            'Accept': 'text/xml; charset=utf-8',
+            'User-Agent': 'django-multisafepay/{0}'.format(package_version),
+        }
+
     def _call(self, message, response_class=None):
         """
-        Make the call to the server
+        Make the call to the server.
+        Idempotent calls are retried after transient failures, as decided by the :attr:`retry_policy`.
         :rtype: :class:`xml.etree.ElementTree.Element` | response_class
         """
-        postdata = message.to_xml()
-        logger.debug(u"sending to {0}:\n{1}".format(self.api_url, postdata))
-
-        response = requests.post(
-            self.api_url,
-            headers={
-                'Content-Type': 'text/xml',
-                'Accept': 'text/xml; charset=utf-8',
-                'User-Agent': 'django-multisafepay/{0}'.format(package_version),
-            },
-            data=postdata.encode('utf-8'),
-            allow_redirects=False,
-            verify=True
-        )
+        retries = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+
+            try:
+                if self.hedging_policy is not None and self.hedging_policy.applies_to(message):
+                    reply = self._send_hedged(message, response_class)
+                else:
+                    reply = self._send(message, response_class)
+            except Exception as e:
+                if not self._is_transient_error(e):
+                    self._record_result(success=self._get_error_result(e))
+                    raise
+
+                self._record_result(success=False)
+                if not self.retry_policy.can_retry(message, retries):
+                    raise
+
+                delay = self.retry_policy.get_delay(retries)
+                retries += 1
+                logger.warning(u"Request <%s> to MultiSafepay failed: %s, retry %d in %.2fs", message.xml_name, e, retries, delay)
+                time.sleep(delay)
+            else:
+                self._record_result(success=True)
+                return reply
+
+    def _send_hedged(self, message, response_class=None):
+        """
+        Send the message, and send it again when there is no answer within the usual response time.
+        The first answer is returned. The other request can't be interrupted, but its answer is ignored.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from django_multisafepay.hedging import get_hedging_executor
+
+        policy = self.hedging_policy
+        executor = get_hedging_executor()
+
+        def send():
+            start = default_timer()
+            reply = self._send(message, response_class)
+            policy.record(message.xml_name, default_timer() - start)
+            return reply
+
+        delay = policy.start_call(message.xml_name)
+        futures = [executor.submit(send)]
+        done, _ = wait(futures, timeout=delay)
+        if not done and policy.acquire_hedge():
+            logger.debug(u"Request <%s> took more than %.3fs, sending hedged request", message.xml_name, delay)
+            futures.append(executor.submit(send))
+
+        error = None
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    # Wait for the other request, if any.
+                    error = error or e
+                else:
+                    for other in futures:
+                        other.cancel()
+                    return reply
+        raise error
+
+    def _record_result(self, success):
+        """
+        Report the outcome of a call to the circuit breaker. Use ``None`` when the call didn't tell whether the API is available.
+        """
+        if self.circuit_breaker is not None:
+            if success is None:
+                self.circuit_breaker.record_inconclusive()
+            elif success:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+
+    def _get_error_result(self, exception):
+        """
+        Tell how a call that failed with a non-transient error counts for the circuit breaker.
+        :return: ``True`` when the API replied with an error message, ``False`` for an invalid response,
+                 and ``None`` for errors at the client side.
+        """
+        if isinstance(exception, MultiSafepayServerException):
+            return True  # The server is up, but rejected the call.
+        elif isinstance(exception, (MultiSafepayInvalidResponse, ElementTree.ParseError)):
+            return False
+        else:
+            return None
+
+    def _is_transient_error(self, exception):
+        """
+        Tell whether the call failed due to a problem that could be gone when the call is retried.
+        """
+        import requests
+        if isinstance(exception, requests.HTTPError):
+            return exception.response is not None and exception.response.status_code >= 500
+        return isinstance(exception, (requests.ConnectionError, requests.Timeout))
 
-        # Raise on invalid status
-        if response.status_code >= 400:
-            logger.error(u"http failed: {0} {1}".format(response.status_code, response.content))
-            response.raise_for_status()
+    def _send(self, message, response_class=None):
+        """
+        Send the message to the server, once.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        timer = start_timer(self.__class__, message.xml_name)
+        try:
+            postdata = self._get_postdata(message)
+            timer.mark(SERIALIZE)
+
+            with timer:
+                response = self.pool.post(
+                    self.api_url,
+                    headers=self.get_headers(),
+                    data=postdata,
+                    allow_redirects=False,
+                    verify=True,
+                    timeout=self.get_timeout(),
+                    stream=self.stream_parsing or timer.enabled  # Allows to time the download separately.
+                )
+            timer.mark(WAIT)
+
+            with closing(response):
+                # Raise on invalid status
+                if response.status_code >= 400:
+                    logger.error(u"http failed: %s %s", response.status_code, LogPayload(response.content))
+                    response.raise_for_status()
+
+                if self._use_stream_parsing(response_class, response.headers.get('Content-Length')):
+                    chunks = response.iter_content(STREAM_CHUNK_SIZE)
+                    reply = self._parse_response_stream(message, response.headers['Content-Type'], chunks, response_class, timer=timer)
+                else:
+                    content = response.content
+                    timer.mark(DOWNLOAD)
+                    reply = self._parse_response(message, response.headers['Content-Type'], content, response_class, timer=timer)
+        except Exception as e:
+            timer.finish(error=e)
+            raise
+
+        timer.finish()
+        return reply
+
+    def _use_stream_parsing(self, response_class, content_length=None):
+        """
+        Tell whether the response is parsed incrementally.
+        This is only possible for reply classes that are constructed from their ``xml_sections``.
 
-        if '/xml' not in response.headers['Content-Type']:
-            raise MultiSafepayException("Received invalid content-type: {0}".format(response.headers['Content-Type']))
+        Incremental parsing takes more CPU time, and only lowers the peak memory for large replies,
+        such as a long list of gateways. Replies below ``MULTISAFEPAY_STREAM_PARSING_MIN_SIZE`` are parsed at once.
+
+        :param content_length: The size of the reply, when known.
+        """
+        if not self.stream_parsing or (response_class is not None and not response_class._uses_xml_sections()):
+            return False
+        return content_length is None or int(content_length) >= appsettings.MULTISAFEPAY_STREAM_PARSING_MIN_SIZE
+
+    def _get_postdata(self, message):
+        """
+        Serialize the message that is sent to the server.
+        This part is shared between the synchronous and asynchronous client.
+        :rtype: bytes
+        """
+        postdata = message.to_xml()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(u"sending to %s:\n%s", self.api_url, LogPayload(postdata))
+        return postdata.encode('utf-8')
+
+    def _parse_response(self, message, content_type, content, response_class=None, timer=NULL_TIMER):
+        """
+        Parse the response of the server.
+        This part is shared between the synchronous and asynchronous client.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        if '/xml' not in content_type:
+            raise MultiSafepayInvalidResponse("Received invalid content-type: {0}".format(content_type))
 
         # Fix MultiSafepay response header error.
         # Encoding is only specified in the <?xml preamble, not in the HTTP Content-Type header.
-        # "response.text" parses the response in the proper encoding format.
-        # "response.content" is the raw content, that's being sent to the XML parser.
-        response.encoding = 'utf-8'
-        logger.debug(u"http succeeded: {0}".format(response.text))
+        # The text is only decoded as UTF-8 for logging, the raw content is sent to the XML parser.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(u"http succeeded: %s", LogPayload(content))
 
-        xml = ElementTree.fromstring(response.content)  # parser=ElementTree.XMLParser(encoding=response.encoding))  # Python 2.6 doesn't support this.
+        xml = ElementTree.fromstring(content)  # parser=ElementTree.XMLParser(encoding='utf-8'))  # Python 2.6 doesn't support this.
+        self._check_result(message, xml)
+        timer.mark(PARSE)
 
-        if xml.attrib['result'] != 'ok':
-            ex = MultiSafepayServerException.from_xml(xml)
-            logger.error(u"Request <%s> to MultiSafePay failed: code=%s, description=%s", message.xml_name, ex.code, ex.description)
-            raise ex
+        if response_class is not None:
+            reply = response_class.from_xml(xml, lazy=self.lazy_replies, keep_xml=self.keep_xml)
+            timer.mark(CONSTRUCT)
+            return reply
+        else:
+            return xml
+
+    def _parse_response_stream(self, message, content_type, chunks, response_class=None, timer=NULL_TIMER):
+        """
+        Parse the response of the server incrementally, while it's being received.
+        The reply objects are constructed directly, without building the complete XML tree.
+        This means the ``_xml`` attribute of the reply is not filled.
+        :rtype: :class:`xml.etree.ElementTree.Element` | response_class
+        """
+        if '/xml' not in content_type:
+            raise MultiSafepayInvalidResponse("Received invalid content-type: {0}".format(content_type))
+
+        # The sections are constructed while parsing, so that time is included in the parse phase.
+        parser = StreamParser(response_class)
+        for chunk in chunks:
+            timer.mark(DOWNLOAD)
+            parser.feed(chunk)
+            timer.mark(PARSE)
+        xml = parser.close()
+
+        logger.debug(u"http succeeded: <%s result=\"%s\">", xml.tag, xml.get('result'))
+        self._check_result(message, xml)
+        timer.mark(PARSE)
 
         if response_class is not None:
-            return response_class.from_xml(xml)
+            reply = parser.get_reply()
+            timer.mark(CONSTRUCT)
+            return reply
         else:
             return xml
 
+    def _check_result(self, message, xml):
+        """
+        Raise an exception when the server reported an error.
+        """
+        if xml.attrib['result'] != 'ok':
+            ex = MultiSafepayServerException.from_xml(xml)
+            logger.error(u"Request <%s> to MultiSafePay failed: code=%s, description=%s", message.xml_name, ex.code, ex.description)
+            raise ex
+
     def _transaction_call(self, message, response_class=None):
         """
         A variant of the standard ``_call()`` that logs the transaction ID on errors.
@@ -140,11 +504,39 @@ class MultiSafepayClient(object):
 
         return self._transaction_call(request, response_class=messages.CheckoutTransactionReply)
 
-    def status(self, transaction_id):
+    def status(self, transaction_id, refresh=False):
         """
         Request the status of a transaction.
+
+        The reply is cached when ``MULTISAFEPAY_STATUS_CACHE_BACKEND`` is set.
+
+        :param refresh: Always fetch the status from the server, and replace the cached status.
+                        Use this when the status is known to be changed, e.g. after a notification.
         :rtype: StatusReply
         """
+        cache = self.get_status_cache()
+        if cache is None:
+            return self._fetch_status(transaction_id)
+
+        key = self._get_status_cache_key(transaction_id)
+        if not refresh:
+            statusreply = cache.get(key)
+            if statusreply is not None:
+                return statusreply
+
+        statusreply = self._fetch_status(transaction_id)
+        cache.store(key, statusreply)
+        return statusreply
+
+    def invalidate_status(self, transaction_id):
+        """
+        Remove the cached status of a transaction, so the next :meth:`status` call fetches it again.
+        """
+        cache = self.get_status_cache()
+        if cache is not None:
+            cache.delete(self._get_status_cache_key(transaction_id))
+
+    def _fetch_status(self, transaction_id):
         request = messages.Status(self.merchant, transaction_id)
         try:
             return self._call(request, response_class=messages.StatusReply)
@@ -153,14 +545,73 @@ class MultiSafepayClient(object):
             logger.error(u"Failed to fetch status for transaction %s: code=%s, description=%s", transaction_id, e.code, e.description)
             raise
 
+    def status_many(self, transaction_ids, max_workers=None, stats=None, refresh=False):
+        """
+        Request the status of many transactions concurrently.
+
+        The results are yielded in completion order, as ``(transaction_id, result)`` tuples.
+        When a call failed, the result is the exception instead of a :class:`StatusReply`.
+
+        :param transaction_ids: The transactions to fetch, this can be any (lazy) iterable.
+        :param max_workers: The maximum number of concurrent calls. Defaults to the connection pool size.
+        :param stats: Optional statistics object, which is filled with throughput statistics.
+        :type stats: BulkStats
+        :param refresh: Always fetch the statuses from the server, see :meth:`status`.
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        max_workers = max_workers or self.pool.pool_size
+        stats = stats if stats is not None else BulkStats()
+        transaction_ids = iter(transaction_ids)
+        pending = {}
+
+        stats.start()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            # Only read ahead a limited number of ID's, so the iterable can be very large.
+            for transaction_id in islice(transaction_ids, max_workers * 2):
+                pending[executor.submit(self.status, transaction_id, refresh)] = transaction_id
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    transaction_id = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = e
+                    stats.add(result)
+
+                    # Keep the workers busy while the caller handles the result.
+                    for next_id in islice(transaction_ids, 1):
+                        pending[executor.submit(self.status, next_id, refresh)] = next_id
+
+                    yield transaction_id, result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            stats.stop()
+            logger.info(u"Fetched status of transactions: %s", stats)
+
     def gateways(self, locale, country):
         """
         Request all available gateways (Connect method)
 
+        The reply is cached when ``MULTISAFEPAY_GATEWAYS_CACHE_TTL`` is set.
+
         :param locale: Language code, e.g. en_US
         :param country: The 2-digit country code, in ISO 3166
         :rtype: GatewaysReply
         """
+        cache = self.get_gateways_cache()
+        if cache is None:
+            return self._fetch_gateways(locale, country)
+
+        key = self._get_gateways_cache_key(locale, country)
+        return cache.get_or_fetch(key, lambda: self._fetch_gateways(locale, country))
+
+    def _fetch_gateways(self, locale, country):
         request = messages.Gateways(
             merchant=self.merchant,
             customer=GatewayCustomer(
@@ -171,6 +622,22 @@ class MultiSafepayClient(object):
 
         return self._call(request, response_class=messages.GatewaysReply)
 
+    def _get_gateways_cache_key(self, locale, country):
+        return u"gateways:{0}:{1}:{2}:{3}:{4}".format(
+            self.merchant.account,
+            self.merchant.site_id,
+            'test' if self.is_test else 'live',
+            to_locale(locale),
+            country,
+        )
+
+    def _get_status_cache_key(self, transaction_id):
+        return u"status:{0}:{1}:{2}".format(
+            self.merchant.account,
+            'test' if self.is_test else 'live',
+            transaction_id,
+        )
+
     def redirect_transaction(self, transaction, customer, google_analytics=None):
         """
         Start the checkout (Connect method)
@@ -0,0 +1,110 @@
+"""
+A compact serialization of status replies, e.g. to store them in a cache or queue.
+
+The objects are written as JSON arrays with the values in a fixed field order,
+so the field names are not repeated in every entry::
+
+    [1, [1, [2, "2118132", "completed", true, ...], ...]]
+
+The first value is the format version, followed by the encoded object.
+Every object starts with the code of its type, and trailing ``None`` values are omitted.
+The ``_xml`` attribute of the reply is not included, so loaded replies don't have it.
+"""
+import json
+
+from django_multisafepay.data import CustomerDelivery
+from django_multisafepay.data.base import Price
+from django_multisafepay.data.status import CheckoutData, CustomerStatus, Ewallet, OrderAdjustment, PaymentDetails, TransactionStatus
+from django_multisafepay.messages import StatusReply
+
+__all__ = (
+    'VERSION',
+    'dumps',
+    'loads',
+)
+
+#: The version of the format that :func:`dumps` writes.
+VERSION = 1
+
+_PRICE = 0
+
+# The fields of each type, by type code. Changing these requires a new version.
+_TYPES = {
+    1: (StatusReply, ('ewallet', 'customer', 'customer_delivery', 'transaction', 'payment_details', 'checkoutdata')),
+    2: (Ewallet, ('id', 'status', 'fastcheckout', 'created', 'modified', 'reason', 'reasoncode')),
+    3: (CustomerStatus, (
+        'locale', 'firstname', 'lastname', 'address1', 'address2', 'housenumber', 'zipcode', 'city', 'state', 'country',
+        'phone', 'email', 'ipaddress', 'forwardedip', 'referrer', 'user_agent',
+        'amount', 'currency', 'account', 'phone1', 'phone2', 'countryname',
+    )),
+    4: (CustomerDelivery, ('firstname', 'lastname', 'address1', 'address2', 'housenumber', 'zipcode', 'city', 'state', 'country', 'phone', 'email')),
+    5: (TransactionStatus, ('id', 'recurringid', 'currency', 'amount', 'cost', 'description', 'var1', 'var2', 'var3', 'items', 'amountrefunded')),
+    6: (PaymentDetails, ('type', 'accountid', 'accountholdername', 'externaltransactionid')),
+    7: (CheckoutData, ('order_total', 'shopping_cart', 'order_adjustment', 'custom_fields')),
+    8: (OrderAdjustment, ('shipping', 'adjustment_total', 'total_tax')),
+}
+
+_CODES = dict((cls, (code, fields)) for code, (cls, fields) in _TYPES.items())
+
+try:
+    _SCALAR_TYPES = (type(None), bool, int, long, float, unicode, str)  # Python 2
+except NameError:
+    _SCALAR_TYPES = (type(None), bool, int, float, str)
+
+
+def dumps(obj):
+    """
+    Serialize a :class:`~django_multisafepay.messages.StatusReply`, or one of its parts.
+
+    :rtype: bytes
+    :raises TypeError: When the object contains values that can't be restored as-is.
+    """
+    return json.dumps([VERSION, _encode(obj)], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    Restore an object that was serialized with :func:`dumps`.
+
+    :type data: bytes
+    :raises ValueError: When the data has an unsupported version.
+    """
+    version, value = json.loads(data.decode('utf-8'))
+    if version != VERSION:
+        raise ValueError("Unsupported serialization version: {0}".format(version))
+    return _decode(value)
+
+
+def _encode(value):
+    cls = value.__class__
+    if cls in _SCALAR_TYPES:
+        return value
+    elif cls is Price:
+        return [_PRICE, str(value), value.currency]
+
+    try:
+        code, fields = _CODES[cls]
+    except KeyError:
+        raise TypeError("Can't serialize {0} objects".format(cls.__name__))
+
+    values = [code]
+    values.extend(_encode(getattr(value, name, None)) for name in fields)
+    while values[-1] is None:
+        values.pop()
+    return values
+
+
+def _decode(value):
+    if not isinstance(value, list):
+        return value
+
+    code = value[0]
+    if code == _PRICE:
+        return Price(value[1], value[2])
+
+    cls, fields = _TYPES[code]
+    obj = cls.__new__(cls)  # Avoid __init__(), which converts the values again.
+    num_values = len(value) - 1
+    for i, name in enumerate(fields):
+        setattr(obj, name, _decode(value[i + 1]) if i < num_values else None)
+    return obj
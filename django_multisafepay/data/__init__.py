@@ -1,13 +1,10 @@
 """
 The data objects can be provided as parameters to the client.
+
+The classes are imported on first access, so importing this package stays cheap.
 """
-from .base import Price
-from .merchant import Merchant, Plugin
-from .customer import Customer, CustomerDelivery
-from .gateway import GatewayCustomer, Gateway
-from .gatewayinfo import GatewayInfo
-from .transaction import Transaction, CheckoutSettings, GoogleAnalytics
-from .cart import Cart, ItemWeight, ShoppingCartItem, FlatRateShipping, Pickup
+import sys
+from importlib import import_module
 
 __all__ = (
     # These are the objects needed for making requests.
@@ -20,3 +17,35 @@ __all__ = (
     'Transaction', 'CheckoutSettings', 'GoogleAnalytics',
     'Cart', 'ItemWeight', 'ShoppingCartItem', 'FlatRateShipping', 'Pickup',
 )
+
+# The submodule that defines each class.
+_modules = {
+    'Price': '.base',
+    'Merchant': '.merchant', 'Plugin': '.merchant',
+    'Customer': '.customer', 'CustomerDelivery': '.customer',
+    'GatewayCustomer': '.gateway', 'Gateway': '.gateway',
+    'GatewayInfo': '.gatewayinfo',
+    'Transaction': '.transaction', 'CheckoutSettings': '.transaction', 'GoogleAnalytics': '.transaction',
+    'Cart': '.cart', 'ItemWeight': '.cart', 'ShoppingCartItem': '.cart', 'FlatRateShipping': '.cart', 'Pickup': '.cart',
+}
+
+
+def __getattr__(name):
+    # Called for attributes that are not imported yet (PEP 562).
+    try:
+        module_name = _modules[name]
+    except KeyError:
+        raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+    value = globals()[name] = getattr(import_module(module_name, __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is not supported, import all classes directly.
+    for _name in __all__:
+        __getattr__(_name)
@@ -1,12 +1,19 @@
 from decimal import Decimal
-from xml.sax.saxutils import escape
 
 from django.utils.encoding import force_text
+from django.utils.functional import Promise
+
+try:
+    text_type = unicode  # Python 2
+except NameError:
+    text_type = str
 
 __all__ = (
     'XmlObject',
+    'CachedXmlObject',
     'Price',
     'escape',
+    'escape_text',
 )
 
 
@@ -14,7 +21,15 @@ class XmlObject(object):
     """
     Simple object to quickly generate XML messages.
     This provides all the flexibility we need to render any XML object.
+
+    The whole tree is written in a single pass to a ``write`` callable (e.g. ``list.append``),
+    so nested objects don't have to be formatted into intermediate strings.
+
+    Subclasses define ``__slots__`` for their fields, so the many objects of the parsed replies stay compact.
+    The ``__dict__`` is kept, so custom attributes can still be added (e.g. ``item.product = product``);
+    it's only allocated when such attribute is set.
     """
+    __slots__ = ('__dict__',)
     xml_name = None
     xml_attrs = None
     xml_fields = ()
@@ -24,39 +39,53 @@ class XmlObject(object):
 
     def to_xml(self):
         # get xml message
-        lines = self.get_xml_children()
+        buffer = []
+        self.write_xml(buffer.append)
+        return u''.join(buffer)
+
+    def write_xml(self, write):
+        """
+        Write the XML element of this object.
+
+        :param write: The function that receives all text fragments, e.g. ``list.append``.
+        """
+        plan = _get_plan(self)
         attrs = self.get_xml_attrs()
         if attrs:
-            attrs = u"".join(u' {0}="{1}"'.format(k, escape(force_text(v))) for k, v in attrs.iteritems())
-            return u'<{0}{1}>{2}</{0}>'.format(self.xml_name, attrs, u''.join(lines))
+            write(u'<{0}{1}>'.format(self.xml_name, u"".join(u' {0}="{1}"'.format(k, escape(force_text(v))) for k, v in attrs.items())))
         else:
-            return u'<{0}>{1}</{0}>'.format(self.xml_name, u''.join(lines))
+            write(plan.start_tag)
+        self._write_children(write)
+        write(plan.end_tag)
 
     def get_xml_attrs(self):
         return self.xml_attrs
 
     def get_xml_children(self):
-        # Allow to be overwritten
+        """
+        Return the XML fragments of all child nodes.
+        Overriding :meth:`write_xml_children` is preferred, but overriding this method is still supported.
+        """
         lines = []
-        for field in self.xml_fields:
-            value = getattr(self, field.replace('-', '_'))
-            if value is not None:
-                if isinstance(value, XmlObject):
-                    # Attribute name is ignored, tag name is used instead.
-                    lines.append(u"{0}\n".format(value.to_xml()))
-                elif isinstance(value, Price):
-                    # Inconsistent API. Using decimal notation here, but using cents somewhere else.
-                    lines.append(u'<{0} currency="{1}">{2:.2f}</{0}>'.format(field, value.currency, value))
-                else:
-                    if isinstance(value, (list, tuple)):
-                        tag_value = u'\n'.join(item.to_xml() for item in value)
-                    elif isinstance(value, bool):
-                        tag_value = str(value).lower()
-                    else:
-                        tag_value = escape(force_text(value))
-                    lines.append(u'<{0}>{1}</{0}>'.format(field, tag_value))
+        self.write_xml_children(lines.append)
         return lines
 
+    def write_xml_children(self, write):
+        # Allow to be overwritten
+        for step in _get_plan(self).steps:
+            value = getattr(self, step[0])
+            if value is not None:
+                encoder = _encoders.get(value.__class__) or _get_encoder(value.__class__)
+                encoder(value, step, write)
+
+    def _write_children(self, write):
+        if _get_plan(self).legacy_children:
+            # Subclass still provides the child nodes as list.
+            for line in self.get_xml_children():
+                write(line)
+        else:
+            self.write_xml_children(write)
+
     @classmethod
     def from_xml(cls, xml):
         """
@@ -72,17 +101,76 @@ class XmlObject(object):
         """
         :type xml: xml.etree.ElementTree.Element
         """
+        # Index the child nodes once, instead of searching them for every field.
+        # Reversed, so the first node wins when a tag occurs multiple times, just like find() does.
+        texts = dict((node.tag, node.text) for node in reversed(xml))
         kwargs = {}
         for field in cls.xml_fields:
-            node = xml.find(field)
-            kwargs[field.replace('-', '_')] = None if node is None else node.text
+            kwargs[field.replace('-', '_')] = texts.get(field)
         return kwargs
 
 
+class CachedXmlObject(XmlObject):
+    """
+    An object that is reused for many messages, such as the :class:`~django_multisafepay.data.Merchant`.
+
+    The rendered XML is cached, so it's only generated once. Changing an attribute clears the cache.
+    Objects with lazy values (e.g. ``reverse_lazy()``) or nested objects are rendered every time,
+    as their output may change without this object being changed.
+    """
+    __slots__ = ('_cache',)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_cache', None)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        object.__setattr__(self, '_cache', None)
+
+    def __getstate__(self):
+        # Used by copy and pickle. The cache is left out, so a changed copy can't leave stale values in either object.
+        slots = {}
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name != '_cache' and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        return getattr(self, '__dict__', None) or None, slots
+
+    def get_cache(self):
+        """
+        Return the dictionary for values that are derived from this object.
+        It's cleared when an attribute is changed.
+        """
+        cache = getattr(self, '_cache', None)
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, '_cache', cache)
+        return cache
+
+    def write_xml(self, write):
+        cache = self.get_cache()
+        xml = cache.get('xml')
+        if xml is None:
+            buffer = []
+            super(CachedXmlObject, self).write_xml(buffer.append)
+            xml = u''.join(buffer)
+            if self._is_cacheable():
+                cache['xml'] = xml
+        write(xml)
+
+    def _is_cacheable(self):
+        for step in _get_plan(self).steps:
+            if isinstance(getattr(self, step[0]), (Promise, XmlObject, list, tuple)):
+                return False
+        return True
+
+
 class Price(Decimal):
     """
     A decimal value with currency attached.
     """
+    __slots__ = ('currency',)
 
     def __new__(cls, value, currency=None):
         self = Decimal.__new__(cls, value)
@@ -95,3 +183,118 @@ class Price(Decimal):
         :type xml: xml.etree.ElementTree.Element
         """
         return cls(xml.text, xml.attrib['currency'])
+
+
+def escape(value):
+    """
+    Escape the ``&``, ``<`` and ``>`` characters, just like :func:`xml.sax.saxutils.escape` does.
+    This avoids importing :mod:`xml.sax`, which pulls in :mod:`urllib.request`.
+    """
+    return value.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')
+
+
+def escape_text(value):
+    """
+    Convert the value to text, and escape it for XML.
+    This avoids the conversion and escaping work for values that don't need it.
+    """
+    if not isinstance(value, text_type):
+        value = force_text(value)
+    if u'&' in value or u'<' in value or u'>' in value:
+        return escape(value)
+    return value
+
+
+class XmlPlan(object):
+    """
+    The serialization steps of an :class:`XmlObject` class, compiled once at first use.
+    This avoids the string munging and type checks for every serialized field.
+
+    Each step is a tuple of the attribute name, tag name, opening tag and closing tag.
+    """
+
+    def __init__(self, cls, xml_name, xml_fields):
+        self.xml_name = xml_name
+        self.xml_fields = xml_fields
+        self.start_tag = u'<{0}>'.format(xml_name)
+        self.end_tag = u'</{0}>'.format(xml_name)
+        self.steps = tuple(
+            (field.replace('-', '_'), field, u'<' + field + u'>', u'</' + field + u'>')
+            for field in xml_fields
+        )
+
+        # Whether a subclass still overrides one of the methods that return strings.
+        self.legacy_to_xml = _overrides(cls, 'to_xml')
+        self.legacy_children = _overrides(cls, 'get_xml_children')
+
+
+_plans = {}
+
+
+def _get_plan(obj):
+    cls = obj.__class__
+    plan = _plans.get(cls)
+    if plan is None or plan.xml_fields is not obj.xml_fields or plan.xml_name != obj.xml_name:
+        # Also recompiles when the class attributes are changed afterwards.
+        plan = _plans[cls] = XmlPlan(cls, obj.xml_name, obj.xml_fields)
+    return plan
+
+
+def _overrides(cls, method_name):
+    return any(method_name in klass.__dict__ for klass in cls.__mro__ if klass is not XmlObject)
+
+
+def _write_object(obj, write):
+    if _get_plan(obj).legacy_to_xml:
+        # Subclass still renders the element as string.
+        write(obj.to_xml())
+    else:
+        obj.write_xml(write)
+
+
+def _encode_object(value, step, write):
+    # Attribute name is ignored, tag name is used instead.
+    _write_object(value, write)
+    write(u"\n")
+
+
+def _encode_price(value, step, write):
+    # Inconsistent API. Using decimal notation here, but using cents somewhere else.
+    write(u'<{0} currency="{1}">{2:.2f}</{0}>'.format(step[1], value.currency, value))
+
+
+def _encode_list(value, step, write):
+    write(step[2])
+    for i, item in enumerate(value):
+        if i:
+            write(u'\n')
+        _write_object(item, write)
+    write(step[3])
+
+
+def _encode_bool(value, step, write):
+    write(step[2] + (u'true' if value else u'false') + step[3])
+
+
+def _encode_text(value, step, write):
+    write(step[2] + escape_text(value) + step[3])
+
+
+# The encoder for each value type, filled at first use.
+_encoders = {}
+
+
+def _get_encoder(value_type):
+    if issubclass(value_type, XmlObject):
+        encoder = _encode_object
+    elif issubclass(value_type, Price):
+        encoder = _encode_price
+    elif issubclass(value_type, (list, tuple)):
+        encoder = _encode_list
+    elif issubclass(value_type, bool):
+        encoder = _encode_bool
+    else:
+        encoder = _encode_text
+
+    _encoders[value_type] = encoder
+    return encoder
@@ -1,10 +1,11 @@
-from .base import XmlObject, escape
+from .base import XmlObject, _write_object, escape
 
 
 class Cart(XmlObject):
     """
     The shopping cart.
     """
+    __slots__ = ('items', 'shipping_methods', 'tax_tables')
     xml_name = 'checkout-shopping-cart'
 
     def __init__(self, items=(), shipping_methods=(), tax_tables=()):
@@ -15,46 +16,49 @@ class Cart(XmlObject):
         self.shipping_methods = list(shipping_methods or ())
         self.tax_tables = list(tax_tables or ())
 
-    def get_xml_children(self):
-        lines = []
+    def write_xml_children(self, write):
         if self.items:
             # Don't bother creating sub elements for the shopping cart, make this object smarter.
-            lines.append('<shopping-cart><items>\n')
-            for item in self.items:
-                lines.append("  {0}\n".format(item.to_xml()))
-            lines.append('</items></shopping-cart>\n')
+            write(u'<shopping-cart><items>\n')
+            _write_items(self.items, write)
+            write(u'</items></shopping-cart>\n')
 
         if self.shipping_methods or self.tax_tables:
-            lines.append('<checkout-flow-support><merchant-checkout-flow-support>\n')
+            write(u'<checkout-flow-support><merchant-checkout-flow-support>\n')
 
             if self.shipping_methods:
-                lines.append('<shipping-methods>\n')
-                for item in self.shipping_methods:
-                    lines.append("  {0}\n".format(item.to_xml()))
-                lines.append('</shipping-methods>\n')
+                write(u'<shipping-methods>\n')
+                _write_items(self.shipping_methods, write)
+                write(u'</shipping-methods>\n')
 
             if self.tax_tables:
-                lines.append('<tax-tables>\n')
-                for item in self.tax_tables:
-                    lines.append("  {0}\n".format(item.to_xml()))
-                lines.append('</tax-tables>\n')
+                write(u'<tax-tables>\n')
+                _write_items(self.tax_tables, write)
+                write(u'</tax-tables>\n')
 
-            lines.append('</merchant-checkout-flow-support></checkout-flow-support>\n')
-        return lines
+            write(u'</merchant-checkout-flow-support></checkout-flow-support>\n')
+
+
+def _write_items(items, write):
+    for item in items:
+        write(u"  ")
+        _write_object(item, write)
+        write(u"\n")
 
 
 class ShoppingCartItem(XmlObject):
     """
     An item in the shopping cart.
     """
+    __slots__ = ('item_name', 'item_description', 'unit_price', 'quantity', 'merchant_item_id', 'item_weight')
     xml_name = 'item'
     xml_fields = (
         'item-name',
         'item-description',
         'unit-price',
         'quantity',
-        'merchant-item-id'
-        'item-weight'  # unit="KG" value="1"
+        'merchant-item-id',
+        'item-weight',  # unit="KG" value="1"
     )
 
     def __init__(self, item_name, item_description, unit_price, quantity, merchant_item_id, item_weight=None):
@@ -74,6 +78,7 @@ class ItemWeight(XmlObject):
     """
     Weight value for an item in the shopping cart.
     """
+    __slots__ = ('value', 'unit')
     xml_name = 'item-weight'
 
     def __init__(self, value, unit):
@@ -84,14 +89,15 @@ class ItemWeight(XmlObject):
         self.value = value
         self.unit = unit
 
-    def to_xml(self):
-        return u'<{0} unit="{1}" value="{2}" />'.format(self.xml_name, escape(self.unit), escape(str(self.value)))
+    def write_xml(self, write):
+        write(u'<{0} unit="{1}" value="{2}" />'.format(self.xml_name, escape(self.unit), escape(str(self.value))))
 
 
 class ShippingMethodBase(XmlObject):
     """
     Base class for shipping methods
     """
+    __slots__ = ('name', 'price')
     xml_fields = (
         'price',
     )
@@ -114,6 +120,7 @@ class Pickup(ShippingMethodBase):
     """
     Shipping costs for pickup.
     """
+    __slots__ = ()
     xml_name = 'pickup'
 
 
@@ -121,6 +128,7 @@ class FlatRateShipping(ShippingMethodBase):
     """
     Shipping costs for flat-rates
     """
+    __slots__ = ('restrictions',)
     xml_name = 'flat-rate-shipping'
     xml_fields = ShippingMethodBase.xml_fields + (
         'shipping_restrictions',  # TODO: data class is not implemented.
@@ -5,6 +5,10 @@ class Customer(XmlObject):
     """
     Customer information
     """
+    __slots__ = (
+        'locale', 'firstname', 'lastname', 'address1', 'address2', 'housenumber', 'zipcode', 'city', 'state', 'country', 'phone', 'email',
+        'ipaddress', 'forwardedip', 'referrer', 'user_agent',
+    )
     xml_name = 'customer'
     xml_fields = (
         'locale',
@@ -53,6 +57,7 @@ class CustomerDelivery(XmlObject):
     """
     Delivery address
     """
+    __slots__ = ('firstname', 'lastname', 'address1', 'address2', 'housenumber', 'zipcode', 'city', 'state', 'country', 'phone', 'email')
     xml_name = 'customer-delivery'
     xml_fields = (
         'firstname',
@@ -7,6 +7,7 @@ class GatewayCustomer(XmlObject):
     """
     Customer information, for the Gateways request
     """
+    __slots__ = ('locale', 'country')
     xml_name = 'customer'
     xml_fields = (
         'locale',
@@ -29,8 +30,17 @@ class Gateway(XmlObject):
         <description>iDEAL</description>
     </gateway>
     """
+    __slots__ = ('id', 'description')
     xml_name = 'gateway'
     xml_fields = (
         'id',
         'description',
     )
+
+    def __init__(self, id, description):
+        """
+        :param id: The gateway code, e.g. "IDEAL"
+        :param description: The human readable name.
+        """
+        self.id = id
+        self.description = description
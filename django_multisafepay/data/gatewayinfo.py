@@ -7,6 +7,7 @@ class GatewayInfo(XmlObject):
         <issuerid>0151</issuerid>
     </gatewayinfo>
     """
+    __slots__ = ('issuerid',)
     xml_name = 'gatewayinfo'
     xml_fields = (
         'issuerid',
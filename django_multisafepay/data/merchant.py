@@ -1,17 +1,35 @@
+from django.conf import settings
 from django_multisafepay import PLUGIN_VERSION, SHOP_NAME, appsettings
 
-from .base import XmlObject
+from .base import CachedXmlObject
 
-try:
-    from django.urls import reverse
-except ImportError:  # Django < 1.10
-    from django.core.urlresolvers import reverse
+_notification_urls = {}
 
 
-class Merchant(XmlObject):
+def get_notification_url():
+    """
+    Return the URL of the :class:`~django_multisafepay.views.NotificationView`.
+    Resolving the URL is relatively slow, so it's cached per URLconf and script prefix.
+    """
+    # Imported here, as the URL resolver pulls in most of Django.
+    try:
+        from django.urls import get_script_prefix, get_urlconf, reverse
+    except ImportError:  # Django < 1.10
+        from django.core.urlresolvers import get_script_prefix, get_urlconf, reverse
+
+    key = (get_urlconf(settings.ROOT_URLCONF), get_script_prefix())
+    url = _notification_urls.get(key)
+    if url is None:
+        url = _notification_urls[key] = reverse('notification_url')
+    return url
+
+
+class Merchant(CachedXmlObject):
     """
     Meta information for the webshop.
+    The XML is rendered once, and reused until an attribute is changed.
     """
+    __slots__ = ('account', 'site_id', 'site_secure_code', 'notification_url', 'cancel_url', 'redirect_url', 'close_window')
     xml_name = 'merchant'
     xml_fields = (
         'account',
@@ -32,16 +50,35 @@ class Merchant(XmlObject):
         self.site_secure_code = site_code or appsettings.MULTISAFEPAY_SITE_CODE
 
         # Custom configuration
-        self.notification_url = notification_url or reverse('notification_url')
+        self.notification_url = notification_url or get_notification_url()
         self.cancel_url = cancel_url or appsettings.MULTISAFEPAY_CANCEL_URL
         self.redirect_url = redirect_url or appsettings.MULTISAFEPAY_REDIRECT_URL
         self.close_window = close_window
 
+    def get_status_merchant(self):
+        """
+        Return the merchant for the status request, which only needs the account fields.
+        The object is cached, so its XML is only rendered once.
+        :rtype: Merchant
+        """
+        cache = self.get_cache()
+        merchant = cache.get('status_merchant')
+        if merchant is None:
+            merchant = cache['status_merchant'] = Merchant(
+                # Only these fields are required:
+                account=self.account,
+                site_id=self.site_id,
+                site_code=self.site_secure_code,
+            )
+        return merchant
+
 
-class Plugin(XmlObject):
+class Plugin(CachedXmlObject):
     """
-    Meta information for the plugin
+    Meta information for the plugin.
+    The XML is rendered once, and reused until an attribute is changed.
     """
+    __slots__ = ('shop', 'shop_version', 'plugin_version', 'partner', 'shop_root_url')
     xml_name = 'plugin'
     xml_fields = (
         'shop',
@@ -8,6 +8,7 @@ class Ewallet(XmlObject):
     The EWallet element in the status reply.
     It contains the status code.
     """
+    __slots__ = ('id', 'status', 'fastcheckout', 'created', 'modified', 'reason', 'reasoncode')
     xml_name = 'ewallet'
     xml_fields = (
         'id',
@@ -33,6 +34,7 @@ class CustomerStatus(Customer):
     """
     A customer with additional fields.
     """
+    __slots__ = ('amount', 'currency', 'account', 'phone1', 'phone2', 'countryname')
     xml_fields = Customer.xml_fields + (
         'amount',
         'currency',
@@ -56,6 +58,7 @@ class PaymentDetails(XmlObject):
     """
     The payment details in the status reply
     """
+    __slots__ = ('type', 'accountid', 'accountholdername', 'externaltransactionid')
     xml_name = 'paymentdetails'
     xml_fields = (
         'type',
@@ -75,6 +78,7 @@ class CheckoutData(XmlObject):
     """
     The checkout data in the status reply
     """
+    __slots__ = ('order_total', 'shopping_cart', 'order_adjustment', 'custom_fields')
     xml_name = 'checkoutdata'
     xml_fields = (
         'shopping-cart',
@@ -107,6 +111,7 @@ class TransactionStatus(XmlObject):
     """
     Information about a transaction, as returned by the status call..
     """
+    __slots__ = ('id', 'recurringid', 'currency', 'amount', 'cost', 'description', 'var1', 'var2', 'var3', 'items', 'amountrefunded')
     xml_name = 'transaction'
     xml_fields = (
         'id',
@@ -140,6 +145,7 @@ class OrderAdjustment(XmlObject):
     """
     The order adjustment in the CheckoutData of the status reply.
     """
+    __slots__ = ('shipping', 'adjustment_total', 'total_tax')
     xml_name = 'order-adjustment'
     xml_fields = (
         'shipping',
@@ -5,6 +5,7 @@ class Transaction(XmlObject):
     """
     Transaction data
     """
+    __slots__ = ('id', 'currency', 'amount', 'description', 'items', 'manual', 'daysactive', 'var1', 'var2', 'var3', 'gateway', 'gateway_issuer')
     xml_name = 'transaction'
     xml_fields = (
         'id',
@@ -46,19 +47,19 @@ class Transaction(XmlObject):
         self.gateway = gateway
         self.gateway_issuer = gateway_issuer
 
-    def get_xml_children(self):
-        lines = super(Transaction, self).get_xml_children()
+    def write_xml_children(self, write):
+        super(Transaction, self).write_xml_children(write)
         if self.gateway is not None:
             # Add issuer attribute to the gateway tag
             issuer = u' issuer="{0}"'.format(escape(self.gateway_issuer)) if self.gateway_issuer else u''
-            lines.append(u'<gateway{0}>{1}</gateway>'.format(issuer, escape(self.gateway)))
-        return lines
+            write(u'<gateway{0}>{1}</gateway>'.format(issuer, escape(self.gateway)))
 
 
 class CheckoutSettings(XmlObject):
     """"
     Passing checkout sessions to the :class:`CheckoutTransaction` class.
     """
+    __slots__ = ('use_shipping_notification',)
     xml_name = 'checkout-settings'
     xml_fields = (
         'use-shipping-notification',
@@ -73,6 +74,7 @@ class GoogleAnalytics(XmlObject):
     """
     Passing analytics tracker to the payment pages.
     """
+    __slots__ = ('account',)
     xml_name = 'google-analytics'
     xml_fields = (
         'account',
@@ -36,3 +36,15 @@ class MultiSafepayServerException(MultiSafepayException):
         # We could implement a class type per exception code, if that's needed.
 
         return cls(**kwargs)
+
+
+class MultiSafepayInvalidResponse(MultiSafepayException):
+    """
+    The API returned a response that is not a reply message.
+    """
+
+
+class MultiSafepayUnavailable(MultiSafepayException):
+    """
+    The API is not called, because it failed too often recently.
+    """
@@ -0,0 +1,142 @@
+"""
+Hedged requests, to reduce the tail latency of read-only calls.
+
+When a call hasn't answered within the usual response time (a percentile of the recent calls),
+a second identical request is sent. The first answer is used, the other request is abandoned.
+A budget limits the number of extra requests.
+"""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django_multisafepay import appsettings
+
+
+class HedgingPolicy(object):
+    """
+    Decides when a second request is sent.
+
+    The delay is the ``percentile`` of the recent response times for the same message type.
+    For every call, ``budget`` tokens are earned, and each hedged request costs a full token.
+    So a budget of ``0.05`` means at most 5% extra requests.
+    """
+
+    #: The messages (by ``xml_name``) that are safe to send twice.
+    idempotent_messages = ('status', 'gateways')
+
+    def __init__(self, percentile=95, budget=0.05, min_delay=0.05, initial_delay=1.0, window=1000, min_samples=20, max_tokens=10):
+        """
+        :param percentile: The percentile of the recent response times to wait before hedging.
+        :param budget: The maximum fraction of extra requests.
+        :param min_delay: The minimum number of seconds to wait before hedging.
+        :param initial_delay: The number of seconds to wait, until enough response times are known.
+        :param window: The number of recent response times to track.
+        :param min_samples: The number of response times needed before the percentile is used.
+        :param max_tokens: The maximum number of saved up hedges, this limits the burst of extra requests.
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._delays = {}
+
+    def applies_to(self, message):
+        """
+        Tell whether the message may be hedged.
+        """
+        return message.xml_name in self.idempotent_messages
+
+    def start_call(self, xml_name):
+        """
+        Register a new call, which earns budget for hedging.
+        :return: The number of seconds to wait before sending a hedged request.
+        """
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.budget)
+        return self._delays.get(xml_name, self.initial_delay)
+
+    def acquire_hedge(self):
+        """
+        Take a token from the budget.
+        :return: Whether a hedged request can be sent.
+        """
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def record(self, xml_name, seconds):
+        """
+        Register the response time of a single request.
+        """
+        with self._lock:
+            samples = self._samples.get(xml_name)
+            if samples is None:
+                samples = self._samples[xml_name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+            # Recalculating for every call would be wasteful.
+            if len(samples) >= self.min_samples and len(samples) % 10 == 0:
+                ordered = sorted(samples)
+                index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+                self._delays[xml_name] = max(self.min_delay, ordered[index])
+
+
+_default_policy = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_default_hedging_policy():
+    """
+    Return the hedging policy, as configured by the ``MULTISAFEPAY_HEDGE_...`` settings.
+    :return: The policy, or ``None`` when hedging is disabled.
+    :rtype: HedgingPolicy
+    """
+    global _default_policy
+    if not appsettings.MULTISAFEPAY_HEDGE_REQUESTS:
+        return None
+
+    if _default_policy is None:
+        with _lock:
+            if _default_policy is None:
+                _default_policy = HedgingPolicy(
+                    percentile=appsettings.MULTISAFEPAY_HEDGE_PERCENTILE,
+                    budget=appsettings.MULTISAFEPAY_HEDGE_BUDGET,
+                    min_delay=appsettings.MULTISAFEPAY_HEDGE_MIN_DELAY,
+                    initial_delay=appsettings.MULTISAFEPAY_HEDGE_INITIAL_DELAY,
+                )
+    return _default_policy
+
+
+def get_hedging_executor():
+    """
+    Return the thread pool that performs the hedged calls of the synchronous client.
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # Both the original and hedged request run in the pool, so the caller can return at the first answer.
+                _executor = ThreadPoolExecutor(max_workers=appsettings.MULTISAFEPAY_POOL_SIZE * 4)
+    return _executor
+
+
+def _setting_changed(setting):
+    # The old executor is not shut down, as other threads might still submit their calls to it.
+    global _default_policy, _executor
+    if setting.startswith('MULTISAFEPAY_HEDGE_'):
+        _default_policy = None
+    else:
+        _executor = None
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_HEDGE_', 'MULTISAFEPAY_POOL_SIZE'), _setting_changed)
@@ -0,0 +1,240 @@
+"""
+Timing of the API calls, split into the phases of each call.
+
+The timings are only collected when a receiver is connected to the
+:data:`~django_multisafepay.signals.api_call_timed` signal, for example::
+
+    from django_multisafepay.signals import api_call_timed
+
+    def send_to_statsd(sender, xml_name, timings, error, **kwargs):
+        for phase, seconds in timings.items():
+            statsd.timing('multisafepay.{0}.{1}'.format(xml_name, phase), seconds * 1000)
+
+    api_call_timed.connect(send_to_statsd)
+
+For tests and quick inspection, the :class:`HistogramCollector` collects all timings in-process.
+"""
+import bisect
+import logging
+import threading
+from timeit import default_timer
+
+from django_multisafepay.signals import api_call_timed
+
+logger = logging.getLogger(__name__)
+
+# The phases of an API call
+SERIALIZE = 'serialize'  # Generating the XML message.
+CONNECT = 'connect'      # Opening a new TCP connection, including the TLS handshake.
+WAIT = 'wait'            # Sending the request, until the response headers are received.
+DOWNLOAD = 'download'    # Receiving the response body.
+PARSE = 'parse'          # Parsing the XML and checking the result.
+CONSTRUCT = 'construct'  # Creating the reply objects.
+
+PHASES = (SERIALIZE, CONNECT, WAIT, DOWNLOAD, PARSE, CONSTRUCT)
+
+_local = threading.local()
+
+
+class CallTimer(object):
+    """
+    Collects the phase timings of a single API call.
+
+    Each :meth:`mark` records the time since the previous mark.
+    While the timer is active (using ``with timer:``), new connections
+    opened by this thread are recorded as the ``connect`` phase.
+    """
+    enabled = True
+
+    def __init__(self, sender, xml_name):
+        self.sender = sender
+        self.xml_name = xml_name
+        self.timings = {}
+        self._last = default_timer()
+
+    def mark(self, phase):
+        """
+        Record the time since the previous mark as the given phase.
+        """
+        now = default_timer()
+        self.timings[phase] = self.timings.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def add(self, phase, seconds):
+        """
+        Record a phase that was measured separately.
+        The time is excluded from the phase that is recorded by the next :meth:`mark`.
+        """
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+        self._last += seconds
+
+    def finish(self, error=None):
+        """
+        Report the timings, by sending the ``api_call_timed`` signal.
+        """
+        results = api_call_timed.send_robust(self.sender, xml_name=self.xml_name, timings=self.timings, error=error)
+        for receiver, result in results:
+            if isinstance(result, Exception):
+                logger.warning(u"Receiver %r of api_call_timed failed: %s", receiver, result)
+
+    def __enter__(self):
+        _local.timer = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.timer = None
+
+
+class NullTimer(object):
+    """
+    The timer that is used when no timings are collected, all methods do nothing.
+    """
+    enabled = False
+
+    def mark(self, phase):
+        pass
+
+    def add(self, phase, seconds):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def start_timer(sender, xml_name):
+    """
+    Start timing an API call.
+
+    :param sender: The client class, which is used as sender of the signal.
+    :param xml_name: The name of the sent message, e.g. ``status``.
+    :return: The timer, or a :class:`NullTimer` when nobody listens to the ``api_call_timed`` signal.
+    """
+    if not api_call_timed.receivers:
+        return NULL_TIMER
+    return CallTimer(sender, xml_name)
+
+
+def get_active_timer():
+    """
+    Return the timer of the API call that the current thread is performing.
+    """
+    return getattr(_local, 'timer', None)
+
+
+class HistogramCollector(object):
+    """
+    Collect the timings of all API calls in histograms, per message name and phase.
+
+    This can be used in tests::
+
+        with HistogramCollector() as collector:
+            client.status(transaction_id)
+
+        assert collector.count('status', 'wait') == 1
+    """
+
+    #: The upper bounds of the histogram buckets, in seconds.
+    buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self.errors = {}
+
+    def connect(self):
+        api_call_timed.connect(self.receive, dispatch_uid=id(self))
+
+    def disconnect(self):
+        api_call_timed.disconnect(dispatch_uid=id(self))
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disconnect()
+
+    def receive(self, sender, xml_name, timings, error=None, **kwargs):
+        """
+        The receiver of the ``api_call_timed`` signal.
+        """
+        with self._lock:
+            for phase, seconds in timings.items():
+                self.observe(xml_name, phase, seconds)
+            if error is not None:
+                self.errors[xml_name] = self.errors.get(xml_name, 0) + 1
+
+    def observe(self, xml_name, phase, seconds):
+        """
+        Add a single value to the histogram.
+        """
+        histogram = self._histograms.get((xml_name, phase))
+        if histogram is None:
+            # The counts per bucket, the last bucket holds the values above the highest bound.
+            histogram = self._histograms[(xml_name, phase)] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+        histogram['counts'][bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram['sum'] += seconds
+
+    def count(self, xml_name, phase):
+        """
+        Return the number of recorded values.
+        """
+        histogram = self._histograms.get((xml_name, phase))
+        return sum(histogram['counts']) if histogram else 0
+
+    def total(self, xml_name, phase):
+        """
+        Return the sum of all recorded values, in seconds.
+        """
+        histogram = self._histograms.get((xml_name, phase))
+        return histogram['sum'] if histogram else 0.0
+
+    def percentile(self, xml_name, phase, percent):
+        """
+        Estimate the percentile, as the upper bound of the bucket it falls in.
+        :return: The value in seconds, ``float('inf')`` when it's above the highest bucket, or ``None`` without values.
+        """
+        histogram = self._histograms.get((xml_name, phase))
+        if not histogram:
+            return None
+
+        counts = histogram['counts']
+        rank = percent / 100.0 * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return float('inf')
+
+    def get_summary(self):
+        """
+        Return the statistics of all histograms, e.g. to print or export them.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(
+                ((xml_name, phase), {
+                    'count': self.count(xml_name, phase),
+                    'sum': self.total(xml_name, phase),
+                    'p50': self.percentile(xml_name, phase, 50),
+                    'p99': self.percentile(xml_name, phase, 99),
+                })
+                for xml_name, phase in self._histograms
+            )
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.errors.clear()
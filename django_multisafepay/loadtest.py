@@ -0,0 +1,298 @@
+"""
+Load testing of the notification endpoint, to measure how many notifications per second a deployment can absorb.
+
+The traffic mimics MultiSafepay: each status change of a transaction is followed by a notification,
+some notifications are repeated in bursts, and some are ``type=initial`` requests that render the return page.
+The statuses are served by the :mod:`~django_multisafepay.stubserver`.
+"""
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+
+import requests
+from django.db.backends.signals import connection_created
+from django_multisafepay.reconcile import RateLimiter
+
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from SocketServer import ThreadingMixIn
+
+#: The status changes of each transaction, in order.
+STATUS_FLOW = ('initialized', 'uncleared', 'completed', 'refunded')
+
+#: The statements that control transactions, which are not counted as queries.
+TRANSACTION_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'COMMIT', 'ROLLBACK')
+
+
+class Notification(object):
+    """
+    A single notification request.
+    """
+    __slots__ = ('transaction_id', 'type', 'status', 'is_duplicate')
+
+    def __init__(self, transaction_id, type=None, status=None, is_duplicate=False):
+        self.transaction_id = transaction_id
+        self.type = type
+        self.status = status
+        self.is_duplicate = is_duplicate
+
+
+class TrafficProfile(object):
+    """
+    Generates the notifications, as groups that are sent at the same time.
+    """
+
+    def __init__(self, transactions=100, initial_ratio=0.1, duplicate_ratio=0.1, burst_size=5, prefix=None):
+        """
+        :param transactions: The number of distinct transactions, each notification changes the status of one of them.
+        :param initial_ratio: The fraction of notifications with ``type=initial``, which render the return page.
+        :param duplicate_ratio: The fraction of notifications that is sent ``burst_size`` times at once.
+        :param burst_size: The number of identical notifications in a burst.
+        :param prefix: The prefix of the transaction ID's, defaults to a unique value for every run.
+        """
+        self.transactions = transactions
+        self.initial_ratio = initial_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.burst_size = burst_size
+        self.prefix = prefix if prefix is not None else u"loadtest-{0}-".format(int(time.time()))
+
+    def generate(self, number):
+        """
+        Yield lists of :class:`Notification` objects, until ``number`` notifications are generated.
+        The notifications of a list are sent concurrently.
+        """
+        remaining = number
+        for i in itertools.count():
+            if remaining <= 0:
+                break
+
+            transaction_id = u"{0}{1}".format(self.prefix, i % self.transactions)
+            status = STATUS_FLOW[(i // self.transactions) % len(STATUS_FLOW)]
+            type = 'initial' if random.random() < self.initial_ratio else None
+            size = self.burst_size if random.random() < self.duplicate_ratio else 1
+            size = min(size, remaining)
+            remaining -= size
+            yield [Notification(transaction_id, type, status, is_duplicate=j > 0) for j in range(size)]
+
+
+class DatabaseCounter(object):
+    """
+    Count the database transactions, savepoints and queries of all connections in this process.
+
+    Queries that run in autocommit mode are counted as separate transactions, just like the database does.
+    Statements that only control the transactions (e.g. ``BEGIN``) are not counted as queries.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.savepoints = 0
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def install(self):
+        connection_created.connect(self._connection_created)
+
+    def uninstall(self):
+        connection_created.disconnect(self._connection_created)
+        for connection in self._patched:
+            for name in ('commit', 'rollback', 'savepoint'):
+                connection.__dict__.pop(name, None)
+            if self._execute_wrapper in getattr(connection, 'execute_wrappers', ()):
+                connection.execute_wrappers.remove(self._execute_wrapper)
+        self._patched = []
+
+    def _add(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _connection_created(self, sender, connection, **kwargs):
+        # The connections are created per thread, so the methods are wrapped per connection object.
+        # The same object reconnects after it's closed at the end of each request.
+        with self._lock:
+            if any(patched is connection for patched in self._patched):
+                return
+            self._patched.append(connection)
+
+        for name, counter in (('commit', 'transactions'), ('rollback', 'transactions'), ('savepoint', 'savepoints')):
+            connection.__dict__[name] = self._wrap(getattr(connection, name), counter)
+        if hasattr(connection, 'execute_wrappers'):  # Django 2.0+
+            connection.execute_wrappers.append(self._execute_wrapper)
+
+    def _wrap(self, method, counter):
+        def wrapper(*args, **kwargs):
+            self._add(counter)
+            return method(*args, **kwargs)
+        return wrapper
+
+    def _execute_wrapper(self, execute, sql, params, many, context):
+        # Some backends (e.g. SQLite) start transactions and savepoints with a statement,
+        # these are already counted by the wrapped connection methods.
+        if sql.lstrip()[:9].upper().startswith(TRANSACTION_STATEMENTS):
+            return execute(sql, params, many, context)
+
+        self._add('queries')
+        connection = context['connection']
+        if connection.get_autocommit() and not connection.in_atomic_block:
+            self._add('transactions')
+        return execute(sql, params, many, context)
+
+
+class LoadTestStats(object):
+    """
+    The results of a load test.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.duplicates = 0
+        self.initial = 0
+        self.latencies = []
+        self.errors = Counter()
+        self.elapsed = 0
+        self.database = None
+        self._lock = threading.Lock()
+
+    def add(self, notification, seconds, error=None):
+        with self._lock:
+            self.sent += 1
+            if notification.is_duplicate:
+                self.duplicates += 1
+            if notification.type == 'initial':
+                self.initial += 1
+            if error is not None:
+                self.errors[error] += 1
+            else:
+                self.latencies.append(seconds)
+
+    @property
+    def rate(self):
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        return sum(self.errors.values()) / float(self.sent) if self.sent else 0.0
+
+    def percentile(self, percent):
+        """
+        Return the latency percentile of the successful requests, in seconds.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = max(0, int(round(percent / 100.0 * len(latencies))) - 1)
+        return latencies[index]
+
+    def report(self):
+        """
+        Return the results as lines of text.
+        """
+        lines = [
+            "Sent {0} notifications ({1} duplicates, {2} initial) in {3:.1f}s".format(self.sent, self.duplicates, self.initial, self.elapsed),
+            "Throughput: {0:.1f} notifications/s".format(self.rate),
+            "Latency: p50 {0:.1f} ms, p90 {1:.1f} ms, p99 {2:.1f} ms, max {3:.1f} ms".format(
+                self.percentile(50) * 1000, self.percentile(90) * 1000, self.percentile(99) * 1000, self.percentile(100) * 1000,
+            ),
+            "Errors: {0:.2%}{1}".format(self.error_rate, u"".join(
+                u", {0}: {1}".format(error, count) for error, count in sorted(self.errors.items())
+            )),
+        ]
+        if self.database is not None and self.sent:
+            lines.append("Database: {0:.2f} transactions, {1:.2f} savepoints, {2:.2f} queries per notification".format(
+                self.database.transactions / float(self.sent), self.database.savepoints / float(self.sent), self.database.queries / float(self.sent),
+            ))
+        return lines
+
+
+def run_load_test(url, profile, number, concurrency=10, rate=None, timeout=10.0, stub=None, database=None):
+    """
+    Send the notifications to the ``NotificationView``.
+
+    :param url: The URL of the notification view.
+    :param profile: The traffic to generate.
+    :type profile: TrafficProfile
+    :param number: The number of notifications to send.
+    :param concurrency: The number of concurrent requests.
+    :param rate: The maximum number of notifications per second.
+    :param timeout: The number of seconds after which a request counts as failed, MultiSafepay retries the notification then.
+    :param stub: The stub server that the view fetches the status from. The status of each transaction is changed before its notification.
+    :type stub: StubServer
+    :param database: The counter of the database transactions, when the view runs in this process.
+    :type database: DatabaseCounter
+    :rtype: LoadTestStats
+    """
+    stats = LoadTestStats()
+    stats.database = database
+    limiter = RateLimiter(rate) if rate else None
+    local = threading.local()
+    slots = threading.BoundedSemaphore(concurrency * 2)  # Only generate a limited number of requests ahead.
+
+    def send(notification):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        params = {'transactionid': notification.transaction_id}
+        if notification.type:
+            params['type'] = notification.type
+
+        start = default_timer()
+        error = None
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+            if response.status_code != 200:
+                error = u"HTTP {0}".format(response.status_code)
+            elif notification.type != 'initial' and response.content != b'ok':
+                error = u"invalid reply"
+        except requests.Timeout:
+            error = u"timeout"
+        except requests.RequestException as e:
+            error = e.__class__.__name__
+        finally:
+            slots.release()
+        stats.add(notification, default_timer() - start, error)
+
+    start = default_timer()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        for burst in profile.generate(number):
+            if limiter is not None:
+                limiter.wait()
+            if stub is not None:
+                stub.set_status(burst[0].transaction_id, burst[0].status)
+            for notification in burst:
+                slots.acquire()
+                executor.submit(send, notification)
+    finally:
+        executor.shutdown(wait=True)
+    stats.elapsed = default_timer() - start
+    return stats
+
+
+def serve_wsgi(host='127.0.0.1', port=0):
+    """
+    Serve the Django project in a background thread, with a thread per request.
+    :return: The server, use ``server.server_address`` for the port, and ``server.shutdown()`` to stop it.
+    """
+    from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    class ThreadedWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+    server = ThreadedWSGIServer((host, port), QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django_multisafepay.data.merchant import get_notification_url
+from django_multisafepay.loadtest import DatabaseCounter, TrafficProfile, run_load_test, serve_wsgi
+from django_multisafepay.stubserver import StubServer
+
+
+class Command(BaseCommand):
+    """
+    Measure how many notifications per second the ``NotificationView`` can handle.
+    """
+    help = "Send MultiSafepay notifications to the NotificationView, with the statuses served by a stub API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="The notification URL of a running instance. By default, the project is served by this command, "
+                                          "which also allows to count the database transactions.")
+        parser.add_argument('--number', type=int, default=1000, help="The number of notifications to send.")
+        parser.add_argument('--transactions', type=int, default=100, help="The number of distinct transactions.")
+        parser.add_argument('--concurrency', type=int, default=10, help="The number of concurrent requests.")
+        parser.add_argument('--rate', type=float, default=None, help="The maximum number of notifications per second.")
+        parser.add_argument('--initial-ratio', type=float, default=0.1, help="The fraction of type=initial notifications, which render a page.")
+        parser.add_argument('--duplicate-ratio', type=float, default=0.1, help="The fraction of notifications that is sent in a burst of duplicates.")
+        parser.add_argument('--burst-size', type=int, default=5, help="The number of duplicates in a burst.")
+        parser.add_argument('--timeout', type=float, default=10.0, help="The number of seconds after which a request counts as failed.")
+        parser.add_argument('--stub-port', type=int, default=0, help="The port of the stub API, so a running instance can be pointed to it.")
+        parser.add_argument('--stub-delay', type=float, default=0.0, help="The response time of the stub API, in seconds.")
+        parser.add_argument('--stub-error-rate', type=float, default=0.0, help="The fraction of status calls that fail.")
+
+    def handle(self, *args, **options):
+        stub = StubServer(('127.0.0.1', options['stub_port']), delay=options['stub_delay'], error_rate=options['stub_error_rate']).start()
+        profile = TrafficProfile(
+            transactions=options['transactions'],
+            initial_ratio=options['initial_ratio'],
+            duplicate_ratio=options['duplicate_ratio'],
+            burst_size=options['burst_size'],
+        )
+        run_options = dict(
+            number=options['number'],
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            timeout=options['timeout'],
+            stub=stub,
+        )
+
+        try:
+            if options['url']:
+                self.stdout.write("Make sure the instance uses MULTISAFEPAY_API_URL = '{0}'".format(stub.url))
+                stats = run_load_test(options['url'], profile, **run_options)
+            else:
+                stats = self._run_local(stub, profile, run_options)
+        finally:
+            stub.stop()
+
+        for line in stats.report():
+            self.stdout.write(line)
+
+    def _run_local(self, stub, profile, run_options):
+        host = '127.0.0.1'
+        with override_settings(MULTISAFEPAY_API_URL=stub.url, ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + [host]):
+            server = serve_wsgi(host)
+            database = DatabaseCounter()
+            database.install()
+            try:
+                url = 'http://{0}:{1}{2}'.format(host, server.server_address[1], get_notification_url())
+                return run_load_test(url, profile, database=database, **run_options)
+            finally:
+                database.uninstall()
+                server.shutdown()
+                server.server_close()
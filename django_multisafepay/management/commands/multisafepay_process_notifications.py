@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_multisafepay.notifications import get_notification_queue, process_notifications
+
+
+class Command(BaseCommand):
+    """
+    Process the notifications that are stored in the ``MULTISAFEPAY_NOTIFICATION_QUEUE``.
+    """
+    help = "Process the queued MultiSafepay notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="The number of notifications to process at once.")
+        parser.add_argument('--workers', type=int, default=None, help="The number of concurrent status calls.")
+        parser.add_argument('--interval', type=float, default=1.0, help="The number of seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Stop when the queue is empty.")
+
+    def handle(self, *args, **options):
+        queue = get_notification_queue()
+        if queue is None:
+            self.stderr.write("The MULTISAFEPAY_NOTIFICATION_QUEUE setting is not defined.")
+            return
+
+        total = 0
+        while True:
+            count = process_notifications(queue, batch_size=options['batch_size'], max_workers=options['workers'])
+            total += count
+            if not count:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write("Processed {0} notifications.".format(total))
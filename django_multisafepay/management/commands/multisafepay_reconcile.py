@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_multisafepay.reconcile import Checkpoint, FileSource, QuerySetSource, get_reconcile_queryset, reconcile
+
+try:
+    from django.utils.module_loading import import_string
+except ImportError:  # Django < 1.7
+    from django.utils.module_loading import import_by_path as import_string
+
+
+class Command(BaseCommand):
+    """
+    Check the status of transactions that are not final yet, to catch up on missed notifications.
+    """
+    help = "Fetch the status of the pending MultiSafepay transactions, and send the order_status_updated signal."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids-file', help="A file with one transaction ID per line, instead of the queryset.")
+        parser.add_argument('--queryset', help="Dotted path to a function that returns the queryset of transactions, "
+                                               "defaults to the MULTISAFEPAY_RECONCILE_QUERYSET setting.")
+        parser.add_argument('--id-field', default='transaction_id', help="The field of the queryset that holds the transaction ID.")
+        parser.add_argument('--batch-size', type=int, default=100, help="The number of results that are saved in a single database transaction.")
+        parser.add_argument('--workers', type=int, default=None, help="The number of concurrent status calls.")
+        parser.add_argument('--rate', type=float, default=None, help="The maximum number of status calls per second.")
+        parser.add_argument('--checkpoint', help="A file to store the progress in, so an interrupted run can be resumed.")
+        parser.add_argument('--failed-file', help="Write the transaction ID's that failed to this file, to retry them with --ids-file.")
+
+    def handle(self, *args, **options):
+        if options['ids_file']:
+            source = FileSource(options['ids_file'])
+        elif options['queryset']:
+            source = QuerySetSource(import_string(options['queryset'])(), id_field=options['id_field'])
+        else:
+            source = QuerySetSource(get_reconcile_queryset(), id_field=options['id_field'])
+
+        checkpoint = None
+        if options['checkpoint']:
+            checkpoint = Checkpoint(options['checkpoint'], source.name)
+            try:
+                position = checkpoint.load()
+            except ValueError as e:
+                raise CommandError(str(e))
+            if position is not None:
+                self.stdout.write("Resuming after {0}".format(position))
+
+        failed_file = open(options['failed_file'], 'a') if options['failed_file'] else None
+        try:
+            def on_error(transaction_id, error):
+                if failed_file is not None:
+                    failed_file.write(u"{0}\n".format(transaction_id))
+                    failed_file.flush()
+
+            stats = reconcile(
+                source,
+                batch_size=options['batch_size'],
+                max_workers=options['workers'],
+                rate=options['rate'],
+                checkpoint=checkpoint,
+                on_error=on_error,
+            )
+        finally:
+            if failed_file is not None:
+                failed_file.close()
+
+        # The run is complete, the next run starts from the beginning.
+        if checkpoint is not None:
+            checkpoint.delete()
+
+        self.stdout.write("Reconciled transactions: {0}".format(stats))
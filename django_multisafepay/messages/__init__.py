@@ -1,12 +1,11 @@
 """
 The messages are mainly used for internal purposes.
 The describe the XML format for the calls that the MultiSafepay client makes.
+
+The classes are imported on first access, so importing this package stays cheap.
 """
-from .checkouttransaction import CheckoutTransaction, CheckoutTransactionReply
-from .directtransaction import DirectTransaction, DirectTransactionReply
-from .status import Status, StatusReply
-from .gateway import Gateways, GatewaysReply
-from .redirecttransaction import RedirectTransaction, RedirectTransactionReply
+import sys
+from importlib import import_module
 
 __all__ = (
     'CheckoutTransaction',
@@ -24,3 +23,33 @@ __all__ = (
     'DirectTransaction',
     'DirectTransactionReply',
 )
+
+# The submodule that defines each class.
+_modules = {
+    'CheckoutTransaction': '.checkouttransaction', 'CheckoutTransactionReply': '.checkouttransaction',
+    'Status': '.status', 'StatusReply': '.status',
+    'Gateways': '.gateway', 'GatewaysReply': '.gateway',
+    'RedirectTransaction': '.redirecttransaction', 'RedirectTransactionReply': '.redirecttransaction',
+    'DirectTransaction': '.directtransaction', 'DirectTransactionReply': '.directtransaction',
+}
+
+
+def __getattr__(name):
+    # Called for attributes that are not imported yet (PEP 562).
+    try:
+        module_name = _modules[name]
+    except KeyError:
+        raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+    value = globals()[name] = getattr(import_module(module_name, __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is not supported, import all classes directly.
+    for _name in __all__:
+        __getattr__(_name)
@@ -1,3 +1,4 @@
+import zlib
 from xml.etree import ElementTree
 
 from django_multisafepay import USER_AGENT
@@ -9,30 +10,71 @@ class XmlRequest(XmlObject):
     A root XML node.
     """
 
-    def to_xml(self):
-        lines = self.get_xml_children()
-        return u'<?xml version="1.0" encoding="UTF-8"?>\n' \
-               u'<{0} ua="{1}">{2}</{0}>'.format(self.xml_name, USER_AGENT, u''.join(lines))
+    def write_xml(self, write):
+        write(u'<?xml version="1.0" encoding="UTF-8"?>\n'
+              u'<{0} ua="{1}">'.format(self.xml_name, USER_AGENT))
+        self._write_children(write)
+        write(u'</{0}>'.format(self.xml_name))
+
+
+#: The ``keep_xml`` value of :meth:`XmlResponse.from_xml` to retain the XML as compressed text.
+KEEP_XML_COMPRESSED = 'compressed'
 
 
 class XmlResponse(object):
     """
     Base class for response objects.
+
+    The XML of the reply is available as ``_xml`` attribute, e.g. for logging.
+    When many replies are held in memory, it can be stored compressed or dropped, see :meth:`from_xml`.
+    Like the :class:`~django_multisafepay.data.base.XmlObject`, custom attributes can still be added.
     """
-    _xml = None
+    __slots__ = ('__dict__', '_xml_tree', '_xml_compressed')
+
+    #: The sections of the reply that are parsed by :meth:`get_class_kwargs`,
+    #: as ``(path, kwarg name, class)`` tuples. A path such as ``gateways/gateway`` collects all elements in a list.
+    #: This allows the :class:`~django_multisafepay.messages.parser.StreamParser` to parse the reply incrementally.
+    xml_sections = ()
 
     @classmethod
-    def from_xml(cls, xml):
+    def from_xml(cls, xml, lazy=False, keep_xml=True):
         """
         :type xml: xml.etree.ElementTree.Element
+        :param lazy: Only parse the sections of the reply when they are first accessed.
+                     This is only supported for classes that parse their reply via :attr:`xml_sections`.
+        :param keep_xml: Whether the XML tree is retained as ``_xml`` attribute.
+                         Use ``'compressed'`` to retain it as compressed text, which is parsed again when ``_xml`` is read.
+                         Lazy replies always retain the XML tree, as their sections are parsed from it.
         """
         if xml is None:
             return None
-        kwargs = cls.get_class_kwargs(xml)  # Make kwargs available in debugging stack frame.
-        reply = cls(**kwargs)
-        reply._xml = xml  # Inject response for better logging in Sentry.
+        if lazy and cls._uses_xml_sections():
+            # The attributes are filled by __getattr__() on first access.
+            reply = cls.__new__(cls)
+            reply._xml = xml
+        else:
+            kwargs = cls.get_class_kwargs(xml)  # Make kwargs available in debugging stack frame.
+            reply = cls(**kwargs)
+            if keep_xml == KEEP_XML_COMPRESSED:
+                reply._xml_compressed = zlib.compress(ElementTree.tostring(xml, encoding='utf-8'))
+            elif keep_xml:
+                reply._xml = xml  # Inject response for better logging in Sentry.
         return reply
 
+    @property
+    def _xml(self):
+        xml = getattr(self, '_xml_tree', None)
+        if xml is None:
+            compressed = getattr(self, '_xml_compressed', None)
+            if compressed is not None:
+                return ElementTree.fromstring(zlib.decompress(compressed))
+        return xml
+
+    @_xml.setter
+    def _xml(self, xml):
+        self._xml_tree = xml
+        self._xml_compressed = None
+
     @classmethod
     def get_class_kwargs(cls, xml):
         """
@@ -42,10 +84,39 @@ class XmlResponse(object):
         :return: The parameters for the init method.
         :rtype: dict
         """
-        return {}
+        kwargs = {}
+        for path, name, section_class in cls.xml_sections:
+            kwargs[name] = _parse_section(xml, path, section_class)
+        return kwargs
+
+    @classmethod
+    def _uses_xml_sections(cls):
+        # Lazy and incremental parsing depend on this.
+        # A custom get_class_kwargs() might do more than parsing the xml_sections.
+        return bool(cls.xml_sections) and getattr(cls.get_class_kwargs, '__func__', None) is XmlResponse.get_class_kwargs.__func__
+
+    def __getattr__(self, name):
+        # Only called when the attribute is not set yet, which happens for lazy replies.
+        if name.startswith('_'):
+            # Also avoids recursion for the unset slots that _xml reads.
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, name))
+        if self._xml is not None:
+            for path, kwarg, section_class in self.xml_sections:
+                if kwarg == name:
+                    value = _parse_section(self._xml, path, section_class)
+                    setattr(self, name, value)
+                    return value
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, name))
 
     def __repr__(self):
         if self._xml is not None:
             return '<{0} {1}>'.format(self.__class__.__name__, ElementTree.tostring(self._xml, encoding='utf8'))
         else:
             return '<{0} without _xml data>'.format(self.__class__.__name__)
+
+
+def _parse_section(xml, path, section_class):
+    if '/' in path:
+        return [section_class.from_xml(node) for node in xml.iterfind(path)]
+    else:
+        return section_class.from_xml(xml.find(path))
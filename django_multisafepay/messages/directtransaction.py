@@ -33,3 +33,4 @@ class DirectTransactionReply(RedirectTransactionReply):
     Reply from a directtransaction call.
     Is identical to the standard method reply.
     """
+    __slots__ = ()
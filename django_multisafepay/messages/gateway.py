@@ -24,8 +24,9 @@ class Gateways(XmlRequest):
 
 class GatewaysReply(XmlResponse):
     """
-    Reply from a start_transaction call.
+    Reply from a gateways call.
     """
+    __slots__ = ('gateways',)
 
     def __init__(self, gateways):
         """
@@ -37,13 +38,6 @@ class GatewaysReply(XmlResponse):
     def __iter__(self):
         return iter(self.gateways)
 
-    @classmethod
-    def get_class_kwargs(cls, xml):
-        """
-        Split the object to all ``__init__()`` parameters.
-        :type xml: xml.etree.ElementTree.Element
-        """
-        gateways = xml.find('gateways')
-        return dict(
-            gateways=[Gateway.from_xml(gateway) for gateway in gateways]
-        )
+    xml_sections = (
+        ('gateways/gateway', 'gateways', Gateway),
+    )
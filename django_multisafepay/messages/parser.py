@@ -0,0 +1,90 @@
+"""
+Incremental parsing of the replies, while the response is being received.
+"""
+from xml.etree import ElementTree
+
+
+class StreamParser(object):
+    """
+    Parse a reply incrementally, from the chunks of the response body.
+
+    The sections of the reply (as defined in ``response_class.xml_sections``) are converted
+    into objects as soon as their closing tag is parsed, and then removed from the XML tree.
+    This avoids holding the complete response body and XML tree in memory.
+
+    Error replies (where ``result`` is not ``ok``) are kept as complete XML tree.
+    Reply classes that don't define their sections (e.g. a custom ``get_class_kwargs()``)
+    are constructed from the complete XML tree by :meth:`get_reply`.
+    """
+
+    def __init__(self, response_class=None):
+        """
+        :param response_class: The reply class to construct. Without it, the complete XML tree is returned.
+        :type response_class: XmlResponse
+        """
+        if response_class is not None and response_class._uses_xml_sections():
+            sections = response_class.xml_sections
+        else:
+            sections = ()
+        self.response_class = response_class
+        self.root = None
+        self._parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        self._sections = dict((path, (name, section_class)) for path, name, section_class in sections)
+        self._max_depth = max(path.count('/') + 1 for path, name, section_class in sections) if sections else 0
+        self._kwargs = dict((name, [] if '/' in path else None) for path, name, section_class in sections)
+        self._path = []
+        self._is_ok = False
+
+    def feed(self, data):
+        """
+        Feed the next chunk of the response body.
+        """
+        self._parser.feed(data)
+        self._read_events()
+
+    def close(self):
+        """
+        Finish parsing.
+
+        :return: The root element, which no longer contains the parsed sections.
+        :rtype: xml.etree.ElementTree.Element
+        """
+        self._parser.close()
+        self._read_events()
+        return self.root
+
+    def get_reply(self):
+        """
+        Construct the reply object from all parsed sections.
+        """
+        if not self._sections:
+            return self.response_class.from_xml(self.root, keep_xml=False)
+        return self.response_class(**self._kwargs)
+
+    def _read_events(self):
+        path = self._path
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self.root is None:
+                    self.root = elem
+                    self._is_ok = elem.get('result') == 'ok'
+                else:
+                    path.append(elem.tag)
+            elif elem is not self.root:
+                if self._is_ok and len(path) <= self._max_depth:
+                    section = self._sections.get('/'.join(path))
+                    if section is not None:
+                        self._add_section(section, elem)
+                path.pop()
+
+    def _add_section(self, section, elem):
+        name, section_class = section
+        value = section_class.from_xml(elem)
+        if isinstance(self._kwargs[name], list):
+            self._kwargs[name].append(value)
+        elif self._kwargs[name] is None:
+            # Only the first occurrence is used, just like find() does.
+            self._kwargs[name] = value
+
+        # Free the memory of the parsed nodes.
+        elem.clear()
@@ -46,6 +46,7 @@ class RedirectTransactionReply(XmlResponse):
     """
     Reply from a redirecttransaction call.
     """
+    __slots__ = ('id', 'payment_url')
 
     def __init__(self, id, payment_url):
         """
@@ -20,12 +20,15 @@ class Status(XmlRequest):
         :param merchant: The merchant, with the fields account, site_id, site_code filled in.
         :type merchant: Merchant
         """
-        self.merchant = Merchant(
-            # Only these fields are required:
-            account=merchant.account,
-            site_id=merchant.site_id,
-            site_code=merchant.site_secure_code,
-        )
+        if isinstance(merchant, Merchant):
+            self.merchant = merchant.get_status_merchant()
+        else:
+            self.merchant = Merchant(
+                # Only these fields are required:
+                account=merchant.account,
+                site_id=merchant.site_id,
+                site_code=merchant.site_secure_code,
+            )
         self.transaction = Transaction(id=transaction_id)
 
 
@@ -33,6 +36,7 @@ class StatusReply(XmlResponse):
     """
     Reply from a status call.
     """
+    __slots__ = ('ewallet', 'customer', 'customer_delivery', 'transaction', 'payment_details', 'checkoutdata')
 
     # Fast Checkout example:
     # -----------------------
@@ -186,20 +190,22 @@ class StatusReply(XmlResponse):
     STATUS_REFUNDED = "refunded"       # refunded
     STATUS_EXPIRED = "expired"         # expired
 
-    @classmethod
-    def get_class_kwargs(cls, xml):
-        """
-        :type xml: xml.etree.ElementTree.Element
-        """
-        return dict(
-            ewallet=Ewallet.from_xml(xml.find('ewallet')),
-            customer=CustomerStatus.from_xml(xml.find('customer')),
-            customer_delivery=CustomerDelivery.from_xml(xml.find('customer-delivery')),
-            transaction=TransactionStatus.from_xml(xml.find('transaction')),
-            payment_details=PaymentDetails.from_xml(xml.find('paymentdetails')),
-            checkoutdata=CheckoutData.from_xml(xml.find('checkoutdata')),
-        )
+    #: The statuses that no longer change by themselves.
+    FINAL_STATUSES = (STATUS_COMPLETED, STATUS_CANCELLED, STATUS_DECLINED, STATUS_REFUNDED, STATUS_EXPIRED)
+
+    xml_sections = (
+        ('ewallet', 'ewallet', Ewallet),
+        ('customer', 'customer', CustomerStatus),
+        ('customer-delivery', 'customer_delivery', CustomerDelivery),
+        ('transaction', 'transaction', TransactionStatus),
+        ('paymentdetails', 'payment_details', PaymentDetails),
+        ('checkoutdata', 'checkoutdata', CheckoutData),
+    )
 
     @property
     def status_code(self):
         return self.ewallet.status
+
+    @property
+    def is_final(self):
+        return self.ewallet.status in self.FINAL_STATUSES
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=100, unique=True, verbose_name='transaction ID')),
+                ('type', models.CharField(blank=True, max_length=20, verbose_name='type')),
+                ('received', models.DateTimeField(default=django.utils.timezone.now, verbose_name='received')),
+                ('available_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='available at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+            ],
+            options={
+                'verbose_name': 'queued notification',
+                'verbose_name_plural': 'queued notifications',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_multisafepay', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=100, unique=True, verbose_name='transaction ID')),
+                ('ewallet_id', models.CharField(blank=True, max_length=100, verbose_name='ewallet ID')),
+                ('status', models.CharField(db_index=True, max_length=30, verbose_name='status')),
+                ('modified', models.CharField(blank=True, help_text='As reported by MultiSafepay (YYYYMMDDhhmmss)', max_length=20, verbose_name='modified')),
+                ('amount', models.BigIntegerField(blank=True, help_text='In cents', null=True, verbose_name='amount')),
+                ('amount_refunded', models.BigIntegerField(blank=True, help_text='In cents', null=True, verbose_name='amount refunded')),
+                ('xml', models.TextField(blank=True, verbose_name='XML')),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now, verbose_name='updated')),
+            ],
+            options={
+                'verbose_name': 'status snapshot',
+                'verbose_name_plural': 'status snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from django_multisafepay.messages.status import StatusReply
+
+
+class QueuedNotification(models.Model):
+    """
+    A notification that is waiting to be processed by the worker.
+    This is used by the :class:`~django_multisafepay.notifications.DatabaseQueue`.
+    """
+    transaction_id = models.CharField(_("transaction ID"), max_length=100, unique=True)
+    type = models.CharField(_("type"), max_length=20, blank=True)
+    received = models.DateTimeField(_("received"), default=timezone.now)
+    available_at = models.DateTimeField(_("available at"), default=timezone.now, db_index=True)
+    attempts = models.PositiveIntegerField(_("attempts"), default=0)
+
+    class Meta:
+        verbose_name = _("queued notification")
+        verbose_name_plural = _("queued notifications")
+
+    def __str__(self):
+        return self.transaction_id
+
+
+class StatusSnapshotQuerySet(models.QuerySet):
+    def final(self):
+        """
+        The transactions that no longer change by themselves.
+        """
+        return self.filter(status__in=StatusReply.FINAL_STATUSES)
+
+    def pending(self):
+        """
+        The transactions that can still change, e.g. to check their status again.
+        """
+        return self.exclude(status__in=StatusReply.FINAL_STATUSES)
+
+
+class StatusSnapshot(models.Model):
+    """
+    The last known status of a transaction.
+    This is stored when ``MULTISAFEPAY_STATUS_SNAPSHOTS`` is enabled.
+    """
+    transaction_id = models.CharField(_("transaction ID"), max_length=100, unique=True)
+    ewallet_id = models.CharField(_("ewallet ID"), max_length=100, blank=True)
+    status = models.CharField(_("status"), max_length=30, db_index=True)
+    modified = models.CharField(_("modified"), max_length=20, blank=True, help_text=_("As reported by MultiSafepay (YYYYMMDDhhmmss)"))
+    amount = models.BigIntegerField(_("amount"), null=True, blank=True, help_text=_("In cents"))
+    amount_refunded = models.BigIntegerField(_("amount refunded"), null=True, blank=True, help_text=_("In cents"))
+    xml = models.TextField(_("XML"), blank=True)
+    updated = models.DateTimeField(_("updated"), default=timezone.now)
+
+    objects = StatusSnapshotQuerySet.as_manager()
+
+    #: The fields that are compared to detect a change of the status.
+    compared_fields = ('status', 'modified', 'amount', 'amount_refunded')
+
+    class Meta:
+        verbose_name = _("status snapshot")
+        verbose_name_plural = _("status snapshots")
+
+    def __str__(self):
+        return u"{0}: {1}".format(self.transaction_id, self.status)
+
+    @property
+    def is_final(self):
+        return self.status in StatusReply.FINAL_STATUSES
@@ -0,0 +1,519 @@
+"""
+Processing of the notifications, either directly in the view or queued for a background worker.
+"""
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from xml.etree import ElementTree
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django_multisafepay import appsettings
+from django_multisafepay.cache import DjangoCacheBackend, LocalCacheBackend
+from django_multisafepay.signals import order_status_batch_updated, order_status_updated
+
+try:
+    from django.utils.module_loading import import_string
+except ImportError:  # Django < 1.7
+    from django.utils.module_loading import import_by_path as import_string
+
+logger = logging.getLogger(__name__)
+
+# New transaction support in Django 1.6
+try:
+    transaction_atomic = transaction.atomic
+except AttributeError:
+    transaction_atomic = transaction.commit_on_success
+
+
+def dispatch_status_update(sender, statusreply, request=None, coalescer=None):
+    """
+    Let the project update the status, by sending the ``order_status_updated`` signal.
+
+    When ``MULTISAFEPAY_STATUS_SNAPSHOTS`` is enabled, the signal is only sent when the status actually changed,
+    and the ``previous`` argument of the signal contains the previous :class:`~django_multisafepay.models.StatusSnapshot`.
+
+    :param sender: The sender of the signal, typically the view class.
+    :param statusreply: The new status.
+    :type statusreply: StatusReply
+    :param request: The notification request, this is ``None`` when the notification is processed by the worker.
+    :param coalescer: When given, the signal is not sent again for a status that was already dispatched.
+    :type coalescer: NotificationCoalescer
+    :return: Whether the signal was sent.
+    """
+    has_listeners = order_status_updated.has_listeners()
+    if not has_listeners:
+        logger.warning("No listeners for `order_status_updated` signal!")
+        if not appsettings.MULTISAFEPAY_STATUS_SNAPSHOTS:
+            return False
+
+    if coalescer is not None and not coalescer.claim_dispatch(statusreply):
+        logger.debug(u"Skipping duplicate status update for transaction %s", statusreply.ewallet.id)
+        return False
+
+    try:
+        with transaction_atomic():
+            previous = None
+            if appsettings.MULTISAFEPAY_STATUS_SNAPSHOTS:
+                previous, changed = update_snapshot(statusreply)
+                if not changed:
+                    logger.debug(u"Status of transaction %s is unchanged", statusreply.transaction.id)
+                    return False
+
+            if not has_listeners:
+                # The snapshot is still updated, so a receiver that is connected later only sees actual changes.
+                return False
+            order_status_updated.send(sender, statusreply=statusreply, request=request, previous=previous)
+    except Exception:
+        if coalescer is not None:
+            # Allow the retry of the notification to send the signal again.
+            coalescer.forget(statusreply)
+        raise
+    return True
+
+
+def dispatch_status_updates(sender, statusreplies, coalescer=None):
+    """
+    Let the project update the status of many transactions at once, in a single database transaction.
+
+    The ``order_status_batch_updated`` signal is sent once with all changed replies,
+    and the ``order_status_updated`` signal is sent for each of them.
+    When a receiver fails, the batch is rolled back to its savepoint, and each reply is dispatched again in its own savepoint.
+    This way, a failure only affects the reply that caused it.
+
+    :param sender: The sender of the signals.
+    :param statusreplies: The new statuses.
+    :type statusreplies: list
+    :param coalescer: When given, the signals are not sent again for a status that was already dispatched.
+    :type coalescer: NotificationCoalescer
+    :return: The ``(statusreply, result)`` tuples, where the result tells whether the signals were sent,
+             or is the exception when the dispatch failed.
+    :rtype: list
+    """
+    has_listeners = order_status_updated.has_listeners() or order_status_batch_updated.has_listeners()
+    if not has_listeners:
+        logger.warning("No listeners for `order_status_updated` or `order_status_batch_updated` signals!")
+        if not appsettings.MULTISAFEPAY_STATUS_SNAPSHOTS:
+            return [(statusreply, False) for statusreply in statusreplies]
+
+    results = dict((id(statusreply), False) for statusreply in statusreplies)
+    claimed = []
+    for statusreply in statusreplies:
+        if coalescer is not None and not coalescer.claim_dispatch(statusreply):
+            logger.debug(u"Skipping duplicate status update for transaction %s", statusreply.ewallet.id)
+            continue
+        claimed.append(statusreply)
+
+    def _failed(statusreply, error):
+        logger.exception(u"Failed to process status of transaction %s", statusreply.transaction.id)
+        results[id(statusreply)] = error
+        if coalescer is not None:
+            # Allow the retry of the notification to send the signals again.
+            coalescer.forget(statusreply)
+
+    with transaction_atomic():
+        try:
+            results.update(_dispatch_batch(sender, claimed))
+        except Exception as e:
+            if len(claimed) == 1:
+                _failed(claimed[0], e)
+            else:
+                logger.warning(u"Failed to process a batch of %d status updates, dispatching them one by one", len(claimed))
+                for statusreply in claimed:
+                    try:
+                        results.update(_dispatch_batch(sender, [statusreply]))
+                    except Exception as e:
+                        _failed(statusreply, e)
+
+    dispatched = [(statusreply, results[id(statusreply)]) for statusreply in statusreplies]
+    if not has_listeners:
+        # Only the snapshots were updated, no signals were sent.
+        dispatched = [(statusreply, result if isinstance(result, Exception) else False) for statusreply, result in dispatched]
+    return dispatched
+
+
+def _dispatch_batch(sender, statusreplies):
+    # Runs in a savepoint, so a failure rolls back the snapshots and the work of the receivers.
+    if not statusreplies:
+        return {}
+
+    with transaction_atomic():
+        changed = []
+        previous = []
+        for statusreply in statusreplies:
+            snapshot = None
+            if appsettings.MULTISAFEPAY_STATUS_SNAPSHOTS:
+                snapshot, is_changed = update_snapshot(statusreply)
+                if not is_changed:
+                    logger.debug(u"Status of transaction %s is unchanged", statusreply.transaction.id)
+                    continue
+            changed.append(statusreply)
+            previous.append(snapshot)
+
+        if changed:
+            for statusreply, snapshot in zip(changed, previous):
+                order_status_updated.send(sender, statusreply=statusreply, request=None, previous=snapshot)
+            order_status_batch_updated.send(sender, statusreplies=changed, previous=previous)
+
+    is_changed = set(id(statusreply) for statusreply in changed)
+    return dict((id(statusreply), id(statusreply) in is_changed) for statusreply in statusreplies)
+
+
+def get_snapshot_values(statusreply):
+    """
+    Return the fields of the :class:`~django_multisafepay.models.StatusSnapshot` for a status reply.
+    :type statusreply: StatusReply
+    :rtype: dict
+    """
+    transaction = statusreply.transaction
+    return dict(
+        ewallet_id=statusreply.ewallet.id or '',
+        status=statusreply.ewallet.status or '',
+        modified=statusreply.ewallet.modified or '',
+        amount=_to_int(transaction.amount) if transaction is not None else None,
+        amount_refunded=_to_int(transaction.amountrefunded) if transaction is not None else None,
+        # The XML is not available when the reply was parsed incrementally.
+        xml=ElementTree.tostring(statusreply._xml, encoding='utf-8').decode('utf-8') if statusreply._xml is not None else '',
+        updated=timezone.now(),
+    )
+
+
+def update_snapshot(statusreply):
+    """
+    Store the new status of a transaction.
+    This should be called inside a database transaction, as the existing snapshot is locked until it's committed.
+
+    :type statusreply: StatusReply
+    :return: The previous snapshot (``None`` for a new transaction), and whether the status changed.
+    :rtype: tuple
+    """
+    from django_multisafepay.models import StatusSnapshot
+
+    transaction_id = statusreply.transaction.id
+    values = get_snapshot_values(statusreply)
+    snapshot = StatusSnapshot.objects.select_for_update().filter(transaction_id=transaction_id).first()
+    if snapshot is None:
+        try:
+            with transaction_atomic():
+                StatusSnapshot.objects.create(transaction_id=transaction_id, **values)
+            return None, True
+        except IntegrityError:
+            # Created by a concurrent notification for the same transaction.
+            snapshot = StatusSnapshot.objects.select_for_update().get(transaction_id=transaction_id)
+
+    if values['modified'] and snapshot.modified and values['modified'] < snapshot.modified:
+        # An older status, which was fetched before the stored one.
+        return snapshot, False
+    if all(getattr(snapshot, field) == values[field] for field in StatusSnapshot.compared_fields):
+        return snapshot, False
+
+    previous = copy.copy(snapshot)
+    for field, value in values.items():
+        setattr(snapshot, field, value)
+    snapshot.save()
+    return previous, True
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class NotificationCoalescer(object):
+    """
+    Avoid duplicate work when MultiSafepay sends the same notification multiple times.
+
+    * Concurrent notifications for the same transaction share a single ``status()`` call.
+    * For repeated notifications within ``window`` seconds, the ``order_status_updated`` signal is only sent
+      when the status or ``ewallet.modified`` timestamp changed.
+
+    The dispatched statuses are registered with the atomic ``add()`` of the backend,
+    so a :class:`~django_multisafepay.cache.DjangoCacheBackend` shares them between processes.
+    """
+
+    def __init__(self, backend, window):
+        """
+        :param backend: The storage, e.g. :class:`~django_multisafepay.cache.LocalCacheBackend` or :class:`~django_multisafepay.cache.DjangoCacheBackend`.
+        :param window: The number of seconds a dispatched status is remembered.
+        """
+        self.backend = backend
+        self.window = window
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def fetch_status(self, client, transaction_id):
+        """
+        Fetch the status, sharing the call with concurrent notifications for the same transaction.
+        :type client: MultiSafepayClient
+        :rtype: StatusReply
+        """
+        key = (client.merchant.account, client.is_test, transaction_id)
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = Future()
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            statusreply = client.status(transaction_id, refresh=True)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(statusreply)
+            return statusreply
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def claim_dispatch(self, statusreply):
+        """
+        Register that the status will be dispatched.
+        :return: ``False`` when the same status was already dispatched within the window.
+        """
+        key = self._get_key(statusreply)
+        if key is None:
+            return True
+        return self.backend.add(key, True, self.window)
+
+    def forget(self, statusreply):
+        """
+        Unregister the status, so it will be dispatched again.
+        """
+        key = self._get_key(statusreply)
+        if key is not None:
+            self.backend.delete(key)
+
+    def _get_key(self, statusreply):
+        ewallet = statusreply.ewallet
+        if ewallet is None or not ewallet.modified:
+            return None
+        return u"notification:{0}:{1}:{2}".format(ewallet.id, ewallet.status, ewallet.modified)
+
+
+class BaseNotificationQueue(object):
+    """
+    The interface for a notification queue.
+
+    The queue is used by the :class:`~django_multisafepay.views.NotificationView`
+    when ``MULTISAFEPAY_NOTIFICATION_QUEUE`` is set, and drained by :func:`process_notifications`.
+    The claimed items should have a ``transaction_id`` attribute.
+    """
+
+    def enqueue(self, transaction_id, type=None):
+        """
+        Store the notification, so it will be processed later.
+        """
+        raise NotImplementedError("Queue backends should implement enqueue()")
+
+    def claim(self, batch_size):
+        """
+        Take the next notifications from the queue, so no other worker will process them.
+        :rtype: list
+        """
+        raise NotImplementedError("Queue backends should implement claim()")
+
+    def ack(self, items):
+        """
+        Remove the processed notifications from the queue.
+        """
+        raise NotImplementedError("Queue backends should implement ack()")
+
+    def release(self, items):
+        """
+        Put the notifications that failed back in the queue, so they will be retried.
+        """
+        raise NotImplementedError("Queue backends should implement release()")
+
+
+class DatabaseQueue(BaseNotificationQueue):
+    """
+    A notification queue that is stored in the database, using the :class:`~django_multisafepay.models.QueuedNotification` model.
+
+    Multiple notifications for the same transaction are merged into a single entry.
+    Claimed entries are locked for ``lock_timeout`` seconds; failed entries become available again after that time.
+    A notification for a locked entry is processed again once the worker that claimed it is done.
+    """
+
+    def __init__(self, lock_timeout=None, max_attempts=None):
+        self.lock_timeout = lock_timeout or appsettings.MULTISAFEPAY_QUEUE_LOCK_TIMEOUT
+        self.max_attempts = max_attempts or appsettings.MULTISAFEPAY_QUEUE_MAX_ATTEMPTS
+
+    @property
+    def model(self):
+        from django_multisafepay.models import QueuedNotification
+        return QueuedNotification
+
+    def enqueue(self, transaction_id, type=None):
+        now = timezone.now()
+        values = dict(type=type or '', received=now)
+        entries = self.model.objects.filter(transaction_id=transaction_id)
+        if entries.filter(available_at__lte=now).update(available_at=now, attempts=0, **values):
+            return
+        if entries.update(**values):
+            # The entry is claimed by a worker, and stays locked so no other worker processes it at the same time.
+            # As the received time changed, ack() makes it available again.
+            return
+
+        try:
+            with transaction_atomic():
+                self.model.objects.create(transaction_id=transaction_id, available_at=now, **values)
+        except IntegrityError:
+            # Created by a concurrent notification for the same transaction.
+            entries.update(**values)
+
+    def claim(self, batch_size):
+        now = timezone.now()
+        with transaction_atomic():
+            items = list(
+                self.model.objects
+                .select_for_update(skip_locked=True)
+                .filter(available_at__lte=now)
+                .order_by('available_at')[:batch_size]
+            )
+            if items:
+                self.model.objects.filter(pk__in=[item.pk for item in items]).update(
+                    available_at=now + timedelta(seconds=self.lock_timeout),
+                    attempts=F('attempts') + 1,
+                )
+        return items
+
+    def ack(self, items):
+        if not items:
+            return
+
+        # When a new notification arrived while processing, the entry is kept so it's processed again.
+        self.model.objects.filter(
+            reduce(or_, [Q(pk=item.pk, received=item.received) for item in items])
+        ).delete()
+        self.model.objects.filter(pk__in=[item.pk for item in items]).update(available_at=timezone.now(), attempts=0)
+
+    def release(self, items):
+        # The entries become available again when the lock expires.
+        # Only remove the entries that failed too often.
+        give_up = [item for item in items if item.attempts + 1 >= self.max_attempts]
+        for item in give_up:
+            logger.error(u"Giving up on notification for transaction %s after %d attempts", item.transaction_id, item.attempts + 1)
+        self.ack(give_up)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_notification_queue():
+    """
+    Return the notification queue, as configured in the ``MULTISAFEPAY_NOTIFICATION_QUEUE`` setting.
+    :return: The queue, or ``None`` when notifications are processed directly.
+    :rtype: BaseNotificationQueue
+    """
+    global _queue
+    if not appsettings.MULTISAFEPAY_NOTIFICATION_QUEUE:
+        return None
+
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = import_string(appsettings.MULTISAFEPAY_NOTIFICATION_QUEUE)()
+    return _queue
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_notification_coalescer():
+    """
+    Return the coalescer for repeated notifications, as configured by the ``MULTISAFEPAY_NOTIFICATION_DEDUP_...`` settings.
+    :return: The coalescer, or ``None`` when de-duplication is disabled.
+    :rtype: NotificationCoalescer
+    """
+    global _coalescer
+    if not appsettings.MULTISAFEPAY_NOTIFICATION_DEDUP_WINDOW:
+        return None
+
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                if appsettings.MULTISAFEPAY_NOTIFICATION_DEDUP_BACKEND:
+                    backend = DjangoCacheBackend(appsettings.MULTISAFEPAY_NOTIFICATION_DEDUP_BACKEND)
+                else:
+                    backend = LocalCacheBackend(max_size=appsettings.MULTISAFEPAY_NOTIFICATION_DEDUP_SIZE)
+
+                _coalescer = NotificationCoalescer(backend, window=appsettings.MULTISAFEPAY_NOTIFICATION_DEDUP_WINDOW)
+    return _coalescer
+
+
+def _setting_changed(setting):
+    global _queue, _coalescer
+    if setting.startswith('MULTISAFEPAY_NOTIFICATION_DEDUP_'):
+        _coalescer = None
+    else:
+        _queue = None
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_NOTIFICATION_QUEUE', 'MULTISAFEPAY_QUEUE_', 'MULTISAFEPAY_NOTIFICATION_DEDUP_'), _setting_changed)
+
+
+def process_notifications(queue=None, client=None, batch_size=100, max_workers=None, sender=None):
+    """
+    Process one batch of queued notifications.
+
+    The status of all notifications is fetched concurrently,
+    and the ``order_status_updated`` signal is sent for each transaction.
+    Notifications that failed are retried later.
+
+    :param queue: The queue to read from, defaults to the configured queue.
+    :type queue: BaseNotificationQueue
+    :param client: The client to fetch the status with.
+    :type client: MultiSafepayClient
+    :param batch_size: The maximum number of notifications to process.
+    :param max_workers: The maximum number of concurrent status calls.
+    :param sender: The sender of the signal, defaults to the :class:`~django_multisafepay.views.NotificationView`.
+    :return: The number of claimed notifications.
+    """
+    from django_multisafepay.client import MultiSafepayClient
+    from django_multisafepay.views import NotificationView
+
+    queue = queue or get_notification_queue()
+    client = client or MultiSafepayClient()
+    sender = sender or NotificationView
+    coalescer = get_notification_coalescer()
+
+    items = queue.claim(batch_size)
+    if not items:
+        return 0
+
+    by_id = dict((item.transaction_id, item) for item in items)
+    fetched = []
+    failed = []
+    # The notification means the status changed, so the cached status is not used.
+    for transaction_id, result in client.status_many(list(by_id), max_workers=max_workers, refresh=True):
+        if isinstance(result, Exception):
+            logger.error(u"Failed to fetch status for queued notification %s: %s", transaction_id, result)
+            failed.append(by_id[transaction_id])
+        else:
+            fetched.append((transaction_id, result))
+
+    # All statuses are dispatched in a single database transaction.
+    done = []
+    dispatched = dispatch_status_updates(sender, [statusreply for transaction_id, statusreply in fetched], coalescer=coalescer)
+    for (transaction_id, _), (_, result) in zip(fetched, dispatched):
+        if isinstance(result, Exception):
+            failed.append(by_id[transaction_id])
+        else:
+            done.append(by_id[transaction_id])
+
+    queue.ack(done)
+    queue.release(failed)
+    return len(items)
@@ -0,0 +1,43 @@
+"""
+Pytest fixtures, to run the tests of a project against the stub of the MultiSafepay API.
+
+Enable them in the ``conftest.py`` of the project::
+
+    pytest_plugins = ['django_multisafepay.pytest_plugin']
+"""
+import pytest
+from django.test.utils import override_settings
+from django_multisafepay.stubserver import StubServer
+
+
+@pytest.fixture
+def multisafepay_stub():
+    """
+    A running :class:`~django_multisafepay.stubserver.StubServer`, which receives all API calls of the test.
+
+    The notifications are sent to the ``NotificationView`` with the Django test client,
+    so they run in the same thread and database transaction as the test::
+
+        def test_paid(multisafepay_stub):
+            multisafepay_stub.set_status('1234', 'completed', notify=True)
+    """
+    server = StubServer(notify_callback=call_notification_view).start()
+    try:
+        with override_settings(MULTISAFEPAY_API_URL=server.url):
+            yield server
+    finally:
+        server.stop()
+
+
+def call_notification_view(transaction_id, type=None):
+    """
+    Send a notification to the ``NotificationView``, using the Django test client.
+    :rtype: django.http.HttpResponse
+    """
+    from django.test import Client
+    from django_multisafepay.data.merchant import get_notification_url
+
+    params = {'transactionid': transaction_id}
+    if type:
+        params['type'] = type
+    return Client().get(get_notification_url(), params)
@@ -0,0 +1,306 @@
+"""
+Reconciliation of the transaction statuses, to catch up on notifications that were missed.
+
+The status of each transaction is fetched concurrently, and the results are
+dispatched as ``order_status_updated`` and ``order_status_batch_updated`` signals in batches of database transactions.
+After each batch, the progress is stored in a checkpoint file, so an interrupted run can be resumed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from timeit import default_timer
+
+from django_multisafepay import appsettings
+from django_multisafepay.notifications import dispatch_status_updates, get_notification_coalescer
+
+try:
+    from django.utils.module_loading import import_string
+except ImportError:  # Django < 1.7
+    from django.utils.module_loading import import_by_path as import_string
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter(object):
+    """
+    Limit the number of calls per second, shared by all threads.
+    The calls are evenly spaced, so there are no bursts.
+    """
+
+    def __init__(self, rate):
+        """
+        :param rate: The maximum number of calls per second.
+        """
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Block until the next call is allowed.
+        """
+        with self._lock:
+            now = default_timer()
+            start = max(now, self._next)
+            self._next = start + self.interval
+
+        if start > now:
+            time.sleep(start - now)
+
+
+class QuerySetSource(object):
+    """
+    Read the transaction ID's from a queryset.
+
+    The queryset is ordered by the ID field, so a resumed run continues after the last processed ID.
+    The results are streamed using ``.iterator()``, so large querysets are not loaded in memory.
+    """
+
+    def __init__(self, queryset, id_field='transaction_id'):
+        self.queryset = queryset
+        self.id_field = id_field
+
+    @property
+    def name(self):
+        return u"queryset:{0}.{1}".format(self.queryset.model._meta.db_table, self.id_field)
+
+    def iterate(self, after=None):
+        """
+        Return the ``(position, transaction_id)`` tuples, starting after the given position.
+        """
+        queryset = self.queryset.order_by(self.id_field)
+        if after is not None:
+            queryset = queryset.filter(**{self.id_field + '__gt': after})
+
+        for transaction_id in queryset.values_list(self.id_field, flat=True).distinct().iterator():
+            yield transaction_id, transaction_id
+
+
+class FileSource(object):
+    """
+    Read the transaction ID's from a text file, with one ID per line.
+    Empty lines, and lines that start with ``#`` are ignored.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    @property
+    def name(self):
+        return u"file:{0}".format(os.path.abspath(self.filename))
+
+    def iterate(self, after=None):
+        """
+        Return the ``(line number, transaction_id)`` tuples, starting after the given line.
+        """
+        with open(self.filename) as f:
+            for line_number, line in enumerate(f, 1):
+                if after is not None and line_number <= after:
+                    continue
+
+                transaction_id = line.strip()
+                if transaction_id and not transaction_id.startswith('#'):
+                    yield line_number, transaction_id
+
+
+class Checkpoint(object):
+    """
+    Stores the position of the last processed transaction in a JSON file.
+    """
+
+    def __init__(self, filename, source_name):
+        self.filename = filename
+        self.source_name = source_name
+
+    def load(self):
+        """
+        Read the stored position.
+        :return: The position, or ``None`` when there is no checkpoint.
+        :raises ValueError: When the checkpoint was written for a different source.
+        """
+        if not os.path.exists(self.filename):
+            return None
+
+        with open(self.filename) as f:
+            data = json.load(f)
+
+        if data['source'] != self.source_name:
+            raise ValueError("Checkpoint {0} belongs to {1}, not {2}".format(self.filename, data['source'], self.source_name))
+        return data['position']
+
+    def save(self, position, stats):
+        """
+        Store the position, replacing the file atomically so a crash never leaves a partial file.
+        """
+        data = {
+            'source': self.source_name,
+            'position': position,
+            'stats': stats.as_dict(),
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_filename, self.filename)
+
+    def delete(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+class ReconcileStats(object):
+    """
+    The totals of a reconciliation run.
+    """
+
+    def __init__(self):
+        self.fetched = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return {
+            'fetched': self.fetched,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+        }
+
+    def __str__(self):
+        return "{0} fetched, {1} updated, {2} unchanged, {3} errors".format(self.fetched, self.updated, self.unchanged, self.errors)
+
+
+class _Progress(object):
+    """
+    Track which positions are completely processed.
+
+    As the results arrive in completion order, the position only advances
+    when all transactions before it are processed too.
+    """
+
+    def __init__(self, position=None):
+        self.position = position
+        self._pending = OrderedDict()  # position -> whether it's processed
+        self._positions = {}  # transaction_id -> position
+
+    def start(self, position, transaction_id):
+        """
+        Register a transaction that will be fetched.
+        :return: ``False`` when the same transaction is already being fetched.
+        """
+        if transaction_id in self._positions:
+            self._pending[position] = True
+            return False
+
+        self._pending[position] = False
+        self._positions[transaction_id] = position
+        return True
+
+    def finish(self, transaction_id):
+        """
+        Register that the transaction is processed.
+        """
+        self._pending[self._positions.pop(transaction_id)] = True
+        while self._pending:
+            position, is_done = next(iter(self._pending.items()))
+            if not is_done:
+                break
+            del self._pending[position]
+            self.position = position
+
+
+def get_reconcile_queryset():
+    """
+    Return the queryset of transactions to reconcile, as configured in the ``MULTISAFEPAY_RECONCILE_QUERYSET`` setting.
+    By default, these are the pending transactions of the :class:`~django_multisafepay.models.StatusSnapshot` model.
+    """
+    if appsettings.MULTISAFEPAY_RECONCILE_QUERYSET:
+        return import_string(appsettings.MULTISAFEPAY_RECONCILE_QUERYSET)()
+
+    from django_multisafepay.models import StatusSnapshot
+    return StatusSnapshot.objects.pending()
+
+
+def reconcile(source, client=None, batch_size=100, max_workers=None, rate=None, checkpoint=None, sender=None, on_error=None):
+    """
+    Fetch the status of all transactions of the source, and send the ``order_status_updated`` signal for each transaction.
+
+    :param source: Where to read the transaction ID's from.
+    :type source: QuerySetSource | FileSource
+    :param client: The client to fetch the status with.
+    :type client: MultiSafepayClient
+    :param batch_size: The number of results that are dispatched in a single database transaction.
+    :param max_workers: The maximum number of concurrent status calls.
+    :param rate: The maximum number of status calls per second.
+    :param checkpoint: When given, the run continues after the stored position, and the position is updated after each batch.
+    :type checkpoint: Checkpoint
+    :param sender: The sender of the signal, defaults to the :class:`~django_multisafepay.views.NotificationView`.
+    :param on_error: An optional callback, which is called with the ``transaction_id`` and exception of each failure.
+    :rtype: ReconcileStats
+    """
+    from django_multisafepay.client import MultiSafepayClient
+    from django_multisafepay.views import NotificationView
+
+    client = client or MultiSafepayClient()
+    sender = sender or NotificationView
+    coalescer = get_notification_coalescer()
+    limiter = RateLimiter(rate) if rate else None
+    progress = _Progress(checkpoint.load() if checkpoint is not None else None)
+    stats = ReconcileStats()
+
+    def _failed(transaction_id, error):
+        stats.errors += 1
+        if on_error is not None:
+            on_error(transaction_id, error)
+
+    def _get_transaction_ids():
+        # Read lazily by status_many(), so the rate limit also throttles the submitted calls.
+        for position, transaction_id in source.iterate(after=progress.position):
+            if not progress.start(position, transaction_id):
+                continue
+            if limiter is not None:
+                limiter.wait()
+            yield transaction_id
+
+    def _flush(batch):
+        fetched = []
+        for transaction_id, result in batch:
+            if isinstance(result, Exception):
+                logger.error(u"Failed to fetch status of transaction %s: %s", transaction_id, result)
+                _failed(transaction_id, result)
+            else:
+                fetched.append((transaction_id, result))
+
+        # The batch is dispatched in a single database transaction, with a savepoint per item when a receiver fails.
+        dispatched = dispatch_status_updates(sender, [statusreply for transaction_id, statusreply in fetched], coalescer=coalescer)
+        for (transaction_id, _), (_, result) in zip(fetched, dispatched):
+            if isinstance(result, Exception):
+                _failed(transaction_id, result)
+            elif result:
+                stats.updated += 1
+            else:
+                stats.unchanged += 1
+
+        # Only advance after the batch is committed, so a crash resumes at the first uncommitted result.
+        for transaction_id, result in batch:
+            progress.finish(transaction_id)
+        if checkpoint is not None and progress.position is not None:
+            checkpoint.save(progress.position, stats)
+        logger.info(u"Reconciled %d transactions: %s", stats.fetched, stats)
+
+    # The cached statuses are not used, as these may be outdated when a notification was missed.
+    batch = []
+    for transaction_id, result in client.status_many(_get_transaction_ids(), max_workers=max_workers, refresh=True):
+        stats.fetched += 1
+        batch.append((transaction_id, result))
+        if len(batch) >= batch_size:
+            _flush(batch)
+            batch = []
+
+    if batch:
+        _flush(batch)
+    return stats
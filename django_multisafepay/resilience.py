@@ -0,0 +1,172 @@
+"""
+Handling of transient failures of the API: retries with backoff, and a circuit breaker.
+"""
+import logging
+import random
+import threading
+import time
+
+from django_multisafepay import appsettings
+from django_multisafepay.exceptions import MultiSafepayUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """
+    Decides which calls are retried, and how long to wait in between.
+
+    Only messages that don't change anything at the server are retried,
+    as a failed call might have been processed anyway.
+    The delay grows exponentially, with "full jitter" so clients don't retry in lockstep.
+    """
+
+    #: The messages (by ``xml_name``) that are safe to send twice.
+    idempotent_messages = ('status', 'gateways')
+
+    def __init__(self, max_retries=2, backoff=0.5, max_backoff=5.0):
+        """
+        :param max_retries: The maximum number of retries after the first attempt failed.
+        :param backoff: The base delay in seconds, which doubles after every attempt.
+        :param max_backoff: The maximum delay in seconds.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def can_retry(self, message, retries):
+        """
+        Tell whether the message can be sent again, after the given number of retries.
+        """
+        return retries < self.max_retries and message.xml_name in self.idempotent_messages
+
+    def get_delay(self, retries):
+        """
+        Return the number of seconds to wait before the next retry.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** retries)))
+
+
+class CircuitBreaker(object):
+    """
+    Stop calling the API when it's down, so the callers fail fast instead of waiting for timeouts.
+
+    * After ``failure_threshold`` consecutive failures, the circuit "opens" and calls raise :class:`MultiSafepayUnavailable`.
+    * After ``reset_timeout`` seconds, a single trial call is let through.
+      When it succeeds, the circuit is closed again, otherwise it stays open for another period.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        """
+        :param failure_threshold: The number of consecutive failures that opens the circuit.
+        :param reset_timeout: The number of seconds before a trial call is made.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check whether a call can be made.
+        :raises MultiSafepayUnavailable: When the circuit is open.
+        """
+        if self.state == self.CLOSED:
+            return
+
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                # Let this call through as trial, all others still fail fast.
+                self.state = self.HALF_OPEN
+                return
+            elif self.state == self.CLOSED:
+                return
+
+        raise MultiSafepayUnavailable("MultiSafepay is unavailable, not calling the API for {0} seconds".format(self.reset_timeout))
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(u"MultiSafepay API is available again, closing circuit breaker")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_inconclusive(self):
+        """
+        The call failed before the API could answer (e.g. due to an invalid request).
+        When this was the trial call, the next call becomes the trial.
+        """
+        if self.state != self.HALF_OPEN:
+            return
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.error(u"MultiSafepay API failed %d times, opening circuit breaker for %s seconds", self.failures, self.reset_timeout)
+                self.state = self.OPEN
+                self._opened_at = time.time()
+
+
+_default_retry_policy = None
+_circuit_breakers = {}
+_lock = threading.Lock()
+
+
+def get_default_retry_policy():
+    """
+    Return the retry policy, as configured by the ``MULTISAFEPAY_RETRY_...`` settings.
+    :rtype: RetryPolicy
+    """
+    global _default_retry_policy
+    if _default_retry_policy is None:
+        _default_retry_policy = RetryPolicy(
+            max_retries=appsettings.MULTISAFEPAY_RETRY_MAX_RETRIES,
+            backoff=appsettings.MULTISAFEPAY_RETRY_BACKOFF,
+            max_backoff=appsettings.MULTISAFEPAY_RETRY_MAX_BACKOFF,
+        )
+    return _default_retry_policy
+
+
+def get_circuit_breaker(url):
+    """
+    Return the circuit breaker for an API endpoint, that is shared by all clients in this process.
+    :return: The circuit breaker, or ``None`` when it's disabled.
+    :rtype: CircuitBreaker
+    """
+    if not appsettings.MULTISAFEPAY_CIRCUIT_FAILURE_THRESHOLD:
+        return None
+
+    breaker = _circuit_breakers.get(url)
+    if breaker is None:
+        with _lock:
+            breaker = _circuit_breakers.get(url)
+            if breaker is None:
+                breaker = _circuit_breakers[url] = CircuitBreaker(
+                    failure_threshold=appsettings.MULTISAFEPAY_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=appsettings.MULTISAFEPAY_CIRCUIT_RESET_TIMEOUT,
+                )
+    return breaker
+
+
+def _setting_changed(setting):
+    global _default_retry_policy
+    if setting.startswith('MULTISAFEPAY_RETRY_'):
+        _default_retry_policy = None
+    else:
+        _circuit_breakers.clear()
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_RETRY_', 'MULTISAFEPAY_CIRCUIT_'), _setting_changed)
@@ -1,4 +1,13 @@
 from django.dispatch import Signal
 
 # The signal which is fired when the notification URL is called.
-order_status_updated = Signal(providing_args=["statusreply", "request"])
+# The "previous" snapshot is only provided when MULTISAFEPAY_STATUS_SNAPSHOTS is enabled.
+order_status_updated = Signal(providing_args=["statusreply", "request", "previous"])
+
+# The signal which is fired once for a batch of status updates, e.g. by the notification worker and reconciliation.
+# The "previous" list has the previous snapshot of each reply (or None), in the same order as "statusreplies".
+order_status_batch_updated = Signal(providing_args=["statusreplies", "previous"])
+
+# The signal which is fired after each API call, with the timings of each phase.
+# Connecting a receiver enables the timing, see django_multisafepay.instrumentation.
+api_call_timed = Signal(providing_args=["xml_name", "timings", "error"])
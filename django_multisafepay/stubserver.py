@@ -0,0 +1,544 @@
+"""
+A local stand-in for the MultiSafepay EWX API, for tests, load tests and offline development.
+
+The stub implements the ``redirecttransaction``, ``checkouttransaction``, ``directtransaction``,
+``status`` and ``gateways`` calls, and replies in the same format as the real API.
+It keeps the status of each transaction in memory, and can send the notifications
+to the :class:`~django_multisafepay.views.NotificationView`.
+Latency and errors can be injected, to test the behavior of the client under load.
+
+Start it in a separate process with::
+
+    python -m django_multisafepay.stubserver --port=8001 --notification-url=http://localhost:8000/multisafepay/notify/
+
+and point the ``MULTISAFEPAY_API_URL`` setting to ``http://localhost:8001/ewx/``.
+In tests, use the ``multisafepay_stub`` fixture of :mod:`django_multisafepay.pytest_plugin`,
+or call :func:`start_server`.
+"""
+import argparse
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+from xml.etree import ElementTree
+
+from django_multisafepay.data.base import escape
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlencode, urlparse
+    from urllib.request import urlopen
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import urlencode
+    from urllib2 import urlopen
+    from urlparse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+#: The error code of an unknown transaction.
+CODE_INVALID_TRANSACTION_ID = '1006'
+
+#: The error code of the injected errors, see ``api_error_rate``.
+CODE_INJECTED_ERROR = '1000'
+
+DEFAULT_GATEWAYS = (
+    ('IDEAL', 'iDEAL'),
+    ('MASTERCARD', 'Mastercard'),
+    ('VISA', 'Visa'),
+    ('PAYPAL', 'PayPal'),
+    ('BANKTRANS', 'Bank transfer'),
+    ('DIRDEB', 'Direct Debit'),
+)
+
+DEFAULT_CUSTOMER = (
+    ('locale', 'nl_NL'),
+    ('firstname', 'Diederik'),
+    ('lastname', 'van der Boor'),
+    ('address1', 'Foo'),
+    ('address2', None),
+    ('housenumber', '1'),
+    ('zipcode', '1234AB'),
+    ('city', 'Amsterdam'),
+    ('state', None),
+    ('country', 'NL'),
+    ('phone', None),
+    ('email', 'foo@example.org'),
+)
+
+
+class StubTransaction(object):
+    """
+    The state of a transaction at the stub server.
+    """
+
+    def __init__(self, id, status='initialized', fastcheckout=False, currency='EUR', amount=1000, description=None,
+                 var1=None, var2=None, var3=None, gateway=None, customer=None, notification_url=None, redirect_url=None):
+        self.id = id
+        self.ewallet_id = str(random.randint(10000000, 99999999))
+        self.status = status
+        self.fastcheckout = fastcheckout
+        self.currency = currency
+        self.amount = int(amount or 0)
+        self.description = description if description is not None else u"Order {0}".format(id)
+        self.var1 = var1
+        self.var2 = var2
+        self.var3 = var3
+        self.gateway = gateway or 'IDEAL'
+        self.customer = dict(DEFAULT_CUSTOMER, **(customer or {}))
+        self.notification_url = notification_url
+        self.redirect_url = redirect_url
+        self.created = self.modified = _timestamp()
+
+    @property
+    def amount_refunded(self):
+        return self.amount if self.status == 'refunded' else 0
+
+    def set_status(self, status):
+        self.status = status
+        self.modified = _timestamp()
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    The stub of the MultiSafepay API.
+
+    The faults are injected in this order: each request waits ``delay`` seconds,
+    and a ``slow_rate`` fraction waits another ``slow_delay`` seconds. Then a ``reset_rate`` fraction of the connections is closed
+    without reply, an ``error_rate`` fraction receives an HTTP ``error_status``, and an ``api_error_rate`` fraction an error reply of the API.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 0), handler_class=None, delay=0.0, slow_rate=0.0, slow_delay=0.0,
+                 error_rate=0.0, error_status=503, api_error_rate=0.0, reset_rate=0.0,
+                 default_status='completed', gateways=DEFAULT_GATEWAYS,
+                 notification_url=None, notify_delay=None, notify_callback=None):
+        """
+        :param address: The host and port to listen on, port ``0`` picks a free port.
+        :param delay: The number of seconds to wait before each reply.
+        :param slow_rate: The fraction of the requests that wait an additional ``slow_delay`` seconds.
+        :param error_rate: The fraction of the requests that receive the HTTP ``error_status``.
+        :param api_error_rate: The fraction of the requests that receive an error reply of the API.
+        :param reset_rate: The fraction of the requests of which the connection is closed without reply.
+        :param default_status: The status of transactions that were not started at this server,
+                               or ``None`` to reply with an "invalid transaction ID" error.
+        :param gateways: The ``(id, description)`` tuples of the gateways call.
+        :param notification_url: The URL of the ``NotificationView``, when the transaction doesn't define it.
+        :param notify_delay: When set, a notification is sent this number of seconds after a status change at the payment page.
+        :param notify_callback: A function to send the notifications with, instead of calling the URL.
+                                It receives the ``transaction_id`` and ``type``.
+        """
+        HTTPServer.__init__(self, address, handler_class or StubHandler)
+        self.delay = delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_error_rate = api_error_rate
+        self.reset_rate = reset_rate
+        self.default_status = default_status
+        self.gateways = gateways
+        self.notification_url = notification_url
+        self.notify_delay = notify_delay
+        self.notify_callback = notify_callback
+        self.transactions = {}
+        self.requests = 0  # The number of API calls, including the ones that received a fault.
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The URL to use as ``MULTISAFEPAY_API_URL``.
+        """
+        return 'http://{0}:{1}/ewx/'.format(*self.server_address[:2])
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background thread, and close the socket.
+        """
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def handle_error(self, request, client_address):
+        # Clients that abandon their request (e.g. after a timeout or hedged request) are expected.
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+    def add_transaction(self, transaction_id, **kwargs):
+        """
+        Register a transaction, as if it was started at this server.
+        The arguments are passed to :class:`StubTransaction`.
+        :rtype: StubTransaction
+        """
+        transaction = StubTransaction(transaction_id, **kwargs)
+        with self._lock:
+            self.transactions[transaction_id] = transaction
+        return transaction
+
+    def get_transaction(self, transaction_id):
+        """
+        Return the transaction. Unknown transactions receive the ``default_status``.
+        :return: The transaction, or ``None`` when it's unknown and there is no ``default_status``.
+        :rtype: StubTransaction
+        """
+        with self._lock:
+            transaction = self.transactions.get(transaction_id)
+            if transaction is None and self.default_status:
+                transaction = self.transactions[transaction_id] = StubTransaction(transaction_id, status=self.default_status)
+        return transaction
+
+    def set_status(self, transaction_id, status, notify=False):
+        """
+        Change the status of a transaction.
+
+        :param notify: Whether to send the notification directly, like MultiSafepay does.
+        """
+        transaction = self.get_transaction(transaction_id)
+        if transaction is None:
+            transaction = self.add_transaction(transaction_id)
+        transaction.set_status(status)
+        if notify:
+            return self.notify(transaction_id)
+
+    def notify(self, transaction_id, type=None):
+        """
+        Send the notification for a transaction to the ``NotificationView``.
+        :return: The result of the ``notify_callback``, or the content of the response.
+        """
+        if self.notify_callback is not None:
+            return self.notify_callback(transaction_id, type)
+
+        transaction = self.get_transaction(transaction_id)
+        url = (transaction.notification_url if transaction is not None else None) or self.notification_url
+        if not url:
+            raise ValueError("No notification URL for transaction {0}".format(transaction_id))
+
+        params = {'transactionid': transaction_id}
+        if type:
+            params['type'] = type
+        response = urlopen(u"{0}{1}{2}".format(url, '&' if '?' in url else '?', urlencode(params)))
+        try:
+            return response.read()
+        finally:
+            response.close()
+
+    def notify_later(self, transaction_id, type=None):
+        """
+        Send the notification after ``notify_delay`` seconds, in a background thread.
+        """
+        def _notify():
+            try:
+                self.notify(transaction_id, type)
+            except Exception:
+                logger.exception(u"Failed to send notification for transaction %s", transaction_id)
+
+        timer = threading.Timer(self.notify_delay, _notify)
+        timer.daemon = True
+        timer.start()
+
+    def get_fault(self):
+        """
+        Wait for the injected latency, and choose the injected fault of a request.
+        :return: ``'reset'``, ``'error'``, ``'api_error'`` or ``None``.
+        """
+        with self._lock:
+            self.requests += 1
+
+        if self.delay:
+            time.sleep(self.delay)
+        if self.slow_rate and random.random() < self.slow_rate:
+            time.sleep(self.slow_delay)
+
+        roll = random.random()
+        if roll < self.reset_rate:
+            return 'reset'
+        roll -= self.reset_rate
+        if roll < self.error_rate:
+            return 'error'
+        roll -= self.error_rate
+        if roll < self.api_error_rate:
+            return 'api_error'
+        return None
+
+    def handle_message(self, content):
+        """
+        Handle an API call.
+        :param content: The XML message.
+        :return: The XML reply.
+        :rtype: bytes
+        """
+        xml = ElementTree.fromstring(content)
+        handler = getattr(self, 'reply_{0}'.format(xml.tag), None)
+        if handler is None:
+            return render_error(xml.tag, '1032', u"Unknown message: {0}".format(xml.tag))
+        return handler(xml)
+
+    def reply_status(self, xml):
+        transaction_id = xml.findtext('transaction/id')
+        transaction = self.get_transaction(transaction_id)
+        if transaction is None:
+            return render_error('status', CODE_INVALID_TRANSACTION_ID, u"Invalid transaction ID", transaction_id)
+        return render_status(transaction)
+
+    def reply_redirecttransaction(self, xml):
+        return self._start_transaction(xml, fastcheckout=False)
+
+    def reply_directtransaction(self, xml):
+        return self._start_transaction(xml, fastcheckout=False)
+
+    def reply_checkouttransaction(self, xml):
+        return self._start_transaction(xml, fastcheckout=True)
+
+    def reply_gateways(self, xml):
+        gateways = u"".join(
+            u"<gateway><id>{0}</id><description>{1}</description></gateway>".format(escape(id), escape(description))
+            for id, description in self.gateways
+        )
+        return _render(u'<gateways result="ok"><gateways>{0}</gateways></gateways>'.format(gateways))
+
+    def _start_transaction(self, xml, fastcheckout):
+        transaction_xml = xml.find('transaction')
+        customer_xml = xml.find('customer')
+        transaction = self.add_transaction(
+            transaction_xml.findtext('id'),
+            fastcheckout=fastcheckout,
+            currency=transaction_xml.findtext('currency') or 'EUR',
+            amount=transaction_xml.findtext('amount'),
+            description=transaction_xml.findtext('description'),
+            var1=transaction_xml.findtext('var1'),
+            var2=transaction_xml.findtext('var2'),
+            var3=transaction_xml.findtext('var3'),
+            gateway=transaction_xml.findtext('gateway'),
+            customer=dict((node.tag, node.text) for node in customer_xml) if customer_xml is not None else None,
+            notification_url=xml.findtext('merchant/notification_url'),
+            redirect_url=xml.findtext('merchant/redirect_url'),
+        )
+
+        payment_url = 'http://{0}:{1}/pay/?{2}'.format(self.server_address[0], self.server_address[1], urlencode({'transactionid': transaction.id}))
+        return _render(u'<{0} result="ok"><transaction><id>{1}</id><payment_url>{2}</payment_url></transaction></{0}>'.format(
+            xml.tag, escape(transaction.id), escape(payment_url)
+        ))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP requests of the :class:`StubServer`.
+
+    The API calls are posted to any path. The payment page (``GET /pay/?transactionid=..&status=completed``)
+    simulates a payment: it changes the status, and redirects to the ``redirect_url`` of the transaction.
+    """
+    protocol_version = 'HTTP/1.1'  # Allow keep-alive connections
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        fault = self.server.get_fault()
+        if fault == 'reset':
+            self.close_connection = True
+        elif fault == 'error':
+            self.send_reply(self.server.error_status, b'Service Unavailable')
+        elif fault == 'api_error':
+            self.send_reply(200, render_error(ElementTree.fromstring(content).tag, CODE_INJECTED_ERROR, u"Injected error"))
+        else:
+            self.send_reply(200, self.server.handle_message(content))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        transaction = None
+        if url.path.rstrip('/') == '/pay' and 'transactionid' in query:
+            transaction = self.server.get_transaction(query['transactionid'][0])
+        if transaction is None:
+            self.send_reply(404, b'Not Found', 'text/plain')
+            return
+
+        transaction.set_status(query.get('status', ['completed'])[0])
+        if self.server.notify_delay is not None:
+            self.server.notify_later(transaction.id)
+
+        if transaction.redirect_url:
+            self.send_response(302)
+            self.send_header('Location', transaction.redirect_url)
+            self.send_header('Content-Length', '0')
+            self.send_connection_header()
+            self.end_headers()
+        else:
+            self.send_reply(200, u"Transaction {0} is {1}".format(transaction.id, transaction.status).encode('utf-8'), 'text/plain')
+
+    def send_reply(self, status, content, content_type='text/xml'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.send_connection_header()
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_connection_header(self):
+        # Tell the client when the connection is closed after this reply (e.g. for "Connection: close" requests),
+        # otherwise it's returned to the connection pool and the next request fails.
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def render_status(transaction):
+    """
+    Render the reply of the status call, in the same format as the examples of the :class:`~django_multisafepay.messages.StatusReply`.
+    :type transaction: StubTransaction
+    :rtype: bytes
+    """
+    customer = transaction.customer
+    parts = [
+        u'<status result="ok">',
+        u'<ewallet>',
+        _element('id', transaction.ewallet_id),
+        _element('status', transaction.status),
+        _element('fastcheckout', 'YES' if transaction.fastcheckout else 'NO'),
+        _element('created', transaction.created),
+        _element('modified', transaction.modified),
+        u'<reasoncode /><reason />',
+        u'</ewallet>',
+        u'<customer>',
+        _element('amount', transaction.amount),
+        _element('currency', transaction.currency),
+        u'<account />',
+    ]
+    parts.extend(_element(name, customer.get(name)) for name in ('locale', 'firstname', 'lastname', 'address1', 'address2', 'housenumber', 'zipcode', 'city', 'state', 'country'))
+    parts.extend([
+        u'<countryname />',
+        _element('phone1', customer.get('phone')),
+        u'<phone2 />',
+        _element('email', customer.get('email')),
+        u'</customer>',
+        u'<customer-delivery />',
+        u'<transaction>',
+        _element('id', transaction.id),
+        u'<recurringid />',
+        _element('currency', transaction.currency),
+        _element('amount', transaction.amount),
+        _element('cost', 0),
+        _element('description', transaction.description),
+        _element('var1', transaction.var1),
+        _element('var2', transaction.var2),
+        _element('var3', transaction.var3),
+        u'<items />',
+        _element('amountrefunded', transaction.amount_refunded),
+        u'</transaction>',
+        u'<paymentdetails>',
+        _element('type', transaction.gateway),
+        u'<accountid />',
+        _element('accountholdername', u"{0} {1}".format(customer.get('firstname') or '', customer.get('lastname') or '').strip()),
+        _element('externaltransactionid', transaction.ewallet_id),
+        u'</paymentdetails>',
+    ])
+    if transaction.fastcheckout:
+        total = u'{0}.{1:02d}'.format(transaction.amount // 100, transaction.amount % 100)
+        parts.append(
+            u'<checkoutdata version="0.1"><order-adjustment><shipping />'
+            u'<adjustment-total currency="{0}">0.00</adjustment-total><total-tax currency="{0}">0.00</total-tax>'
+            u'</order-adjustment><order-total currency="{0}">{1}</order-total></checkoutdata>'.format(escape(transaction.currency), total)
+        )
+    parts.append(u'</status>')
+    return _render(u''.join(parts))
+
+
+def render_error(xml_name, code, description, transaction_id=None):
+    """
+    Render the error reply of an API call.
+    :rtype: bytes
+    """
+    transaction = u'<transaction>{0}</transaction>'.format(_element('id', transaction_id)) if transaction_id else u''
+    return _render(u'<{0} result="error"><error>{1}{2}</error>{3}</{0}>'.format(
+        xml_name, _element('code', code), _element('description', description), transaction
+    ))
+
+
+def _render(xml):
+    return (u'<?xml version="1.0" encoding="UTF-8"?>\n' + xml).encode('utf-8')
+
+
+def _element(name, value):
+    if value is None or value == '':
+        return u'<{0} />'.format(name)
+    return u'<{0}>{1}</{0}>'.format(name, escape(u"{0}".format(value)))
+
+
+def _timestamp():
+    return time.strftime('%Y%m%d%H%M%S')
+
+
+def start_server(**kwargs):
+    """
+    Start the stub server in a background thread.
+    The arguments are passed to :class:`StubServer`.
+    :rtype: StubServer
+    """
+    return StubServer(**kwargs).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a stub of the MultiSafepay API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before each reply.")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="Fraction of requests that wait --slow-delay seconds longer.")
+    parser.add_argument('--slow-delay', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that receive an HTTP error.")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--api-error-rate', type=float, default=0.0, help="Fraction of requests that receive an API error reply.")
+    parser.add_argument('--reset-rate', type=float, default=0.0, help="Fraction of connections that are closed without reply.")
+    parser.add_argument('--default-status', default='completed', help="Status of unknown transactions, use '' to reply with an error.")
+    parser.add_argument('--notification-url', help="URL of the NotificationView, when the transaction doesn't define it.")
+    parser.add_argument('--notify-delay', type=float, help="Send a notification this number of seconds after a payment.")
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        (args.host, args.port),
+        delay=args.delay,
+        slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        api_error_rate=args.api_error_rate,
+        reset_rate=args.reset_rate,
+        default_status=args.default_status or None,
+        notification_url=args.notification_url,
+        notify_delay=args.notify_delay,
+    )
+    print("MultiSafepay stub server running at {0}".format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
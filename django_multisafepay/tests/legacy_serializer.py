@@ -0,0 +1,76 @@
+"""
+The recursive string formatting that ``XmlObject.to_xml()`` used before version 1.2.
+This is kept as reference, to verify the output of the current serializer in the tests and to compare the speed.
+"""
+from django.utils.encoding import force_text
+from django_multisafepay import USER_AGENT
+from django_multisafepay.data import Cart, ItemWeight, Price, Transaction
+from django_multisafepay.data.base import XmlObject, escape
+from django_multisafepay.messages.base import XmlRequest
+
+
+def legacy_to_xml(obj):
+    lines = _get_xml_children(obj)
+    if isinstance(obj, XmlRequest):
+        return u'<?xml version="1.0" encoding="UTF-8"?>\n' \
+               u'<{0} ua="{1}">{2}</{0}>'.format(obj.xml_name, USER_AGENT, u''.join(lines))
+    elif isinstance(obj, ItemWeight):
+        return u'<{0} unit="{1}" value="{2}" />'.format(obj.xml_name, escape(obj.unit), escape(str(obj.value)))
+
+    attrs = obj.get_xml_attrs()
+    if attrs:
+        attrs = u"".join(u' {0}="{1}"'.format(k, escape(force_text(v))) for k, v in attrs.items())
+        return u'<{0}{1}>{2}</{0}>'.format(obj.xml_name, attrs, u''.join(lines))
+    else:
+        return u'<{0}>{1}</{0}>'.format(obj.xml_name, u''.join(lines))
+
+
+def _get_xml_children(obj):
+    if isinstance(obj, Cart):
+        return _get_cart_children(obj)
+
+    lines = []
+    for field in obj.xml_fields:
+        value = getattr(obj, field.replace('-', '_'))
+        if value is not None:
+            if isinstance(value, XmlObject):
+                lines.append(u"{0}\n".format(legacy_to_xml(value)))
+            elif isinstance(value, Price):
+                lines.append(u'<{0} currency="{1}">{2:.2f}</{0}>'.format(field, value.currency, value))
+            else:
+                if isinstance(value, (list, tuple)):
+                    tag_value = u'\n'.join(legacy_to_xml(item) for item in value)
+                elif isinstance(value, bool):
+                    tag_value = str(value).lower()
+                else:
+                    tag_value = escape(force_text(value))
+                lines.append(u'<{0}>{1}</{0}>'.format(field, tag_value))
+
+    if isinstance(obj, Transaction) and obj.gateway is not None:
+        issuer = u' issuer="{0}"'.format(escape(obj.gateway_issuer)) if obj.gateway_issuer else u''
+        lines.append(u'<gateway{0}>{1}</gateway>'.format(issuer, escape(obj.gateway)))
+    return lines
+
+
+def _get_cart_children(cart):
+    lines = []
+    if cart.items:
+        lines.append(u'<shopping-cart><items>\n')
+        for item in cart.items:
+            lines.append(u"  {0}\n".format(legacy_to_xml(item)))
+        lines.append(u'</items></shopping-cart>\n')
+
+    if cart.shipping_methods or cart.tax_tables:
+        lines.append(u'<checkout-flow-support><merchant-checkout-flow-support>\n')
+        if cart.shipping_methods:
+            lines.append(u'<shipping-methods>\n')
+            for item in cart.shipping_methods:
+                lines.append(u"  {0}\n".format(legacy_to_xml(item)))
+            lines.append(u'</shipping-methods>\n')
+        if cart.tax_tables:
+            lines.append(u'<tax-tables>\n')
+            for item in cart.tax_tables:
+                lines.append(u"  {0}\n".format(legacy_to_xml(item)))
+            lines.append(u'</tax-tables>\n')
+        lines.append(u'</merchant-checkout-flow-support></checkout-flow-support>\n')
+    return lines
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django_multisafepay import asyncclient
+from django_multisafepay.asyncclient import AsyncConnectionPool, AsyncMultiSafepayClient
+from django_multisafepay.data import Merchant
+from django_multisafepay.tests.utils import StubServerMixin
+
+
+class AsyncClientCacheTests(StubServerMixin, SimpleTestCase):
+    """
+    The caches of the asyncio client.
+    """
+    stub_kwargs = {'default_status': None}
+
+    def setUp(self):
+        super(AsyncClientCacheTests, self).setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server.add_transaction('1001', status='initialized')
+
+    def run_client(self, coroutine_func):
+        async def _run():
+            client = AsyncMultiSafepayClient(
+                merchant=Merchant(notification_url='https://example.org/multisafepay/notify/'),
+                pool=AsyncConnectionPool(),
+            )
+            try:
+                return await coroutine_func(client)
+            finally:
+                await client.pool.close()
+
+        return asyncio.run(_run())
+
+    @override_settings(MULTISAFEPAY_STATUS_CACHE_BACKEND='default')
+    def test_status(self):
+        async def _statuses(client):
+            await client.status('1001')
+            self.server.set_status('1001', 'completed')
+            cached = await client.status('1001')
+            refreshed = await client.status('1001', refresh=True)
+            return cached.status_code, refreshed.status_code, (await client.status('1001')).status_code
+
+        self.assertEqual(self.run_client(_statuses), ('initialized', 'completed', 'completed'))
+        self.assertEqual(self.server.requests, 2)
+
+    @override_settings(MULTISAFEPAY_GATEWAYS_CACHE_TTL=60, MULTISAFEPAY_GATEWAYS_CACHE_STALE_TTL=60, MULTISAFEPAY_GATEWAYS_CACHE_BACKEND='default')
+    def test_failed_refresh(self):
+        async def _gateways(client):
+            reply = await client.gateways('nl_NL', 'NL')
+
+            # Make the entry stale, and let the background refresh fail.
+            gateways_cache = client.get_gateways_cache()
+            key = client._get_gateways_cache_key('nl_NL', 'NL')
+            gateways_cache.backend.set(key, (reply, time.time() - 90), 120)
+            self.server.api_error_rate = 1.0
+
+            stale = await client.gateways('nl_NL', 'NL')
+            self.assertEqual(len(asyncclient._refresh_tasks), 1)
+            await asyncio.wait(list(asyncclient._refresh_tasks))
+            await asyncio.sleep(0)  # Run the done callback.
+            return stale
+
+        with self.assertLogs('django_multisafepay.asyncclient', 'ERROR') as logs:
+            stale = self.run_client(_gateways)
+        self.assertEqual(stale.gateways[0].id, 'IDEAL')
+        self.assertIn("Failed to refresh cache entry", logs.output[-1])
+        self.assertEqual(asyncclient._refresh_tasks, set())
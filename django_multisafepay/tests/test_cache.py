@@ -0,0 +1,151 @@
+import json
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django_multisafepay import codec
+from django_multisafepay.cache import LocalCacheBackend, StatusCache
+from django_multisafepay.data.base import Price
+from django_multisafepay.tests.utils import StubServerMixin, make_client, make_statusreply
+
+
+class RecordingBackend(LocalCacheBackend):
+    """
+    Remember the timeout of each stored entry.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingBackend, self).__init__(*args, **kwargs)
+        self.timeouts = {}
+
+    def set(self, key, value, timeout):
+        super(RecordingBackend, self).set(key, value, timeout)
+        self.timeouts[key] = timeout
+
+
+class BrokenBackend(object):
+    """
+    A cache server that is down.
+    """
+
+    def get(self, key):
+        raise IOError("Connection refused")
+
+    set = delete = get
+
+
+class CodecTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        statusreply = make_statusreply(fastcheckout=True, description=u"Bestelling € 10 <&>")
+        data = codec.dumps(statusreply)
+        loaded = codec.loads(data)
+
+        self.assertEqual(codec.dumps(loaded), data)
+        self.assertEqual(loaded.status_code, 'completed')
+        self.assertEqual(loaded.transaction.description, u"Bestelling € 10 <&>")
+        self.assertEqual(loaded.customer.address2, None)
+        self.assertIsInstance(loaded.checkoutdata.order_total, Price)
+        self.assertEqual(loaded.checkoutdata.order_total, statusreply.checkoutdata.order_total)
+        self.assertEqual(loaded.checkoutdata.order_total.currency, 'EUR')
+        self.assertIsNone(loaded._xml)
+
+    def test_other_version(self):
+        data = json.dumps([codec.VERSION + 1, json.loads(codec.dumps(make_statusreply()).decode('utf-8'))[1]]).encode('utf-8')
+        self.assertRaises(ValueError, codec.loads, data)
+
+    def test_unknown_type(self):
+        statusreply = make_statusreply()
+        statusreply.transaction.var1 = object()
+        self.assertRaises(TypeError, codec.dumps, statusreply)
+
+
+class StatusCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.backend = RecordingBackend()
+        self.cache = StatusCache(self.backend, ttls={'initialized': 10, 'completed': None, 'void': 0})
+
+    def test_ttl_by_status(self):
+        self.cache.store('initialized', make_statusreply(status='initialized'))
+        self.cache.store('completed', make_statusreply(status='completed'))
+        self.cache.store('void', make_statusreply(status='void'))
+        self.cache.store('uncleared', make_statusreply(status='uncleared'))
+        self.assertEqual(self.backend.timeouts, {'initialized': 10, 'completed': None})
+
+        self.assertEqual(self.cache.get('initialized').status_code, 'initialized')
+        self.assertIsNone(self.cache.get('void'))
+        self.assertIsNone(self.cache.get('uncleared'))
+
+    def test_delete(self):
+        self.cache.store('1001', make_statusreply())
+        self.cache.delete('1001')
+        self.assertIsNone(self.cache.get('1001'))
+
+    def test_other_version(self):
+        self.backend.set('1001', b'[0,[1]]', None)
+        self.assertIsNone(self.cache.get('1001'))
+
+    def test_unknown_type(self):
+        # A reply that can't be cached is still returned by the client.
+        statusreply = make_statusreply()
+        statusreply.transaction.var1 = object()
+        with self.assertLogs('django_multisafepay.cache', 'ERROR'):
+            self.cache.store('1001', statusreply)
+        self.assertIsNone(self.cache.get('1001'))
+
+    def test_broken_backend(self):
+        cache = StatusCache(BrokenBackend(), ttls={'completed': None})
+        with self.assertLogs('django_multisafepay.cache', 'WARNING') as logs:
+            cache.store('1001', make_statusreply())
+            cache.delete('1001')
+            self.assertIsNone(cache.get('1001'))
+        self.assertEqual(len(logs.records), 3)
+
+
+@override_settings(MULTISAFEPAY_STATUS_CACHE_BACKEND='default')
+class ClientStatusCacheTests(StubServerMixin, TestCase):
+    """
+    The cached statuses of the client, and their refresh after a notification.
+    """
+    stub_kwargs = {'default_status': None}
+
+    def setUp(self):
+        super(ClientStatusCacheTests, self).setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server.add_transaction('1001', status='initialized')
+
+    def test_cached(self):
+        client = make_client()
+        client.status('1001')
+        self.server.set_status('1001', 'completed')
+        self.assertEqual(client.status('1001').status_code, 'initialized')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_refresh(self):
+        client = make_client()
+        client.status('1001')
+        self.server.set_status('1001', 'completed')
+        self.assertEqual(client.status('1001', refresh=True).status_code, 'completed')
+        self.assertEqual(client.status('1001').status_code, 'completed')
+        self.assertEqual(self.server.requests, 2)
+
+    def test_invalidate(self):
+        client = make_client()
+        client.status('1001')
+        self.server.set_status('1001', 'completed')
+        client.invalidate_status('1001')
+        self.assertEqual(client.status('1001').status_code, 'completed')
+
+    def test_notification(self):
+        # The notification view stores the new status, for the next page that reads it.
+        client = make_client()
+        client.status('1001')
+        self.server.set_status('1001', 'completed')
+
+        response = self.client.get('/notify/', {'transactionid': '1001'})
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(client.status('1001').status_code, 'completed')
+        self.assertEqual(self.server.requests, 2)
@@ -0,0 +1,67 @@
+import threading
+
+from django.test import TestCase
+from django_multisafepay.cache import LocalCacheBackend
+from django_multisafepay.notifications import NotificationCoalescer, dispatch_status_update
+from django_multisafepay.signals import order_status_updated
+from django_multisafepay.tests.utils import StubServerMixin, make_client, make_statusreply
+
+
+class NotificationCoalescerTests(StubServerMixin, TestCase):
+    stub_kwargs = {'delay': 0.2}
+
+    def setUp(self):
+        super(NotificationCoalescerTests, self).setUp()
+        self.coalescer = NotificationCoalescer(LocalCacheBackend(), window=60)
+
+    def test_claim_dispatch_once(self):
+        statusreply = make_statusreply()
+        self.assertTrue(self.coalescer.claim_dispatch(statusreply))
+        self.assertFalse(self.coalescer.claim_dispatch(make_statusreply()))
+
+    def test_claim_dispatch_changed(self):
+        self.assertTrue(self.coalescer.claim_dispatch(make_statusreply(status='uncleared')))
+        self.assertTrue(self.coalescer.claim_dispatch(make_statusreply(status='completed')))
+        self.assertTrue(self.coalescer.claim_dispatch(make_statusreply(status='completed', modified='20240101130000')))
+
+    def test_claim_dispatch_without_modified(self):
+        # Without the timestamp, repeated statuses can't be recognized.
+        self.assertTrue(self.coalescer.claim_dispatch(make_statusreply(modified='')))
+        self.assertTrue(self.coalescer.claim_dispatch(make_statusreply(modified='')))
+
+    def test_forget(self):
+        statusreply = make_statusreply()
+        self.coalescer.claim_dispatch(statusreply)
+        self.coalescer.forget(statusreply)
+        self.assertTrue(self.coalescer.claim_dispatch(statusreply))
+
+    def test_failed_dispatch_is_forgotten(self):
+        def receiver(sender, **kwargs):
+            raise ValueError("receiver failed")
+
+        order_status_updated.connect(receiver)
+        self.addCleanup(order_status_updated.disconnect, receiver)
+
+        statusreply = make_statusreply()
+        with self.assertRaises(ValueError):
+            dispatch_status_update(None, statusreply, coalescer=self.coalescer)
+
+        # The retry of the notification dispatches the status again.
+        self.assertTrue(self.coalescer.claim_dispatch(statusreply))
+
+    def test_fetch_status_shared(self):
+        client = make_client()
+        results = []
+
+        def fetch():
+            results.append(self.coalescer.fetch_status(client, '1001'))
+
+        threads = [threading.Thread(target=fetch) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.server.requests, 1)
+        self.assertTrue(all(result is results[0] for result in results))
@@ -0,0 +1,37 @@
+import copy
+import pickle
+
+from django.test import SimpleTestCase
+from django_multisafepay.data import Merchant, Price, ShoppingCartItem
+from django_multisafepay.tests.utils import make_customer, make_statusreply
+
+
+class CustomAttributeTests(SimpleTestCase):
+    """
+    The data and reply classes use ``__slots__``, but projects can still add their own attributes.
+    """
+
+    def test_data_object(self):
+        item = ShoppingCartItem(u'Product', u'Description', Price('12.50', 'EUR'), 1, 'SKU-1')
+        item.product = 'product'
+        customer = make_customer()
+        customer.user_id = 1
+        self.assertEqual(item.product, 'product')
+        self.assertEqual(customer.user_id, 1)
+        self.assertNotIn('product', item.to_xml())
+
+    def test_cached_object(self):
+        merchant = Merchant(notification_url='https://example.org/notify/')
+        merchant.to_xml()
+        merchant.shop = 'shop'
+
+        for clone in (copy.copy(merchant), pickle.loads(pickle.dumps(merchant))):
+            self.assertEqual(clone.shop, 'shop')
+            self.assertEqual(clone.notification_url, 'https://example.org/notify/')
+            self.assertEqual(clone.to_xml(), merchant.to_xml())
+
+    def test_reply(self):
+        statusreply = make_statusreply()
+        statusreply.order = 'order'
+        self.assertEqual(statusreply.order, 'order')
+        self.assertEqual(statusreply.status_code, 'completed')
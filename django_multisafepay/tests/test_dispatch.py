@@ -0,0 +1,68 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_multisafepay.cache import LocalCacheBackend
+from django_multisafepay.models import StatusSnapshot
+from django_multisafepay.notifications import NotificationCoalescer, dispatch_status_updates
+from django_multisafepay.signals import order_status_batch_updated, order_status_updated
+from django_multisafepay.tests.utils import make_statusreply
+
+
+@override_settings(MULTISAFEPAY_STATUS_SNAPSHOTS=True)
+class DispatchBatchTests(TestCase):
+    """
+    Dispatching a batch of statuses, where each failure only rolls back its own savepoint.
+    """
+
+    def setUp(self):
+        self.batches = []
+        order_status_updated.connect(self.receiver)
+        order_status_batch_updated.connect(self.batch_receiver)
+        self.addCleanup(order_status_updated.disconnect, self.receiver)
+        self.addCleanup(order_status_batch_updated.disconnect, self.batch_receiver)
+        self.statusreplies = [make_statusreply(transaction_id=transaction_id) for transaction_id in ('1001', '1002', '1003')]
+
+    def receiver(self, sender, statusreply, **kwargs):
+        # The database work of the project, which is rolled back when it fails.
+        Group.objects.create(name=statusreply.transaction.id)
+        if statusreply.transaction.id == '1002':
+            raise ValueError("Failed to update order")
+
+    def batch_receiver(self, sender, statusreplies, **kwargs):
+        self.batches.append([statusreply.transaction.id for statusreply in statusreplies])
+
+    def test_batch(self):
+        statusreplies = self.statusreplies[::2]
+        results = dispatch_status_updates(None, statusreplies)
+        self.assertEqual(results, [(statusreplies[0], True), (statusreplies[1], True)])
+        self.assertEqual(self.batches, [['1001', '1003']])
+
+    def test_failure_is_isolated(self):
+        with self.assertLogs('django_multisafepay.notifications', 'ERROR'):
+            results = dispatch_status_updates(None, self.statusreplies)
+
+        self.assertEqual(results[0], (self.statusreplies[0], True))
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertEqual(results[2], (self.statusreplies[2], True))
+
+        # The work and snapshot of the failed status are rolled back, the others are kept.
+        self.assertEqual(sorted(Group.objects.values_list('name', flat=True)), ['1001', '1003'])
+        self.assertEqual(sorted(StatusSnapshot.objects.values_list('transaction_id', flat=True)), ['1001', '1003'])
+        self.assertEqual(self.batches, [['1001'], ['1003']])
+
+        # A retry sends the signals again for the failed status only.
+        self.batches = []
+        with self.assertLogs('django_multisafepay.notifications', 'ERROR'):
+            results = dispatch_status_updates(None, [make_statusreply(transaction_id=transaction_id) for transaction_id in ('1001', '1002')])
+        self.assertFalse(results[0][1])
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertEqual(self.batches, [])
+
+    def test_failure_forgets_coalescer(self):
+        coalescer = NotificationCoalescer(LocalCacheBackend(), window=60)
+        with self.assertLogs('django_multisafepay.notifications', 'ERROR'):
+            dispatch_status_updates(None, self.statusreplies, coalescer=coalescer)
+
+        # Only the failed status can be claimed again by the retry of its notification.
+        self.assertFalse(coalescer.claim_dispatch(make_statusreply(transaction_id='1001')))
+        self.assertTrue(coalescer.claim_dispatch(make_statusreply(transaction_id='1002')))
@@ -0,0 +1,89 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django_multisafepay import messages
+from django_multisafepay.asyncclient import AsyncConnectionPool, AsyncMultiSafepayClient
+from django_multisafepay.client import MultiSafepayClient
+from django_multisafepay.data import Customer, GatewayInfo, Merchant, Transaction
+from django_multisafepay.stubserver import StubServer
+
+
+@override_settings(MULTISAFEPAY_ACCOUNT_ID='10011001', MULTISAFEPAY_SITE_ID='1234', MULTISAFEPAY_SITE_CODE='123456', MULTISAFEPAY_STREAM_PARSING_MIN_SIZE=0)
+class StreamParsingTests(SimpleTestCase):
+    """
+    The replies of the incremental parser should be identical to the replies that are parsed from the complete XML tree.
+    """
+
+    def setUp(self):
+        self.server = StubServer().start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(MULTISAFEPAY_API_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.merchant = Merchant(notification_url='https://example.org/multisafepay/notify/')
+        self.transaction = Transaction(id='10217', currency='EUR', amount=6000, description='Order #10217', gateway='IDEAL')
+        self.customer = Customer(
+            locale='nl_NL', firstname='Diederik', lastname='van der Boor', address1='Foo', address2=None,
+            housenumber='1', zipcode='1234AB', city='Amsterdam', state=None, country='NL',
+            phone=None, email='foo@example.org',
+        )
+
+    def get_calls(self, client):
+        return (
+            (messages.CheckoutTransactionReply, lambda: client.start_checkout(self.transaction, self.customer)),
+            (messages.RedirectTransactionReply, lambda: client.redirect_transaction(self.transaction, self.customer)),
+            (messages.DirectTransactionReply, lambda: client.direct_transaction(self.transaction, self.customer, GatewayInfo('0151'))),
+            (messages.StatusReply, lambda: client.status('10217')),
+            (messages.GatewaysReply, lambda: client.gateways('nl', 'NL')),
+        )
+
+    def assertSameReply(self, reply, expected):
+        self.assertEqual(reply.__class__, expected.__class__)
+        self.assertEqual(_get_values(reply), _get_values(expected))
+
+    def test_client(self):
+        client = MultiSafepayClient(merchant=self.merchant)
+        stream_client = MultiSafepayClient(merchant=self.merchant, stream_parsing=True)
+        for (response_class, call), (_, stream_call) in zip(self.get_calls(client), self.get_calls(stream_client)):
+            with self.subTest(response_class.__name__):
+                expected = call()
+                self.assertIsInstance(expected, response_class)
+                self.assertSameReply(stream_call(), expected)
+
+    def test_streamed(self):
+        stream_client = MultiSafepayClient(merchant=self.merchant, stream_parsing=True)
+        self.assertIsNone(stream_client.status('10217')._xml)
+
+    @override_settings(MULTISAFEPAY_STREAM_PARSING_MIN_SIZE=65536)
+    def test_small_replies(self):
+        # Small replies are parsed at once, which is faster.
+        stream_client = MultiSafepayClient(merchant=self.merchant, stream_parsing=True)
+        self.assertIsNotNone(stream_client.status('10217')._xml)
+        self.assertIsNotNone(stream_client.gateways('nl', 'NL')._xml)
+
+    def test_async_client(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def run():
+            pool = AsyncConnectionPool()
+            try:
+                client = AsyncMultiSafepayClient(merchant=self.merchant, pool=pool)
+                stream_client = AsyncMultiSafepayClient(merchant=self.merchant, pool=pool, stream_parsing=True)
+                for (response_class, call), (_, stream_call) in zip(self.get_calls(client), self.get_calls(stream_client)):
+                    with self.subTest(response_class.__name__):
+                        expected = await call()
+                        self.assertIsInstance(expected, response_class)
+                        self.assertSameReply(await stream_call(), expected)
+            finally:
+                await pool.close()
+
+        loop.run_until_complete(run())
+
+
+def _get_values(reply):
+    # The data objects are compared by their XML, the reply itself by its fields.
+    names = [name for cls in reply.__class__.__mro__ for name in getattr(cls, '__slots__', ()) if not name.startswith('_')]
+    return dict((name, repr(getattr(reply, name))) for name in names)
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django_multisafepay.client import MultiSafepayClient
+from django_multisafepay.data import Merchant
+from django_multisafepay.models import QueuedNotification
+from django_multisafepay.notifications import DatabaseQueue, process_notifications
+from django_multisafepay.signals import order_status_updated
+from django_multisafepay.stubserver import StubServer
+
+
+class DatabaseQueueTests(TestCase):
+    """
+    The claim, ack and release cycle of the database queue.
+    """
+
+    def setUp(self):
+        self.queue = DatabaseQueue(lock_timeout=60, max_attempts=3)
+
+    def test_enqueue_merges(self):
+        self.queue.enqueue('1001')
+        self.queue.enqueue('1001', type='initial')
+        self.queue.enqueue('1002')
+        self.assertEqual(QueuedNotification.objects.count(), 2)
+        self.assertEqual(QueuedNotification.objects.get(transaction_id='1001').type, 'initial')
+
+    def test_claim_locks(self):
+        self.queue.enqueue('1001')
+        items = self.queue.claim(10)
+        self.assertEqual([item.transaction_id for item in items], ['1001'])
+        self.assertEqual(self.queue.claim(10), [])
+
+    def test_ack_removes(self):
+        self.queue.enqueue('1001')
+        self.queue.ack(self.queue.claim(10))
+        self.assertFalse(QueuedNotification.objects.exists())
+
+    def test_enqueue_while_claimed(self):
+        self.queue.enqueue('1001')
+        items = self.queue.claim(10)
+
+        # Another worker can't claim the entry while it's processed.
+        self.queue.enqueue('1001')
+        self.assertEqual(self.queue.claim(10), [])
+
+        # The entry is kept after processing, and is available right away.
+        self.queue.ack(items)
+        entry = QueuedNotification.objects.get(transaction_id='1001')
+        self.assertEqual(entry.attempts, 0)
+        self.assertEqual([item.transaction_id for item in self.queue.claim(10)], ['1001'])
+
+    def test_attempts_reset_after_updates(self):
+        # A transaction with many status updates should never reach max_attempts when all runs succeed.
+        self.queue.enqueue('1001')
+        for i in range(5):
+            items = self.queue.claim(10)
+            self.assertEqual(len(items), 1)
+            self.queue.enqueue('1001')
+            self.queue.ack(items)
+            self.assertEqual(QueuedNotification.objects.get(transaction_id='1001').attempts, 0)
+
+    def test_release_retries(self):
+        self.queue.enqueue('1001')
+        self.queue.release(self.queue.claim(10))
+        self.assertEqual(self.queue.claim(10), [])
+
+        # Available again after the lock expired.
+        QueuedNotification.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(self.queue.claim(10)), 1)
+
+    def test_release_gives_up(self):
+        self.queue.enqueue('1001')
+        for i in range(3):
+            QueuedNotification.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+            self.queue.release(self.queue.claim(10))
+        self.assertFalse(QueuedNotification.objects.exists())
+
+
+class ProcessNotificationsTests(TestCase):
+    """
+    The worker, fetching the statuses from the stub server.
+    """
+
+    def setUp(self):
+        self.server = StubServer(default_status=None).start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(MULTISAFEPAY_API_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.updates = []
+        order_status_updated.connect(self.receiver)
+        self.addCleanup(order_status_updated.disconnect, self.receiver)
+
+        self.queue = DatabaseQueue(lock_timeout=60, max_attempts=3)
+        self.client = MultiSafepayClient(merchant=Merchant(notification_url='https://example.org/notify/'))
+
+    def receiver(self, sender, statusreply, **kwargs):
+        self.updates.append((statusreply.transaction.id, statusreply.status_code))
+
+    def test_process(self):
+        self.server.add_transaction('1001', status='completed')
+        self.server.add_transaction('1002', status='uncleared')
+        self.queue.enqueue('1001')
+        self.queue.enqueue('1002')
+
+        self.assertEqual(process_notifications(self.queue, self.client), 2)
+        self.assertEqual(sorted(self.updates), [('1001', 'completed'), ('1002', 'uncleared')])
+        self.assertFalse(QueuedNotification.objects.exists())
+
+    def test_failed_fetch_is_retried(self):
+        self.server.add_transaction('1001', status='completed')
+        self.queue.enqueue('1001')
+        self.queue.enqueue('unknown')
+
+        self.assertEqual(process_notifications(self.queue, self.client), 2)
+        self.assertEqual(self.updates, [('1001', 'completed')])
+        entry = QueuedNotification.objects.get()
+        self.assertEqual(entry.transaction_id, 'unknown')
+        self.assertEqual(entry.attempts, 1)
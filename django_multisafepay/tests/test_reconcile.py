@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+from django_multisafepay.models import StatusSnapshot
+from django_multisafepay.reconcile import Checkpoint, FileSource, QuerySetSource, ReconcileStats, reconcile
+from django_multisafepay.signals import order_status_updated
+from django_multisafepay.tests.utils import StubServerMixin, make_client
+
+
+class CheckpointTests(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.filename = os.path.join(self.tempdir, 'checkpoint.json')
+
+    def test_no_checkpoint(self):
+        self.assertIsNone(Checkpoint(self.filename, 'file:ids.txt').load())
+
+    def test_save_replaces(self):
+        checkpoint = Checkpoint(self.filename, 'file:ids.txt')
+        checkpoint.save(10, ReconcileStats())
+        checkpoint.save(20, ReconcileStats())
+        self.assertEqual(checkpoint.load(), 20)
+        self.assertEqual(os.listdir(self.tempdir), ['checkpoint.json'])
+
+    def test_other_source(self):
+        Checkpoint(self.filename, 'file:ids.txt').save(10, ReconcileStats())
+        self.assertRaises(ValueError, Checkpoint(self.filename, 'file:other.txt').load)
+
+
+class ReconcileTests(StubServerMixin, TestCase):
+    """
+    Reconciliation against the stub server, and resuming an interrupted run.
+    """
+    stub_kwargs = {'default_status': None}
+
+    def setUp(self):
+        super(ReconcileTests, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+        self.updates = []
+        order_status_updated.connect(self.receiver)
+        self.addCleanup(order_status_updated.disconnect, self.receiver)
+
+        self.client = make_client()
+        for i in range(1, 6):
+            self.server.add_transaction(str(1000 + i), status='completed')
+
+        self.ids_file = os.path.join(self.tempdir, 'ids.txt')
+        with open(self.ids_file, 'w') as f:
+            f.write("# Header\n1001\n1002\n\n1003\nunknown\n1004\n1005\n")
+        self.source = FileSource(self.ids_file)
+        self.checkpoint = Checkpoint(os.path.join(self.tempdir, 'checkpoint.json'), self.source.name)
+
+    def receiver(self, sender, statusreply, **kwargs):
+        self.updates.append(statusreply.transaction.id)
+
+    def test_reconcile(self):
+        errors = []
+        stats = reconcile(self.source, client=self.client, batch_size=2, max_workers=2, checkpoint=self.checkpoint,
+                          on_error=lambda transaction_id, error: errors.append(transaction_id))
+
+        self.assertEqual(sorted(self.updates), ['1001', '1002', '1003', '1004', '1005'])
+        self.assertEqual(errors, ['unknown'])
+        self.assertEqual(stats.as_dict(), {'fetched': 6, 'updated': 5, 'unchanged': 0, 'errors': 1})
+
+        # The checkpoint points to the last line, with the stats of the run.
+        self.assertEqual(self.checkpoint.load(), 8)
+        with open(self.checkpoint.filename) as f:
+            self.assertEqual(json.load(f)['stats'], stats.as_dict())
+
+    def test_resume(self):
+        self.checkpoint.save(4, ReconcileStats())  # After the line of 1002
+
+        stats = reconcile(self.source, client=self.client, batch_size=2, checkpoint=self.checkpoint)
+        self.assertEqual(sorted(self.updates), ['1003', '1004', '1005'])
+        self.assertEqual(stats.fetched, 4)
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(self.checkpoint.load(), 8)
+
+        # A completed run has nothing left to do.
+        self.updates = []
+        stats = reconcile(self.source, client=self.client, checkpoint=self.checkpoint)
+        self.assertEqual(stats.fetched, 0)
+        self.assertEqual(self.updates, [])
+
+    def test_queryset_resume(self):
+        for i in range(1, 6):
+            StatusSnapshot.objects.create(transaction_id=str(1000 + i), status='initialized')
+        source = QuerySetSource(StatusSnapshot.objects.pending())
+        checkpoint = Checkpoint(os.path.join(self.tempdir, 'queryset.json'), source.name)
+        checkpoint.save('1003', ReconcileStats())
+
+        reconcile(source, client=self.client, checkpoint=checkpoint)
+        self.assertEqual(sorted(self.updates), ['1004', '1005'])
+        self.assertEqual(checkpoint.load(), '1005')
@@ -0,0 +1,116 @@
+import requests
+from django.test import SimpleTestCase
+from django_multisafepay.exceptions import MultiSafepayServerException, MultiSafepayUnavailable
+from django_multisafepay.resilience import CircuitBreaker, RetryPolicy
+from django_multisafepay.tests.utils import StubServerMixin, make_client, make_customer, make_transaction
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(MultiSafepayUnavailable):
+            breaker.before_call()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        # A single trial call is let through.
+        breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(MultiSafepayUnavailable):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_fails(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_inconclusive(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_inconclusive()
+
+        # The next call becomes the trial.
+        breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class ClientResilienceTests(StubServerMixin, SimpleTestCase):
+    """
+    The retries and circuit breaker of the client, against the faults of the stub server.
+    """
+
+    def make_client(self, max_retries=2, failure_threshold=100):
+        return make_client(
+            retry_policy=RetryPolicy(max_retries=max_retries, backoff=0.001),
+            circuit_breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=60),
+        )
+
+    def test_status_is_retried(self):
+        self.server.error_rate = 1.0
+        client = self.make_client(max_retries=2)
+        with self.assertRaises(requests.HTTPError):
+            client.status('1001')
+        self.assertEqual(self.server.requests, 3)
+
+    def test_retry_succeeds(self):
+        self.server.reset_rate = 1.0
+        client = self.make_client(max_retries=2)
+        with self.assertRaises(requests.ConnectionError):
+            client.status('1001')
+
+        self.server.reset_rate = 0.0
+        self.assertEqual(client.status('1001').status_code, 'completed')
+
+    def test_transaction_is_not_retried(self):
+        # The transaction might have been created anyway.
+        self.server.error_rate = 1.0
+        client = self.make_client(max_retries=2)
+        with self.assertRaises(requests.HTTPError):
+            client.redirect_transaction(make_transaction(), make_customer())
+        self.assertEqual(self.server.requests, 1)
+
+    def test_api_error_is_not_retried(self):
+        self.server.default_status = None
+        client = self.make_client(max_retries=2)
+        with self.assertRaises(MultiSafepayServerException):
+            client.status('unknown')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_circuit_opens(self):
+        self.server.error_rate = 1.0
+        client = self.make_client(max_retries=0, failure_threshold=2)
+        for i in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.status('1001')
+        with self.assertRaises(MultiSafepayUnavailable):
+            client.status('1001')
+        self.assertEqual(self.server.requests, 2)
+
+    def test_api_error_keeps_circuit_closed(self):
+        # The API answered, so it's available.
+        self.server.api_error_rate = 1.0
+        client = self.make_client(max_retries=0, failure_threshold=1)
+        for i in range(3):
+            with self.assertRaises(MultiSafepayServerException):
+                client.status('1001')
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.CLOSED)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from django.test import SimpleTestCase
+from django_multisafepay import messages
+from django_multisafepay.data import (
+    Cart, Customer, CustomerDelivery, GatewayCustomer, GatewayInfo, ItemWeight, Merchant, Pickup, Plugin, Price, ShoppingCartItem, Transaction
+)
+from django_multisafepay.data.transaction import CheckoutSettings, GoogleAnalytics
+from django_multisafepay.tests.legacy_serializer import legacy_to_xml
+from django_multisafepay.tests.utils import make_customer
+
+
+def make_merchant():
+    return Merchant(
+        account='10011001', site_id='1234', site_code='123456',
+        notification_url='https://example.org/notify/?a=1&b=2', cancel_url='https://example.org/cancel/',
+        redirect_url=None, close_window=True,
+    )
+
+
+def make_cart(num_items):
+    return Cart(
+        items=[
+            ShoppingCartItem(
+                item_name=u'Café <crème> {0}'.format(i),
+                item_description=u'"Quoted" & \'single\' {0}'.format(i),
+                unit_price=Price('12.50', 'EUR'),
+                quantity=i + 1,
+                merchant_item_id=u'SKU-{0}'.format(i),
+                item_weight=ItemWeight(1.5, 'KG') if i % 2 else None,
+            ) for i in range(num_items)
+        ],
+        shipping_methods=[
+            Pickup(u'Winkel & afhalen', Price('0.00', 'EUR')),
+            Pickup('Store', Price('2.5', 'EUR')),
+        ],
+    )
+
+
+class SerializerTests(SimpleTestCase):
+    """
+    The single-pass serializer writes the same XML as the recursive string formatting it replaced.
+    """
+
+    def assertSameXml(self, message):
+        self.assertEqual(message.to_xml(), legacy_to_xml(message))
+
+    def test_status(self):
+        self.assertSameXml(messages.Status(make_merchant(), u'10217 & <ü>'))
+
+    def test_gateways(self):
+        self.assertSameXml(messages.Gateways(make_merchant(), GatewayCustomer(locale='nl_NL', country='NL')))
+
+    def test_redirect_transaction(self):
+        transaction = Transaction(
+            id='10217', currency='EUR', amount=6000, description=u'Bestelling #10217 – “€ 60” <b>&amp;</b>',
+            manual=False, gateway='IDEAL', gateway_issuer='0151', var1=215, var2=None, var3=u'ü',
+        )
+        self.assertSameXml(messages.RedirectTransaction(
+            make_merchant(), transaction, make_customer(),
+            plugin=Plugin(shop=u'Shop & Co', shop_version='1.0'), google_analytics=GoogleAnalytics('UA-1234'),
+        ))
+
+    def test_redirect_transaction_minimal(self):
+        self.assertSameXml(messages.RedirectTransaction(Merchant(), Transaction(id='1'), make_customer()))
+
+    def test_direct_transaction(self):
+        transaction = Transaction(id='10217', currency='EUR', amount=6000, description='Order', gateway='IDEAL')
+        self.assertSameXml(messages.DirectTransaction(make_merchant(), transaction, make_customer(), GatewayInfo(issuerid='0151')))
+
+    def test_checkout_transaction(self):
+        for num_items in (0, 1, 3):
+            customer_delivery = CustomerDelivery(
+                firstname=u'Jürgen', lastname=u'O\'Neill', address1='Foo', address2=None, housenumber='1',
+                zipcode='1234AB', city='Amsterdam', state=None, country='NL', phone=None, email='foo@example.org',
+            )
+            self.assertSameXml(messages.CheckoutTransaction(
+                make_merchant(), Transaction(id='10217', currency='EUR', amount=6000, manual=True), make_customer(),
+                customer_delivery=customer_delivery, cart=make_cart(num_items), plugin=Plugin(shop_version='1.0'),
+                checkout_settings=CheckoutSettings(use_shipping_notification=False),
+            ))
+
+    def test_unicode_customer(self):
+        customer = Customer(
+            locale='de_DE', firstname=u'Jürgen', lastname=u'Müller <&>', address1=u'Straße "1"', address2=None,
+            housenumber='1', zipcode='12345', city=u'Köln', state=None, country='DE', phone=None, email='foo@example.org',
+            ipaddress='127.0.0.1', referrer='https://example.org/?a=1&b=2',
+        )
+        self.assertSameXml(messages.RedirectTransaction(make_merchant(), Transaction(id='1'), customer))
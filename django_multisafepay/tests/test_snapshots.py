@@ -0,0 +1,74 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_multisafepay.models import StatusSnapshot
+from django_multisafepay.notifications import dispatch_status_update, dispatch_status_updates, update_snapshot
+from django_multisafepay.signals import order_status_updated
+from django_multisafepay.tests.utils import make_statusreply
+
+
+@override_settings(MULTISAFEPAY_STATUS_SNAPSHOTS=True)
+class StatusSnapshotTests(TestCase):
+
+    def connect_receiver(self):
+        updates = []
+
+        def receiver(sender, statusreply, previous=None, **kwargs):
+            updates.append((statusreply.status_code, previous.status if previous is not None else None))
+
+        order_status_updated.connect(receiver, weak=False)
+        self.addCleanup(order_status_updated.disconnect, receiver)
+        return updates
+
+    def test_new_transaction(self):
+        previous, changed = update_snapshot(make_statusreply(status='initialized'))
+        self.assertIsNone(previous)
+        self.assertTrue(changed)
+
+        snapshot = StatusSnapshot.objects.get(transaction_id='1001')
+        self.assertEqual(snapshot.status, 'initialized')
+        self.assertEqual(snapshot.amount, 1000)
+        self.assertIn('<status result="ok">', snapshot.xml)
+
+    def test_unchanged(self):
+        update_snapshot(make_statusreply())
+        previous, changed = update_snapshot(make_statusreply())
+        self.assertFalse(changed)
+        self.assertEqual(previous.status, 'completed')
+
+    def test_changed(self):
+        update_snapshot(make_statusreply(status='initialized', modified='20240101120000'))
+        previous, changed = update_snapshot(make_statusreply(status='completed', modified='20240101120500'))
+        self.assertTrue(changed)
+        self.assertEqual(previous.status, 'initialized')
+        self.assertEqual(StatusSnapshot.objects.get().status, 'completed')
+
+    def test_refund_is_a_change(self):
+        update_snapshot(make_statusreply(status='completed'))
+        previous, changed = update_snapshot(make_statusreply(status='refunded'))
+        self.assertTrue(changed)
+        self.assertEqual(StatusSnapshot.objects.get().amount_refunded, 1000)
+
+    def test_stale_modified(self):
+        # A reply that was fetched before the stored one doesn't overwrite it.
+        update_snapshot(make_statusreply(status='completed', modified='20240101120500'))
+        previous, changed = update_snapshot(make_statusreply(status='uncleared', modified='20240101120000'))
+        self.assertFalse(changed)
+        self.assertEqual(StatusSnapshot.objects.get().status, 'completed')
+
+    def test_signal_only_for_changes(self):
+        updates = self.connect_receiver()
+        self.assertTrue(dispatch_status_update(None, make_statusreply(status='initialized', modified='20240101120000')))
+        self.assertFalse(dispatch_status_update(None, make_statusreply(status='initialized', modified='20240101120000')))
+        self.assertTrue(dispatch_status_update(None, make_statusreply(status='completed', modified='20240101120500')))
+        self.assertEqual(updates, [('initialized', None), ('completed', 'initialized')])
+
+    def test_updated_without_listeners(self):
+        # A receiver that is connected later, should not see a change for statuses that were already received.
+        self.assertFalse(dispatch_status_update(None, make_statusreply()))
+        self.assertEqual(dispatch_status_updates(None, [make_statusreply(transaction_id='1002')])[0][1], False)
+        self.assertEqual(StatusSnapshot.objects.count(), 2)
+
+        updates = self.connect_receiver()
+        self.assertFalse(dispatch_status_update(None, make_statusreply()))
+        self.assertFalse(dispatch_status_updates(None, [make_statusreply(transaction_id='1002')])[0][1])
+        self.assertEqual(updates, [])
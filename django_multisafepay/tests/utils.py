@@ -0,0 +1,53 @@
+from xml.etree import ElementTree
+
+from django.test.utils import override_settings
+from django_multisafepay.client import MultiSafepayClient
+from django_multisafepay.data import Customer, Merchant, Transaction
+from django_multisafepay.messages import StatusReply
+from django_multisafepay.stubserver import StubServer, StubTransaction, render_status
+
+
+def make_statusreply(transaction_id='1001', status='completed', modified='20240101120000', **kwargs):
+    """
+    Create a status reply, in the format of the stub server.
+    The arguments are passed to the :class:`~django_multisafepay.stubserver.StubTransaction`.
+    """
+    transaction = StubTransaction(transaction_id, status=status, **kwargs)
+    transaction.ewallet_id = u"9{0}".format(transaction_id)
+    transaction.modified = modified
+    return StatusReply.from_xml(ElementTree.fromstring(render_status(transaction)))
+
+
+def make_transaction(transaction_id='1001'):
+    return Transaction(id=transaction_id, currency='EUR', amount=6000, description=u"Order #{0}".format(transaction_id), gateway='IDEAL')
+
+
+def make_customer():
+    return Customer(
+        locale='nl_NL', firstname='Diederik', lastname='van der Boor', address1='Foo', address2=None,
+        housenumber='1', zipcode='1234AB', city='Amsterdam', state=None, country='NL',
+        phone=None, email='foo@example.org',
+    )
+
+
+def make_client(**kwargs):
+    """
+    Create a client, which doesn't need to resolve the URL of the notification view.
+    """
+    return MultiSafepayClient(merchant=Merchant(notification_url='https://example.org/multisafepay/notify/'), **kwargs)
+
+
+class StubServerMixin(object):
+    """
+    Send the API calls of the test to a :class:`~django_multisafepay.stubserver.StubServer`.
+    """
+    #: The arguments of the stub server.
+    stub_kwargs = {}
+
+    def setUp(self):
+        super(StubServerMixin, self).setUp()
+        self.server = StubServer(**self.stub_kwargs).start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(MULTISAFEPAY_API_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
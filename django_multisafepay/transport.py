@@ -0,0 +1,176 @@
+"""
+HTTP transport for the API calls.
+
+All clients in the process share a single pool of keep-alive connections,
+so repeated calls don't pay a new TCP and TLS handshake every time.
+"""
+import threading
+import time
+from timeit import default_timer
+
+import requests
+from requests.adapters import HTTPAdapter
+from django_multisafepay import appsettings
+from django_multisafepay.instrumentation import CONNECT, get_active_timer
+
+try:
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+except ImportError:  # Old requests versions
+    from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+    from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of keep-alive HTTP connections.
+
+    The underlying :class:`requests.Session` is closed when the pool has been idle
+    for more then ``idle_timeout`` seconds, and transparently recreated on the next call.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, idle_timeout=60):
+        """
+        :param pool_size: The maximum number of connections to keep open per host.
+        :param keep_alive: Whether connections should be reused between calls.
+        :param idle_timeout: Number of seconds after which idle connections are closed. Use ``None`` to keep them open.
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self._active = 0
+        self._last_used = 0
+
+    def post(self, url, **kwargs):
+        """
+        Perform a POST request using a pooled connection.
+        :rtype: requests.Response
+        """
+        session = self._acquire()
+        try:
+            return session.post(url, **kwargs)
+        finally:
+            self._release()
+
+    def close(self):
+        """
+        Close all open connections.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def create_session(self):
+        """
+        Create the session object. This method can be overwritten to mount custom adapters.
+        :rtype: requests.Session
+        """
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def _acquire(self):
+        with self._lock:
+            if self._session is not None and self._is_expired():
+                self._session.close()
+                self._session = None
+
+            if self._session is None:
+                self._session = self.create_session()
+
+            self._active += 1
+            return self._session
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._last_used = time.time()
+
+    def _is_expired(self):
+        # Connections that are still in use by other threads are never evicted.
+        return self.idle_timeout is not None \
+            and self._active == 0 \
+            and time.time() - self._last_used > self.idle_timeout
+
+
+def _timed_connect(connection_class, connection):
+    # Report the connect time to the timer of the API call, if any.
+    timer = get_active_timer()
+    if timer is None:
+        return super(connection_class, connection).connect()
+
+    start = default_timer()
+    try:
+        return super(connection_class, connection).connect()
+    finally:
+        timer.add(CONNECT, default_timer() - start)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        return _timed_connect(TimedHTTPConnection, self)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # This includes the TLS handshake.
+        return _timed_connect(TimedHTTPSConnection, self)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    An adapter that reports the time it takes to open new connections,
+    so it's reported as separate phase by the :mod:`~django_multisafepay.instrumentation`.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """
+    Return the connection pool that is shared by all clients in this process.
+    :rtype: ConnectionPool
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ConnectionPool(
+                    pool_size=appsettings.MULTISAFEPAY_POOL_SIZE,
+                    keep_alive=appsettings.MULTISAFEPAY_KEEP_ALIVE,
+                    idle_timeout=appsettings.MULTISAFEPAY_POOL_IDLE_TIMEOUT,
+                )
+    return _default_pool
+
+
+def _setting_changed(setting):
+    # The clients that use the old pool keep using it.
+    global _default_pool
+    _default_pool = None
+
+
+appsettings.reset_on_change(('MULTISAFEPAY_POOL_', 'MULTISAFEPAY_KEEP_ALIVE'), _setting_changed)
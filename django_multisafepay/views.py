@@ -1,21 +1,14 @@
 import logging
 
-from django.db import transaction
 from django.http import HttpResponse
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import View
 from django_multisafepay.client import MultiSafepayClient
-from django_multisafepay.signals import order_status_updated
+from django_multisafepay.notifications import dispatch_status_update, get_notification_coalescer, get_notification_queue, transaction_atomic  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
-# New transaction support in Django 1.6
-try:
-    transaction_atomic = transaction.atomic
-except AttributeError:
-    transaction_atomic = transaction.commit_on_success
-
 
 class NotificationView(View):
     """
@@ -34,16 +27,23 @@ class NotificationView(View):
             return HttpResponse("missing transactionid", status=403)
         self.type = request.GET.get('type')
 
-        # Request the new status from the server.
         client = self.get_client()
-        statusreply = client.status(self.transaction_id)
-
-        # Let the project update the status
-        if not order_status_updated.has_listeners():
-            logger.warning("No listeners for `order_status_updated` signal!")
+        queue = self.get_queue()
+        if queue is not None:
+            # Let a background worker fetch the status and update the order, so the view returns quickly.
+            # The cached status is outdated, until the worker replaces it with the new status.
+            client.invalidate_status(self.transaction_id)
+            queue.enqueue(self.transaction_id, self.type)
         else:
-            with transaction_atomic():
-                order_status_updated.send(self.__class__, statusreply=statusreply, request=self.request)
+            # Request the new status from the server, which also replaces the cached status.
+            coalescer = self.get_coalescer()
+            if coalescer is not None:
+                statusreply = coalescer.fetch_status(client, self.transaction_id)
+            else:
+                statusreply = client.status(self.transaction_id, refresh=True)
+
+            # Let the project update the status
+            dispatch_status_update(self.__class__, statusreply, request=self.request, coalescer=coalescer)
 
         if self.type == 'initial':
             # displayed at the last page of the transaction process (if no redirect_url is set)
@@ -59,6 +59,20 @@ class NotificationView(View):
         """
         return self.client_class()
 
+    def get_queue(self):
+        """
+        Return the queue to store the notification in, or ``None`` to process the notification directly.
+        By default, this returns the queue of the ``MULTISAFEPAY_NOTIFICATION_QUEUE`` setting.
+        """
+        return get_notification_queue()
+
+    def get_coalescer(self):
+        """
+        Return the coalescer that skips repeated notifications, or ``None`` to process every notification.
+        By default, this is enabled by the ``MULTISAFEPAY_NOTIFICATION_DEDUP_WINDOW`` setting.
+        """
+        return get_notification_coalescer()
+
     def render_to_response(self):
         """
         Render the response when no redirect_url is set.
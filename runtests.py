@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Run the tests of this package, without a Django project::
+
+    python runtests.py
+    python runtests.py django_multisafepay.tests.test_queue
+"""
+import sys
+
+import django
+from django.conf import settings
+from django.core.management import execute_from_command_line
+
+if not settings.configured:
+    settings.configure(
+        SECRET_KEY='tests',
+        DEBUG=False,
+        INSTALLED_APPS=(
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'django_multisafepay',
+        ),
+        DATABASES={
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        },
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        },
+        ROOT_URLCONF='django_multisafepay.urls',
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+        MULTISAFEPAY_ACCOUNT_ID='10011001',
+        MULTISAFEPAY_SITE_ID='1234',
+        MULTISAFEPAY_SITE_CODE='123456',
+    )
+
+
+def runtests():
+    argv = sys.argv[:1] + ['test'] + (sys.argv[1:] or ['django_multisafepay'])
+    execute_from_command_line(argv)
+
+
+if __name__ == '__main__':
+    runtests()
@@ -28,9 +28,13 @@ setup(
     install_requires = [
         'requests>=1.2.1'
     ],
+    extras_require = {
+        'async': ['aiohttp>=3.0'],
+    },
     requires=[
-        'Django (>=1.4)',
+        'Django (>=1.11)',
     ],
+    python_requires='>=3.7',
 
     description='MultiSafepay Payments Gateway integration for Django',
     long_description=read('README.rst'),
@@ -55,8 +59,13 @@ setup(
         'License :: OSI Approved :: Apache Software License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Internet :: WWW/HTTP',
         'Topic :: Office/Business :: Financial',
         'Topic :: Software Development :: Libraries :: Python Modules',